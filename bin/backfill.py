@@ -0,0 +1,227 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy
+
+from bin.chart_data_generator import STICKS_OF, store
+from libraries.candles.period import to_microseconds
+from libraries.candles.rollup import Sticks, rollup_all
+from libraries.exchanges.bitflyer import BitFlyer, RestPolicy, ProductCode, Candlestick, ChartType, Side
+from libraries.exchanges.bitflyer.models import ChartTable
+
+logger = logging.getLogger(__name__)
+
+Gap = Tuple[datetime, datetime]
+
+ONE_MINUTE = timedelta(seconds=Candlestick.ONE_MINUTE.value)
+
+
+class Checkpoints:
+    # Ranges whose gaps have been backfilled for each product, and the chunk being written if any, kept in a JSON file
+    # that is replaced whole on every update so that an interrupted run resumes with the very chunk it was writing
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._state = json.load(f)
+
+    def covered(self, product_code: ProductCode) -> List[Gap]:
+        return [
+            (datetime.fromisoformat(start), datetime.fromisoformat(end))
+            for start, end in self._state.get(product_code.name, {}).get('covered', [])
+        ]
+
+    def uncovered(self, product_code: ProductCode, since: datetime, until: datetime) -> List[Gap]:
+        # Parts of [since, until) outside every covered range
+        ranges: List[Gap] = []
+        for start, end in self.covered(product_code):
+            if since < min(start, until):
+                ranges.append((since, min(start, until)))
+            since = max(since, end)
+        if since < until:
+            ranges.append((since, until))
+        return ranges
+
+    def pending(self, product_code: ProductCode) -> Optional[Gap]:
+        pending = self._state.get(product_code.name, {}).get('pending')
+        return None if pending is None else (datetime.fromisoformat(pending[0]), datetime.fromisoformat(pending[1]))
+
+    def begin(self, product_code: ProductCode, chunk: Gap) -> None:
+        self._update(product_code, pending=[chunk[0].isoformat(), chunk[1].isoformat()])
+
+    def cover(self, product_code: ProductCode, since: datetime, until: datetime) -> None:
+        # Merged with the ranges it overlaps or touches, so that they stay sorted and apart
+        ranges: List[Gap] = []
+        for start, end in sorted(self.covered(product_code) + [(since, until)]):
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+        self._update(
+            product_code, covered=[[start.isoformat(), end.isoformat()] for start, end in ranges], pending=None,
+        )
+
+    def _update(self, product_code: ProductCode, **state: Any) -> None:
+        with self._lock:
+            self._state.setdefault(product_code.name, {}).update(state)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.path)
+
+
+def find_gaps(product_code: ProductCode, since: datetime, until: datetime) -> List[Gap]:
+    # Minutes in [since, until) without a one minute candle, merged into ranges
+    chart_type = getattr(ChartType, f'{product_code.name}_{Candlestick.ONE_MINUTE.name}')
+    stored = {
+        c.period_from for c in ChartTable.query(
+            chart_type, ChartTable.period_from.between(since, until - ONE_MINUTE), attributes_to_get=['period_from'],
+        )
+    }
+
+    gaps: List[Gap] = []
+    minute = since
+    while minute < until:
+        if minute not in stored:
+            if gaps and gaps[-1][1] == minute:
+                gaps[-1] = (gaps[-1][0], minute + ONE_MINUTE)
+            else:
+                gaps.append((minute, minute + ONE_MINUTE))
+        minute += ONE_MINUTE
+    return gaps
+
+
+def chunks(gaps: List[Gap], size: timedelta) -> Iterator[Gap]:
+    for start, end in gaps:
+        while start < end:
+            yield start, min(start + size, end)
+            start += size
+
+
+def first_id_at(client: BitFlyer, product_code: ProductCode, t: datetime, lo: int, hi: int) -> int:
+    # The smallest id in [lo, hi) of an execution at `t` or later, or `hi` when there is none. Ids grow with time, so
+    # it is bisected with pages of a single execution, the newest one at or below the middle id.
+    while lo < hi:
+        mid = (lo + hi) // 2
+        page = client.get_executions(product_code, 1, before=mid + 1)
+        if page and page[0].exec_date >= t:
+            hi = page[0].id
+        else:
+            lo = mid + 1
+    return lo
+
+
+def aggregate(product_code: ProductCode, client: BitFlyer, start_id: int, end_id: int, gap: Gap) -> STICKS_OF:
+    executions = [
+        e for e in client.get_executions_between(product_code, start_id - 1, end_id) if gap[0] <= e.exec_date < gap[1]
+    ]
+    n = len(executions)
+    size = numpy.fromiter((e.size for e in executions), dtype=numpy.float64, count=n)
+    side = numpy.fromiter(
+        (0 if e.side is None else 1 if e.side is Side.BUY else -1 for e in executions), dtype=numpy.int8, count=n,
+    )
+    ticks = Sticks.from_trades(
+        numpy.fromiter((to_microseconds(e.exec_date) for e in executions), dtype=numpy.int64, count=n),
+        numpy.fromiter((e.price for e in executions), dtype=numpy.float64, count=n),
+        size, numpy.where(side > 0, size, 0), numpy.where(side < 0, size, 0),
+    )
+
+    return {
+        getattr(ChartType, f'{product_code.name}_{c.name}'): sticks.to_dict()
+        for c, sticks in rollup_all(ticks).items()
+    }
+
+
+def backfill(
+        product_code: ProductCode, client: BitFlyer, checkpoints: Checkpoints, since: datetime, until: datetime,
+        chunk_size: timedelta,
+) -> int:
+    # Chunks are fetched, aggregated and written one at a time, so memory is bounded by a chunk whatever the gaps are.
+    # A chunk is recorded as pending before it is written and every candle it touches is stamped with it, so the chunk
+    # an interrupted run was writing is written again as it was, leaving out the candles that already have it. Only the
+    # parts of [since, until) that no run has covered yet are searched for gaps.
+    latest = client.get_executions(product_code, 1)
+    hi = latest[0].id + 1 if latest else 0
+    lo, previous = 0, None
+
+    def write(gap: Gap) -> int:
+        nonlocal lo, previous
+        # A chunk starting where the previous one ended starts at its end id too, and any later one after it; chunks
+        # before the previous one, e.g. after the pending chunk, are searched for from the first id
+        if previous == gap[0]:
+            start_id = lo
+        else:
+            after = lo if previous is not None and previous < gap[0] else 0
+            start_id = first_id_at(client, product_code, gap[0], after, hi)
+        end_id = first_id_at(client, product_code, gap[1], start_id, hi)
+        lo, previous = end_id, gap[1]
+
+        if start_id >= end_id:
+            return 0
+        checkpoints.begin(product_code, gap)
+        chunk = f'{gap[0].isoformat()}/{gap[1].isoformat()}'
+        return store(aggregate(product_code, client, start_id, end_id, gap), chunk=chunk)
+
+    touched = 0
+    pending = checkpoints.pending(product_code)
+    if pending is not None:
+        touched += write(pending)
+        checkpoints.cover(product_code, *pending)
+
+    for start, end in checkpoints.uncovered(product_code, since, until):
+        gaps = find_gaps(product_code, start, end)
+        missing = sum((e - s) // ONE_MINUTE for s, e in gaps)
+        logger.info(f'{product_code.name}: {missing} minutes missing in {len(gaps)} gaps from {start.isoformat()}')
+
+        for gap in chunks(gaps, chunk_size):
+            touched += write(gap)
+            checkpoints.cover(product_code, start, gap[1])
+            logger.info(f'{product_code.name}: backfilled until {gap[1].isoformat()}')
+        checkpoints.cover(product_code, start, end)
+
+    return touched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Rebuilds candles missing from the chart table out of executions')
+    parser.add_argument('--product-codes', nargs='+', default=[ProductCode.BTC_JPY.name, ProductCode.FX_BTC_JPY.name],
+                        choices=[p.name for p in ProductCode])
+    # bitFlyer keeps executions of the last 31 days or so
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--chunk-minutes', type=int, default=360)
+    parser.add_argument('--checkpoint', default='backfill.json')
+    parser.add_argument('--workers', type=int, default=4, help='connections fetching executions of a chunk at once')
+    args = parser.parse_args()
+
+    until = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    since = until - timedelta(days=args.days)
+    checkpoints = Checkpoints(args.checkpoint)
+    product_codes = [getattr(ProductCode, p) for p in args.product_codes]
+
+    started = time.perf_counter()
+    # All products share a client, so their requests are drawn from the same rate limit
+    with BitFlyer(RestPolicy(max_workers=args.workers)) as client, ThreadPoolExecutor(len(product_codes)) as executor:
+        touched = list(executor.map(
+            lambda p: backfill(p, client, checkpoints, since, until, timedelta(minutes=args.chunk_minutes)),
+            product_codes,
+        ))
+
+    for p, t in zip(product_codes, touched):
+        logger.info(f'{t} candles of {p.name} have been stored')
+    logger.info(f'finished in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
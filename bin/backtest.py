@@ -0,0 +1,41 @@
+import argparse
+import time
+from datetime import datetime, timezone
+
+from libraries.backtest import RSIBacktest
+from libraries.exchanges.bitflyer import ProductCode, Candlestick, ChartType
+from libraries.exchanges.bitflyer.archive import TickArchive
+from libraries.exchanges.bitflyer.models import ChartTable
+
+
+def _datetime(s: str) -> datetime:
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replays history through the RSI strategy of `main.Processor`')
+    parser.add_argument('--product-code', default=ProductCode.BTC_JPY.name, choices=[p.name for p in ProductCode])
+    parser.add_argument('--candlestick', choices=[c.name for c in Candlestick],
+                        help='replay `ChartTable` candles of this timeframe instead of the local tick archive')
+    parser.add_argument('--from', dest='_from', type=_datetime, required=True)
+    parser.add_argument('--until', type=_datetime, default=datetime.now(timezone.utc))
+    args = parser.parse_args()
+
+    product_code: ProductCode = getattr(ProductCode, args.product_code)
+    if args.candlestick:
+        chart_type = getattr(ChartType, f'{product_code.name}_{args.candlestick}')
+        df = ChartTable.query_as_data_frame(
+            chart_type, ChartTable.period_from.between(args._from, args.until), columns=('Close',), num_of_segments=8,
+        )
+        backtest = RSIBacktest.from_data_frame(df)
+    else:
+        backtest = RSIBacktest.from_ticks(TickArchive().load(product_code, args._from, args.until))
+
+    started = time.perf_counter()
+    result = backtest.run()
+    print(result.to_string())
+    print(f'{len(backtest.prices)} prices replayed in {time.perf_counter() - started:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+from typing import Dict, Union
+
+import time
+from datetime import datetime, timezone
+
+import numpy
+
+from libraries.candles.period import from_microseconds
+from libraries.candles.rollup import Sticks, rollup, rollup_all
+from libraries.exchanges.bitflyer import Candlestick
+
+STICK_OF = Dict[datetime, Dict[str, Union[int, float, datetime]]]
+
+
+# The dict based implementation that `rollup()` replaced, kept here as the baseline
+
+
+def determine_period(ts: datetime, duration: int) -> datetime:
+    if duration < Candlestick.ONE_MINUTE.value:
+        second, _ = divmod(ts.second, duration)
+        return datetime(ts.year, ts.month, ts.day, ts.hour, ts.minute, second * duration, tzinfo=timezone.utc)
+
+    if duration < Candlestick.ONE_HOUR.value:
+        duration, _ = divmod(duration, 60)
+        minute, _ = divmod(ts.minute, duration)
+        return datetime(ts.year, ts.month, ts.day, ts.hour, minute * duration, tzinfo=timezone.utc)
+
+    if duration < Candlestick.ONE_DAY.value:
+        duration, _ = divmod(duration, 60 * 60)
+        hour, _ = divmod(ts.hour, duration)
+        return datetime(ts.year, ts.month, ts.day, hour * duration, tzinfo=timezone.utc)
+
+    if duration == Candlestick.ONE_DAY.value:
+        return datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+
+    if duration == Candlestick.ONE_WEEK.value:
+        cal = ts.isocalendar()
+        return datetime.fromisocalendar(cal.year, cal.week, 1).replace(tzinfo=timezone.utc)
+
+    raise RuntimeError(f'Unsupported timeframe: {duration}')
+
+
+def summarize(stick_of: STICK_OF, duration: int) -> STICK_OF:
+    new_stick_of: STICK_OF = {}
+
+    for ts, stick in stick_of.items():
+        period = determine_period(ts, duration)
+
+        if period not in new_stick_of:
+            new_stick_of[period] = {
+                'high': stick['high'],
+                'low': stick['low'],
+                'open': stick['open'],
+                'close': stick['close'],
+                'volume': stick['volume'],
+                'open_ts': stick['open_ts'],
+                'close_ts': stick['close_ts'],
+            }
+            continue
+
+        new_stick_of[period]['volume'] += stick['volume']
+        new_stick_of[period]['high'] = max(new_stick_of[period]['high'], stick['high'])
+        new_stick_of[period]['low'] = min(new_stick_of[period]['low'], stick['low'])
+        if new_stick_of[period]['open_ts'] > stick['open_ts']:
+            new_stick_of[period]['open_ts'] = stick['open_ts']
+            new_stick_of[period]['open'] = stick['open']
+        if new_stick_of[period]['close_ts'] < stick['close_ts']:
+            new_stick_of[period]['close_ts'] = stick['close_ts']
+            new_stick_of[period]['close'] = stick['close']
+
+    return new_stick_of
+
+
+def generate_ticks(n: int, seed: int = 0) -> Sticks:
+    rng = numpy.random.default_rng(seed)
+    start = int(datetime(2021, 11, 8, tzinfo=timezone.utc).timestamp()) * 1_000_000
+    ts = numpy.sort(start + rng.integers(0, 86400 * 1_000_000, n))
+    ltp = 7_000_000 + numpy.cumsum(rng.normal(0, 500, n)).round()
+    volume = rng.uniform(1000, 2000, n).round(8)
+    return Sticks.from_ticks(ts, ltp, volume)
+
+
+def to_stick_of(ticks: Sticks) -> STICK_OF:
+    return {
+        from_microseconds(ts): {
+            'high': ltp, 'low': ltp, 'open': ltp, 'close': ltp, 'volume': v,
+            'open_ts': from_microseconds(ts), 'close_ts': from_microseconds(ts),
+        }
+        for ts, ltp, v in zip(ticks.period.tolist(), ticks.close.tolist(), ticks.volume.tolist())
+    }
+
+
+def run_legacy(stick_of: STICK_OF) -> Dict[Candlestick, STICK_OF]:
+    result = {}
+    for c in Candlestick:
+        stick_of = summarize(stick_of, c.value)
+        result[c] = stick_of
+    return result
+
+
+def run_summarize(stick_of: STICK_OF) -> Dict[Candlestick, STICK_OF]:
+    # Every timeframe straight from the ticks, as periods that do not nest, e.g. 15 minutes of 10, can not be cascaded
+    return {c: summarize(stick_of, c.value) for c in Candlestick}
+
+
+def run_rollup(ticks: Sticks) -> Dict[Candlestick, STICK_OF]:
+    result = {}
+    for c in Candlestick:
+        ticks = rollup(ticks, c)
+        result[c] = ticks.to_dict()
+    return result
+
+
+def run_rollup_all(ticks: Sticks) -> Dict[Candlestick, STICK_OF]:
+    return {c: sticks.to_dict() for c, sticks in rollup_all(ticks).items()}
+
+
+def assert_identical(expected: Dict[Candlestick, STICK_OF], actual: Dict[Candlestick, STICK_OF]) -> None:
+    for c in Candlestick:
+        assert expected[c].keys() == actual[c].keys(), c
+        for period, stick in expected[c].items():
+            for k, v in stick.items():
+                if k == 'volume':
+                    assert abs(actual[c][period][k] - v) <= 1e-9 * abs(v), (c, period, k)
+                else:
+                    assert actual[c][period][k] == v, (c, period, k)
+
+
+def measure(f, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == '__main__':
+    # bitFlyer sends a few tickers per second for BTC_JPY
+    ticks = generate_ticks(86400 * 4)
+    stick_of = to_stick_of(ticks)
+    assert_identical(run_legacy(stick_of), run_rollup(ticks))
+    # `rollup_all()` is what the chart data generator and backfill run
+    assert_identical(run_summarize(stick_of), run_rollup_all(ticks))
+
+    legacy = measure(run_legacy, stick_of)
+    for name, f in (('rollup()', run_rollup), ('rollup_all()', run_rollup_all)):
+        vectorized = measure(f, ticks)
+        print(
+            f'{len(ticks)} ticks: summarize() {legacy:.3f}s, {name} {vectorized:.3f}s, '
+            f'{legacy / vectorized:.1f}x faster'
+        )
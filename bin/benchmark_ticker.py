@@ -0,0 +1,63 @@
+from typing import Any, Dict, List
+
+import json
+import time
+from dataclasses import asdict
+from datetime import datetime
+
+from libraries.exchanges.bitflyer import ProductCode, State, Ticker
+
+
+# The decoder that `Ticker.from_dict()` replaced, kept here as the baseline
+
+
+def legacy_from_dict(data: Dict[str, Any]) -> Ticker:
+    ts: str = data['timestamp']
+    if ts.endswith('Z'):
+        ts = ts[:-1]
+    if (sub := len(ts.split('.')[-1]) - 6) > 0:
+        ts = ts[:-sub]
+    timestamp_str = f'{ts}+00:00'
+    try:
+        timestamp = datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+    return Ticker(**{**data, **{
+        'product_code': getattr(ProductCode, data['product_code']),
+        'state': getattr(State, '_'.join(data['state'].split())),
+        'timestamp': timestamp,
+    }})
+
+
+def generate_messages(n: int) -> List[Dict[str, Any]]:
+    return [{
+        'product_code': 'BTC_JPY', 'state': 'RUNNING', 'timestamp': f'2021-11-08T12:34:{i % 60:02d}.{i:07d}Z',
+        'tick_id': i, 'best_bid': 7000000.0, 'best_ask': 7000100.0, 'best_bid_size': 0.1, 'best_ask_size': 0.2,
+        'total_bid_depth': 1000.0, 'total_ask_depth': 1100.0, 'market_bid_size': 0.0, 'market_ask_size': 0.0,
+        'ltp': 7000050.0, 'volume': 12345.6, 'volume_by_product': 2345.6,
+    } for i in range(n)]
+
+
+def measure(f, messages: list, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for m in messages:
+            f(m)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == '__main__':
+    messages = generate_messages(100_000)
+    assert all(asdict(legacy_from_dict(m)) == asdict(Ticker.from_dict(m)) for m in messages[:1000])
+
+    legacy = measure(legacy_from_dict, messages)
+    fast = measure(Ticker.from_dict, messages)
+    print(f'{len(messages)} messages: legacy {legacy:.3f}s, from_dict() {fast:.3f}s, {legacy / fast:.1f}x faster')
+
+    raw = [json.dumps(m).encode() for m in messages]
+    two_steps = measure(lambda r: legacy_from_dict(json.loads(r)), raw)
+    from_bytes = measure(Ticker.from_bytes, raw)
+    print(f'{len(raw)} raw messages: legacy {two_steps:.3f}s, from_bytes() {from_bytes:.3f}s')
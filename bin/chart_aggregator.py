@@ -0,0 +1,38 @@
+import logging
+import time
+
+from libraries.candles import CandleAggregator
+from libraries.exchanges.bitflyer import BitFlyerRealTime, PublicChannel, ProductCode
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+client = BitFlyerRealTime()
+aggregators = [CandleAggregator(ProductCode.BTC_JPY), CandleAggregator(ProductCode.FX_BTC_JPY)]
+
+
+def flush() -> None:
+    for aggregator in aggregators:
+        try:
+            aggregator.flush()
+        except Exception as e:
+            logger.error(e)
+
+
+def run() -> None:
+    for aggregator in aggregators:
+        client.subscribe(PublicChannel.lightning_executions, aggregator.product_code, aggregator.update_executions)
+    client.start()
+
+    interval = 1
+    start_time = time.time()
+
+    while True:
+        flush()
+
+        time_to_wait = ((start_time - time.time()) % interval) or interval
+        time.sleep(time_to_wait)
+
+
+if __name__ == '__main__':
+    run()
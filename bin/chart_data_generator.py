@@ -1,114 +1,86 @@
-from typing import Dict, Union, List, Tuple
+from typing import Dict, Optional, Union
 
-import pandas
-import mplfinance
 import time
+import logging
 import threading
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
+import numpy
 from pynamodb.exceptions import DoesNotExist
 
-from libraries.exchanges.bitflyer import ProductCode, Candlestick, ChartType
-from libraries.exchanges.bitflyer.models import TickerTable, ProductCodeIndex, ChartTable
+from libraries.candles.period import to_microseconds
+from libraries.candles.rollup import Sticks, rollup_all
+from libraries.exchanges.bitflyer import ProductCode, ChartType
+from libraries.exchanges.bitflyer.cache import CandleCache
+from libraries.exchanges.bitflyer.models import WrittenAtIndex, ChartTable, WatermarkTable
+
+logger = logging.getLogger(__name__)
 
 STICK_OF = Dict[datetime, Dict[str, Union[int, float, datetime]]]
 STICKS_OF = Dict[ChartType, STICK_OF]
 
 
-def determine_period(ts: datetime, duration: int) -> datetime:
-    if duration < Candlestick.ONE_MINUTE.value:
-        second, _ = divmod(ts.second, duration)
-        return datetime(ts.year, ts.month, ts.day, ts.hour, ts.minute, second * duration, tzinfo=timezone.utc)
-
-    if duration < Candlestick.ONE_HOUR.value:
-        duration, _ = divmod(duration, 60)
-        minute, _ = divmod(ts.minute, duration)
-        return datetime(ts.year, ts.month, ts.day, ts.hour, minute * duration, tzinfo=timezone.utc)
-
-    if duration < Candlestick.ONE_DAY.value:
-        duration, _ = divmod(duration, 60 * 60)
-        hour, _ = divmod(ts.hour, duration)
-        return datetime(ts.year, ts.month, ts.day, hour * duration, tzinfo=timezone.utc)
-
-    if duration == Candlestick.ONE_DAY.value:
-        return datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
-
-    if duration == Candlestick.ONE_WEEK.value:
-        cal = ts.isocalendar()
-        return datetime.fromisocalendar(cal.year, cal.week, 1)
-
-    raise RuntimeError(f'Unsupported timeframe: {duration}')
+# Where consuming starts for a product without a watermark yet
+START = datetime(2021, 11, 4, tzinfo=timezone.utc)
+# Tickers are consumed in the order the collector wrote them, up to where it reports every ticker has been written,
+# whatever their timestamps and however long they waited to be written. Only the index they are read through lags
+# behind the table, which DynamoDB does not bound but usually is well under a second, so those written in the last
+# `SETTLE` are left to the next cycle; it covers the clock of the collector being ahead as well.
+SETTLE = timedelta(seconds=5)
 
 
-def summarize(stick_of: STICK_OF, duration: int) -> STICK_OF:
-    new_stick_of: STICK_OF = {}
-
-    for ts, stick in stick_of.items():
-        period = determine_period(ts, duration)
-
-        if period not in new_stick_of:
-            new_stick_of[period] = {
-                'high': stick['high'],
-                'low': stick['low'],
-                'open': stick['open'],
-                'close': stick['close'],
-                'volume': stick['volume'],
-                'open_ts': stick['open_ts'],
-                'close_ts': stick['close_ts'],
-            }
-            continue
-
-        new_stick_of[period]['volume'] += stick['volume']
-        new_stick_of[period]['high'] = max(new_stick_of[period]['high'], stick['high'])
-        new_stick_of[period]['low'] = min(new_stick_of[period]['low'], stick['low'])
-        if new_stick_of[period]['open_ts'] > stick['open_ts']:
-            new_stick_of[period]['open_ts'] = stick['open_ts']
-            new_stick_of[period]['open'] = stick['open']
-        if new_stick_of[period]['close_ts'] < stick['close_ts']:
-            new_stick_of[period]['close_ts'] = stick['close_ts']
-            new_stick_of[period]['close'] = stick['close']
+def query_tickers(product_code: ProductCode, after: datetime, until: datetime) -> Sticks:
+    # Tickers written after `after` up to `until`
+    result = WrittenAtIndex.query(
+        product_code,
+        WrittenAtIndex.written_at.between(after + timedelta(microseconds=1), until),
+        attributes_to_get=['tick_id', 'timestamp', 'ltp', 'volume'],
+    )
+    tickers = list(result)
 
-    return new_stick_of
+    return Sticks.from_ticks(
+        numpy.fromiter((to_microseconds(t.timestamp) for t in tickers), dtype=numpy.int64, count=len(tickers)),
+        numpy.fromiter((t.ltp for t in tickers), dtype=numpy.float64, count=len(tickers)),
+        numpy.fromiter((t.volume for t in tickers), dtype=numpy.float64, count=len(tickers)),
+    )
 
 
-def query_tickers(product_code: ProductCode) -> Tuple[List[TickerTable], STICK_OF]:
-    _from = datetime(2021, 11, 4, tzinfo=timezone.utc)
-    until = datetime(2030, 11, 5, 23, tzinfo=timezone.utc)
-    result = ProductCodeIndex.query(
-        product_code,
-        ProductCodeIndex.timestamp.between(_from, until),
-    )
-    stick_of: STICK_OF = {}
-    tickers = []
+def watermark_of(product_code: ProductCode) -> WatermarkTable:
+    return _watermark(f'chart_data_generator/{product_code.name}')
 
-    for ticker in result:
-        t: TickerTable = ticker
-        tickers.append(t)
-        ts: datetime = t.timestamp
 
-        stick_of[ts] = {
-            'high': t.ltp,
-            'low': t.ltp,
-            'open': t.ltp,
-            'close': t.ltp,
-            'volume': t.volume,
-            'open_ts': ts,
-            'close_ts': ts,
-        }
+def _watermark(name: str) -> WatermarkTable:
+    try:
+        return WatermarkTable.get(name)
+    except DoesNotExist:
+        return WatermarkTable(name, done=START)
 
-    return tickers, stick_of
 
+def store(sticks_of: STICKS_OF, merged_until: Optional[datetime] = None, chunk: Optional[str] = None) -> int:
+    # Sticks are merged into what is stored; with `merged_until`, candles that already have the batch ending there are
+    # left alone, so that a batch written partly before a failure can be stored again. Backfilled chunks go back in
+    # time rather than forward, so they are told apart by a `chunk` id instead.
+    touched = 0
 
-def store(sticks_of: STICKS_OF) -> None:
     with ChartTable.batch_write() as batch:
         for chart_type, stick_of in sticks_of.items():
+            stored: Dict[datetime, ChartTable] = {
+                c.period_from: c for c in ChartTable.batch_get([(chart_type, ts) for ts in stick_of.keys()])
+            }
+
             for ts, stick in stick_of.items():
-                try:
-                    chart = ChartTable.get(chart_type, ts)
-                except DoesNotExist:
+                chart = stored.get(ts)
+                if chart is None:
                     chart = ChartTable(chart_type, ts)
+                elif merged_until is not None and chart.merged_until is not None and chart.merged_until >= merged_until:
+                    continue
+                elif chunk is not None and chunk in (chart.backfilled or ()):
+                    continue
 
                 chart.volume = (chart.volume or 0) + stick['volume']
+                if 'buy_volume' in stick:
+                    chart.buy_volume = (chart.buy_volume or 0) + stick['buy_volume']
+                    chart.sell_volume = (chart.sell_volume or 0) + stick['sell_volume']
 
                 if chart.high_value is None or chart.high_value < stick['high']:
                     chart.high_value = stick['high']
@@ -122,26 +94,53 @@ def store(sticks_of: STICKS_OF) -> None:
                     chart.close_timestamp = stick['close_ts']
                     chart.close_value = stick['close']
 
+                if merged_until is not None:
+                    chart.merged_until = merged_until
+                if chunk is not None:
+                    chart.backfilled = (chart.backfilled or set()) | {chunk}
                 batch.save(chart)
+                touched += 1
+
+    # Blocks of closed candles cached locally are read again from the table once any of their periods is rewritten
+    cache = CandleCache.default()
+    if cache is not None:
+        for chart_type, stick_of in sticks_of.items():
+            cache.invalidate(chart_type, stick_of.keys())
+
+    return touched
+
 
+def run(product_code: ProductCode, now: Optional[datetime] = None) -> int:
+    # Consumes the tickers written after the watermark; those older are left to expire through their `ttl`
+    watermark = watermark_of(product_code)
+    if watermark.pending is None:
+        written_until = _watermark(WatermarkTable.COLLECTOR).done
+        watermark.pending = min(written_until, (now or datetime.now(timezone.utc)) - SETTLE) - timedelta(microseconds=1)
+        watermark.save()
+    until = watermark.pending
 
-def run(product_code: ProductCode) -> None:
-    tickers, stick_of = query_tickers(product_code)
-    sticks_of: STICKS_OF = {}
+    touched = 0
+    if until > watermark.done:
+        sticks = query_tickers(product_code, watermark.done, until)
+        sticks_of: STICKS_OF = {}
 
-    for c in Candlestick:
-        chart_type = getattr(ChartType, f'{product_code.name}_{c.name}')
-        sticks_of[chart_type] = summarize(stick_of, c.value)
-        stick_of = sticks_of[chart_type]
+        for c, rolled_up in rollup_all(sticks).items():
+            chart_type = getattr(ChartType, f'{product_code.name}_{c.name}')
+            sticks_of[chart_type] = rolled_up.to_dict()
 
-    store(sticks_of)
+        touched = store(sticks_of, until)
 
-    with TickerTable.batch_write() as batch:
-        for t in tickers:
-            batch.delete(t)
+    logger.info(f'{touched} candles of {product_code.name} have been stored')
+
+    watermark.done, watermark.pending = max(until, watermark.done), None
+    watermark.save()
+
+    return touched
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
     interval = 10
     start_time = time.time()
 
@@ -0,0 +1,57 @@
+from typing import Dict, List, Tuple
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas
+
+from libraries.exchanges.bitflyer import ProductCode, Candlestick, ChartType
+from libraries.exchanges.bitflyer.models import ChartTable
+from libraries.signals import support_resistance
+from libraries.signals.support_resistance import scan_levels
+
+DETECTORS = ('Fractal', 'WindowShifting', 'KMeans')
+
+
+def load(chart_types: List[Tuple[ChartType, Candlestick]], num_of_candles: int) -> Dict[str, pandas.DataFrame]:
+    # Queries are I/O bound, so they are issued from threads while the detectors run in processes
+    now = datetime.utcnow()
+
+    def query(chart_type: Tuple[ChartType, Candlestick]) -> pandas.DataFrame:
+        _from = now - timedelta(seconds=chart_type[1].value * num_of_candles)
+        return ChartTable.query_as_data_frame(chart_type[0], ChartTable.period_from.between(_from, now))
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        return dict(zip([c.name for c, _ in chart_types], executor.map(query, chart_types)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detects support and resistance levels of many chart types at once')
+    parser.add_argument('--product-codes', nargs='+', default=[p.name for p in ProductCode],
+                        choices=[p.name for p in ProductCode])
+    parser.add_argument('--candlesticks', nargs='+', default=[c.name for c in Candlestick],
+                        choices=[c.name for c in Candlestick])
+    parser.add_argument('--detectors', nargs='+', default=list(DETECTORS), choices=DETECTORS)
+    parser.add_argument('--num-of-candles', type=int, default=500)
+    parser.add_argument('--workers', type=int, help='number of processes, as many as cores by default')
+    args = parser.parse_args()
+
+    chart_types = [
+        (getattr(ChartType, f'{p}_{c}'), getattr(Candlestick, c)) for p in args.product_codes for c in args.candlesticks
+    ]
+
+    started = time.perf_counter()
+    frames = load(chart_types, args.num_of_candles)
+    loaded = time.perf_counter()
+    result = scan_levels(frames, [getattr(support_resistance, d) for d in args.detectors], args.workers)
+    finished = time.perf_counter()
+
+    with pandas.option_context('display.max_rows', None, 'display.max_colwidth', None, 'display.width', None):
+        print(result.to_string())
+    print(f'{len(frames)} chart types loaded in {loaded - started:.3f}s, scanned in {finished - loaded:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
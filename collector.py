@@ -1,24 +1,95 @@
+from typing import Dict
+
 import logging
+import os
+import signal
+import sys
+import time
 import dataclasses
+from datetime import timedelta
 
 from libraries.exchanges.bitflyer import BitFlyerRealTime, Ticker, PublicChannel, ProductCode
-from libraries.exchanges.bitflyer.models import TickerTable
+from libraries.exchanges.bitflyer.archive import TickArchive
+from libraries.exchanges.bitflyer.dispatcher import DispatchPolicy, Overflow
+from libraries.exchanges.bitflyer.models import TickerTable, WatermarkTable
+from libraries.exchanges.bitflyer.writer import BufferedWriter
 
 logging.basicConfig(level=logging.INFO)
 
-client = BitFlyerRealTime()
+# Every ticker is kept, so a burst the handler can not keep up with holds up reading the websocket rather than
+# dropping tickers; the queue absorbs bursts of a few seconds before it does
+client = BitFlyerRealTime(DispatchPolicy(max_queued=10000, overflow=Overflow.BLOCK))
+# Tickers are stamped when written, so that consumers follow what has been written rather than exchange timestamps
+writer = BufferedWriter(TickerTable, stamp='written_at')
+archive = TickArchive()
+# Tickers expire through their `ttl` once consumed by `chart_data_generator`, rather than being deleted by it
+retention = timedelta(days=float(os.environ.get('TICKER_RETENTION_DAYS', 7)))
 
 
 def _handler(ticker: Ticker) -> None:
-    t = TickerTable(**dataclasses.asdict(ticker))
-    t.save()
+    archive.append(ticker)
+    writer.put(TickerTable(**dataclasses.asdict(ticker), ttl=ticker.timestamp + retention))
 
 
 def run() -> None:
+    writer.start()
+
     client.subscribe(PublicChannel.lightning_ticker, ProductCode.FX_BTC_JPY, _handler)
     client.subscribe(PublicChannel.lightning_ticker, ProductCode.BTC_JPY, _handler)
     client.start()
 
 
+def _terminate(*_) -> None:
+    # Leaves the main loop the way Ctrl+C does; a signal sent again must not cut `stop()` short
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    sys.exit(0)
+
+
+def stop() -> None:
+    # Handlers finish with what has been received before the writer flushes and the day files are closed, so that no
+    # ticker is left behind
+    client.close()
+    writer.close()
+    archive.close()
+    try:
+        publish_watermark()
+    except Exception as e:
+        logging.error(e)
+
+
+def publish_watermark() -> None:
+    # Every ticker written before `done` can be queried, but for the lag of the index consumers read through
+    WatermarkTable(WatermarkTable.COLLECTOR, done=writer.written_until).save()
+
+
+def report(dropped: Dict[str, int]) -> None:
+    # Logs how far behind handlers are, and warns of tickers dropped since the last report into `dropped`
+    for channel, stats in client.stats().items():
+        if stats.dropped > dropped.get(channel, 0):
+            logging.warning(f'{stats.dropped - dropped.get(channel, 0)} messages of `{channel}` have been dropped')
+        dropped[channel] = stats.dropped
+        logging.info(f'`{channel}`: {stats.depth} queued, lag {stats.lag}s, max lag {stats.max_lag}s')
+
+
 if __name__ == '__main__':
+    # Stopped by SIGTERM as much as by Ctrl+C, either of which leaves the loop below through `stop()`; the writer is
+    # joined there rather than at exit, as the interpreter only calls `atexit` handlers once non-daemon threads end
+    signal.signal(signal.SIGTERM, _terminate)
     run()
+
+    reported: Dict[str, int] = {}
+    seconds = 0
+    try:
+        while True:
+            try:
+                publish_watermark()
+            except Exception as e:
+                logging.error(e)
+            if seconds % 60 == 0:
+                report(reported)
+            seconds += 1
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
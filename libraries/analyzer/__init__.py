@@ -1 +1,2 @@
-from .analyzer import Analyzer
+from .chart import Chart
+from .hub import ChartHub
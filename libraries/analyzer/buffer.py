@@ -0,0 +1,101 @@
+from typing import Optional
+
+import numpy
+import pandas
+
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+class CandleBuffer:
+    # Columns are preallocated twice as large as `capacity`, rows are appended at the end and the latest ones are moved
+    # back to the front only when the end is reached, so that appending stays amortized O(1) without reallocating
+
+    def __init__(self, capacity: Optional[int] = None, initial_size: int = 1024) -> None:
+        self.capacity = capacity
+        size = 2 * (capacity if capacity else initial_size)
+
+        self._index = numpy.empty(size, dtype='datetime64[ns]')
+        self._values = numpy.empty((len(COLUMNS), size), dtype=numpy.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def index(self) -> numpy.ndarray:
+        return self._index[self._start:self._end]
+
+    def column(self, name: str) -> numpy.ndarray:
+        return self._values[COLUMNS.index(name), self._start:self._end]
+
+    @property
+    def last_index(self) -> Optional[numpy.datetime64]:
+        return self._index[self._end - 1] if len(self) else None
+
+    def upsert(self, index: numpy.ndarray, values: numpy.ndarray) -> None:
+        # `index` must be sorted, `values` is shaped as (len(COLUMNS), len(index)); rows already in the buffer are
+        # overwritten in place, newer ones are appended
+        if not len(index):
+            return
+
+        current = self.index
+        n_existing = numpy.searchsorted(index, current[-1], side='right') if len(current) else 0
+        if n_existing:
+            positions = numpy.searchsorted(current, index[:n_existing])
+            found = positions < len(current)
+            found[found] = current[positions[found]] == index[:n_existing][found]
+            self._values[:, self._start + positions[found]] = values[:, :n_existing][:, found]
+
+        index, values = index[n_existing:], values[:, n_existing:]
+        if self.capacity and len(index) > self.capacity:
+            index, values = index[-self.capacity:], values[:, -self.capacity:]
+
+        k = len(index)
+        if not k:
+            return
+
+        self._reserve(k)
+        self._index[self._end:self._end + k] = index
+        self._values[:, self._end:self._end + k] = values
+        self._end += k
+
+        if self.capacity and len(self) > self.capacity:
+            self._start = self._end - self.capacity
+
+    def upsert_data_frame(self, df: pandas.DataFrame) -> None:
+        if df.empty:
+            return
+
+        index = df.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        self.upsert(index.to_numpy(dtype='datetime64[ns]'), df.loc[:, COLUMNS].to_numpy(dtype=numpy.float64).T)
+
+    def _reserve(self, k: int) -> None:
+        size = len(self._index)
+        if self._end + k <= size:
+            return
+
+        keep = len(self)
+        if self.capacity:
+            keep = min(keep, self.capacity - k)
+        elif keep + k > size // 2:
+            size = 2 * max(size, keep + k)
+
+        index = self._index if size == len(self._index) else numpy.empty(size, dtype=self._index.dtype)
+        values = self._values if size == len(self._index) else numpy.empty((len(COLUMNS), size), dtype=numpy.float64)
+
+        index[:keep] = self._index[self._end - keep:self._end]
+        values[:, :keep] = self._values[:, self._end - keep:self._end]
+        self._index, self._values = index, values
+        self._start, self._end = 0, keep
+
+    def to_data_frame(self, start: int = 0, stop: Optional[int] = None) -> pandas.DataFrame:
+        # Rows `start:stop` of the buffer, all of them by default
+        rows = range(self._start, self._end)[start:stop]
+        df = pandas.DataFrame(
+            {name: self._values[i, rows.start:rows.stop].copy() for i, name in enumerate(COLUMNS)},
+            index=pandas.DatetimeIndex(self._index[rows.start:rows.stop].copy(), name='Date').tz_localize('UTC'),
+        )
+        return df
@@ -1,13 +1,20 @@
+from typing import Any, Dict, Optional, Type, Union
+
 import threading
-import time
 from datetime import datetime, timedelta
 
 import numpy
 import pandas
-from pandas.core.indexes.datetimes import DatetimeIndex
 
 from libraries.exchanges.bitflyer import ChartType, ProductCode, Candlestick
 from libraries.exchanges.bitflyer.models import ChartTable
+from libraries.signals import RSI, SimpleMovingAverage
+from libraries.signals.support_resistance import SupportResistance
+
+from .buffer import CandleBuffer
+from .hub import ChartHub
+
+Indicator = Union[RSI, SimpleMovingAverage]
 
 
 class Chart:
@@ -18,58 +25,110 @@ class Chart:
     ) -> None:
 
         self._lock = threading.Lock()
-        self.__max_num_of_candles = max_num_of_candles
+        self._indicators: Dict[str, Indicator] = {}
+        self._support_resistances: Dict[str, SupportResistance] = {}
+        self._snapshot: Optional[pandas.DataFrame] = None
+        self.candlestick = candlestick
         self.chart_type: ChartType = getattr(ChartType, f'{product_code.name}_{candlestick.name}')
 
         now = datetime.utcnow()
         condition = ChartTable.period_from <= now
+        capacity = None
+        num_of_segments = 1
         if isinstance(max_num_of_candles, int) and max_num_of_candles > 0:
             _from = now - timedelta(seconds=(candlestick.value * max_num_of_candles))
             condition = ChartTable.period_from.between(_from, now)
-        self.__df = ChartTable.query_as_data_frame(self.chart_type, condition)
+            capacity = max_num_of_candles
+            # Queried in segments of 10000 candles or so, each a few pages, at once
+            num_of_segments = min(max_num_of_candles // 10000 + 1, 8)
 
-        if auto_following:
-            self.__start_thread(following_interval)
+        self._candles = CandleBuffer(capacity)
+        self._candles.upsert_data_frame(
+            ChartTable.query_as_data_frame(self.chart_type, condition, num_of_segments=num_of_segments),
+        )
 
-    def __start_thread(self, interval: float) -> None:
-        def _continue_following() -> None:
-            start_time = time.time()
+        self._hub: Optional[ChartHub] = None
+        self._subscription_id: Optional[int] = None
+        if auto_following:
+            self._hub = ChartHub.shared(following_interval)
+            self._subscription_id = self._hub.subscribe(self.chart_type, self._apply, self._since())
 
-            while True:
-                _t = threading.Thread(target=self.follow_up_to_current)
-                _t.start()
-                _t.join()
+    def __enter__(self) -> 'Chart':
+        return self
 
-                time_to_wait = ((start_time - time.time()) % interval) or interval
-                time.sleep(time_to_wait)
+    def __exit__(self, *_) -> None:
+        self.close()
 
-        t = threading.Thread(target=_continue_following)
-        t.start()
+    def close(self) -> None:
+        # Stops following; the shared poller of the chart type stops as well once nobody follows it anymore
+        if self._hub is not None and self._subscription_id is not None:
+            self._hub.unsubscribe(self.chart_type, self._subscription_id)
+            self._subscription_id = None
 
     @property
     def df(self) -> pandas.DataFrame:
-        while self._lock.locked():
-            pass
-        return self.__df
+        # Built once per refresh and shared by every reader until the next one
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._candles.to_data_frame()
+            return self._snapshot
+
+    def add_indicator(self, name: str, indicator: Indicator) -> None:
+        # Fed with the close of every closed candle once here and then only with newly closed ones while following
+        with self._lock:
+            for close in self._candles.column('Close')[:-1].tolist():
+                indicator.update(close)
+            self._indicators[name] = indicator
+
+    def indicator(self, name: str) -> Optional[float]:
+        with self._lock:
+            if not len(self._candles):
+                return None
+            return self._indicators[name].peek(float(self._candles.column('Close')[-1]))
+
+    def add_support_resistance(
+            self, name: str, detector: Type[SupportResistance], **kwargs: Any,
+    ) -> SupportResistance:
+        # Built over the closed candles once here and then updated only with newly closed ones while following
+        with self._lock:
+            support_resistance = detector(self._candles.to_data_frame(stop=-1), **kwargs)
+            self._support_resistances[name] = support_resistance
+        return support_resistance
+
+    def support_resistance(self, name: str) -> SupportResistance:
+        return self._support_resistances[name]
+
+    def _since(self) -> datetime:
+        with self._lock:
+            last_index = self._candles.last_index
+
+        if last_index is None:
+            return datetime.utcnow() - timedelta(seconds=self.candlestick.value)
+        return pandas.Timestamp(last_index).to_pydatetime()
 
     def follow_up_to_current(self) -> None:
-        self._lock.acquire()
-
-        last_index: DatetimeIndex = self.__df.tail(1).index  # noqa
-
-        d = last_index.date[0]
-        t = last_index.time[0]
-        dt: datetime = datetime(d.year, d.month, d.day, t.hour, t.minute, t.second)
-
-        newer_df = ChartTable.query_as_data_frame(
-            self.chart_type,
-            ChartTable.period_from.between(dt, datetime.utcnow()),
-        )
-
-        self.__df.drop(index=last_index, inplace=True)
-        self.__df = self.__df.append(newer_df)
-
-        if len(self.__df.index) > self.__max_num_of_candles:
-            self.__df = self.__df.iloc[-self.__max_num_of_candles:, :]
-
-        self._lock.release()
+        self._apply(ChartTable.query_as_data_frame(
+            self.chart_type, ChartTable.period_from.between(self._since(), datetime.utcnow()),
+        ))
+
+    def _apply(self, newer_df: pandas.DataFrame) -> None:
+        if newer_df.empty:
+            return
+
+        with self._lock:
+            last_index = self._candles.last_index
+            self._candles.upsert_data_frame(newer_df)
+
+            if last_index is not None:
+                index = self._candles.index
+                newly_closed = numpy.searchsorted(index, last_index)
+                for close in self._candles.column('Close')[newly_closed:len(index) - 1].tolist():
+                    for indicator in self._indicators.values():
+                        indicator.update(close)
+
+                if self._support_resistances and newly_closed < len(index) - 1:
+                    closed_df = self._candles.to_data_frame(newly_closed, len(index) - 1)
+                    for support_resistance in self._support_resistances.values():
+                        support_resistance.update(closed_df)
+
+            self._snapshot = None
@@ -0,0 +1,113 @@
+from typing import Callable, Dict, List, Optional
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+import pandas
+
+from libraries.exchanges.bitflyer import ChartType
+from libraries.exchanges.bitflyer.models import ChartTable
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[pandas.DataFrame], None]
+
+
+class _Poller:
+    def __init__(self, chart_type: ChartType, since: datetime) -> None:
+        self.chart_type = chart_type
+        self.since = since
+        self.callbacks: Dict[int, Callback] = {}
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+
+class ChartHub:
+    # Polls `ChartTable` once per interval for each chart type that has any subscriber and hands the newer candles to
+    # all of them, so that the read traffic does not grow with the number of `Chart`s following the same chart type
+
+    _shared: Dict[float, 'ChartHub'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, interval: float = 5.0) -> None:
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pollers: Dict[ChartType, _Poller] = {}
+        self._next_id = 0
+
+    @classmethod
+    def shared(cls, interval: float = 5.0) -> 'ChartHub':
+        with cls._shared_lock:
+            if interval not in cls._shared:
+                cls._shared[interval] = cls(interval)
+            return cls._shared[interval]
+
+    @property
+    def chart_types(self) -> List[ChartType]:
+        with self._lock:
+            return list(self._pollers.keys())
+
+    def subscribe(self, chart_type: ChartType, callback: Callback, since: datetime) -> int:
+        # `since` is the period of the candle the subscriber has seen last, in UTC; it may still be open
+        with self._lock:
+            subscription_id = self._next_id
+            self._next_id += 1
+
+            poller = self._pollers.get(chart_type)
+            if poller is None:
+                poller = self._pollers[chart_type] = _Poller(chart_type, since)
+                poller.thread = threading.Thread(target=self._poll, args=(poller, ))
+                poller.thread.start()
+            elif since < poller.since:
+                poller.since = since
+
+            poller.callbacks[subscription_id] = callback
+
+        return subscription_id
+
+    def unsubscribe(self, chart_type: ChartType, subscription_id: int) -> None:
+        with self._lock:
+            poller = self._pollers.get(chart_type)
+            if poller is None:
+                return
+
+            poller.callbacks.pop(subscription_id, None)
+            if not poller.callbacks:
+                poller.stopped.set()
+                del self._pollers[chart_type]
+
+    def _poll(self, poller: _Poller) -> None:
+        start_time = time.time()
+
+        while not poller.stopped.is_set():
+            try:
+                self._refresh(poller)
+            except Exception as e:
+                logger.error(e)
+
+            time_to_wait = ((start_time - time.time()) % self.interval) or self.interval
+            poller.stopped.wait(time_to_wait)
+
+    def _refresh(self, poller: _Poller) -> None:
+        with self._lock:
+            since = poller.since
+
+        newer_df = ChartTable.query_as_data_frame(
+            poller.chart_type, ChartTable.period_from.between(since, datetime.utcnow()),
+        )
+        if newer_df.empty:
+            return
+
+        with self._lock:
+            # Only move forward; a subscriber that joined meanwhile may have asked for older candles
+            if poller.since == since:
+                poller.since = newer_df.index[-1].to_pydatetime().replace(tzinfo=None)
+            callbacks = list(poller.callbacks.values())
+
+        for callback in callbacks:
+            try:
+                callback(newer_df)
+            except Exception as e:
+                logger.error(e)
@@ -0,0 +1 @@
+from .rsi import RSIBacktest, Trade
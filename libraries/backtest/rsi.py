@@ -0,0 +1,114 @@
+from typing import Iterable, List, Optional, Tuple
+
+from dataclasses import dataclass
+
+import numpy
+import pandas
+
+from libraries.signals import RSI
+
+# Same rules as `main.Processor`
+DEFAULT_LOSS_CUT_RATES = tuple(n / 10 for n in range(1, 31))
+
+
+@dataclass(frozen=True)
+class Trade:
+    entry_index: int
+    exit_index: int
+    entry_price: float
+    exit_price: float
+    profit: float
+    reason: str
+
+
+class RSIBacktest:
+    def __init__(
+            self, prices: numpy.ndarray, timestamps: Optional[numpy.ndarray] = None,
+            timeperiod: int = 14, oversold: float = 30.0, fee_rate: float = 0.0015, take_profit_ratio: float = 1.5,
+    ) -> None:
+
+        self.prices = numpy.ascontiguousarray(prices, dtype=numpy.float64)
+        self.timestamps = timestamps
+        self.timeperiod = timeperiod
+        self.oversold = oversold
+        self.fee_rate = fee_rate
+        self.take_profit_ratio = take_profit_ratio
+
+        # `Processor` keeps only the last `timeperiod` differences, not a Wilder-smoothed RSI
+        self.rsi = RSI.batch(self.prices, timeperiod, wilder=False)
+        self._buy_indices = numpy.flatnonzero(self.rsi < oversold)
+
+    @classmethod
+    def from_ticks(cls, records: numpy.ndarray, **kwargs) -> 'RSIBacktest':
+        return cls(records['ltp'], records['timestamp'], **kwargs)
+
+    @classmethod
+    def from_data_frame(cls, df: pandas.DataFrame, **kwargs) -> 'RSIBacktest':
+        return cls(df['Close'].to_numpy(), df.index.to_numpy(), **kwargs)
+
+    def trades(self, loss_cut_rate: float) -> Tuple[List[Trade], float]:
+        prices = self.prices
+        n = len(prices)
+
+        trades: List[Trade] = []
+        profit = 0.0
+        start = 0
+
+        while True:
+            k = numpy.searchsorted(self._buy_indices, start)
+            if k == len(self._buy_indices):
+                return trades, profit
+
+            entry = int(self._buy_indices[k])
+            entry_price = float(prices[entry])
+            cost = entry_price + entry_price * self.fee_rate
+            profit -= cost
+
+            lower = entry_price * (100 - loss_cut_rate) / 100
+            upper = entry_price * (100 + loss_cut_rate * self.take_profit_ratio) / 100
+            exit_ = self._find_exit(entry + 1, lower, upper)
+            if exit_ is None:
+                return trades, profit
+
+            exit_price = float(prices[exit_])
+            proceeds = exit_price - exit_price * self.fee_rate
+            profit += proceeds
+            trades.append(Trade(
+                entry, exit_, entry_price, exit_price, proceeds - cost, 'Profit' if upper <= exit_price else 'LossCut',
+            ))
+            start = exit_ + 1
+
+            if start >= n:
+                return trades, profit
+
+    def _find_exit(self, start: int, lower: float, upper: float) -> Optional[int]:
+        # Search in doubling chunks so that the cost is proportional to how long the position is held
+        size = 256
+        while start < len(self.prices):
+            chunk = self.prices[start:start + size]
+            hits = numpy.flatnonzero((chunk <= lower) | (chunk >= upper))
+            if len(hits):
+                return start + int(hits[0])
+            start += size
+            size *= 2
+        return None
+
+    def run(self, loss_cut_rates: Iterable[float] = DEFAULT_LOSS_CUT_RATES) -> pandas.DataFrame:
+        rows = []
+
+        for rate in loss_cut_rates:
+            trades, profit = self.trades(rate)
+            realized = numpy.cumsum([0.0] + [t.profit for t in trades])
+            drawdown = numpy.maximum.accumulate(realized) - realized
+
+            rows.append({
+                'loss_cut_rate': rate,
+                'profit': profit,
+                'realized_profit': realized[-1],
+                'trades': len(trades),
+                'wins': sum(1 for t in trades if t.profit > 0),
+                'loss_cuts': sum(1 for t in trades if t.reason == 'LossCut'),
+                'max_drawdown': drawdown.max(),
+            })
+
+        return pandas.DataFrame(rows).set_index('loss_cut_rate')
@@ -0,0 +1,3 @@
+from .aggregator import Candle, CandleAggregator
+from .period import floor_period, period_from
+from .rollup import Sticks, rollup, rollup_all
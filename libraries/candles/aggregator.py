@@ -0,0 +1,212 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import logging
+import threading
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from pynamodb.exceptions import DoesNotExist
+
+from libraries.exchanges.bitflyer import ProductCode, Candlestick, ChartType, Side, Ticker, Execution
+from libraries.exchanges.bitflyer.models import ChartTable
+
+from .period import floor_period, period_from
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Candle:
+    chart_type: ChartType
+    period_from: datetime
+
+    open_value: float
+    high_value: float
+    low_value: float
+    close_value: float
+    volume: float
+
+    open_timestamp: datetime
+    close_timestamp: datetime
+
+    # Taken by buy and sell orders; only executions tell them apart, candles built from tickers leave them 0
+    buy_volume: float = 0.0
+    sell_volume: float = 0.0
+
+    def merge(self, chart: ChartTable) -> None:
+        self.volume += chart.volume or 0
+        self.buy_volume += chart.buy_volume or 0
+        self.sell_volume += chart.sell_volume or 0
+        if chart.high_value is not None and chart.high_value > self.high_value:
+            self.high_value = chart.high_value
+        if chart.low_value is not None and chart.low_value < self.low_value:
+            self.low_value = chart.low_value
+        if chart.open_timestamp is not None and chart.open_timestamp < self.open_timestamp:
+            self.open_timestamp = chart.open_timestamp
+            self.open_value = chart.open_value
+        if chart.close_timestamp is not None and chart.close_timestamp > self.close_timestamp:
+            self.close_timestamp = chart.close_timestamp
+            self.close_value = chart.close_value
+
+    def to_table(self) -> ChartTable:
+        return ChartTable(
+            self.chart_type, self.period_from,
+            open_value=self.open_value,
+            high_value=self.high_value,
+            low_value=self.low_value,
+            close_value=self.close_value,
+            volume=self.volume,
+            buy_volume=self.buy_volume,
+            sell_volume=self.sell_volume,
+            open_timestamp=self.open_timestamp,
+            close_timestamp=self.close_timestamp,
+        )
+
+
+class CandleAggregator:
+    def __init__(self, product_code: ProductCode, candlesticks: Iterable[Candlestick] = Candlestick) -> None:
+        self.product_code = product_code
+        self._chart_types: List[Tuple[Candlestick, ChartType]] = [
+            (c, getattr(ChartType, f'{product_code.name}_{c.name}')) for c in candlesticks
+        ]
+
+        self._lock = threading.Lock()
+        self._periods: Dict[ChartType, int] = {}
+        self._candles: Dict[ChartType, Candle] = {}
+        self._pending: Dict[Tuple[ChartType, int], Candle] = {}
+        # Chart types whose first candle since start has not been merged with what is already stored yet
+        self._unseeded = {chart_type for _, chart_type in self._chart_types}
+
+    def candle(self, candlestick: Candlestick) -> Optional[Candle]:
+        return self._candles.get(getattr(ChartType, f'{self.product_code.name}_{candlestick.name}'))
+
+    def update(self, ticker: Ticker) -> None:
+        if ticker.product_code is not self.product_code:
+            return
+
+        ts = ticker.timestamp
+        price = ticker.ltp
+        with self._lock:
+            self._fold(ts.timestamp(), price, price, price, price, ticker.volume, 0.0, 0.0, ts, ts)
+
+    def update_executions(self, executions: Sequence[Execution]) -> None:
+        # Executions of a message are first folded per minute, so that each costs a few comparisons only and every
+        # chart type is updated once per minute in the message rather than once per execution
+        groups: Dict[int, list] = {}
+        for e in executions:
+            ts, price, size = e.exec_date, e.price, e.size
+            epoch = ts.timestamp()
+            g = groups.get(int(epoch // 60))
+            if g is None:
+                g = groups[int(epoch // 60)] = [epoch, price, price, price, price, size, 0.0, 0.0, ts, ts]
+            else:
+                g[5] += size
+                if price > g[2]:
+                    g[2] = price
+                if price < g[3]:
+                    g[3] = price
+                if ts < g[8]:
+                    g[8], g[1] = ts, price
+                if ts >= g[9]:
+                    g[9], g[4] = ts, price
+
+            if e.side is Side.BUY:
+                g[6] += size
+            elif e.side is Side.SELL:
+                g[7] += size
+
+        with self._lock:
+            for g in groups.values():
+                self._fold(*g)
+
+    def _fold(
+            self, epoch: float, open_value: float, high_value: float, low_value: float, close_value: float,
+            volume: float, buy_volume: float, sell_volume: float, open_timestamp: datetime, close_timestamp: datetime,
+    ) -> None:
+        # Merges trades of one minute at most into the open candle of every chart type; callers hold the lock
+        for candlestick, chart_type in self._chart_types:
+            period = floor_period(epoch, candlestick)
+            current = self._periods.get(chart_type)
+
+            if current is not None and period < current:
+                logger.debug(f'ignored trades older than the open candle of `{chart_type.name}`: {open_timestamp}')
+                continue
+
+            if current is None or period > current:
+                candle = Candle(
+                    chart_type, period_from(epoch, candlestick),
+                    open_value, high_value, low_value, close_value, volume, open_timestamp, close_timestamp,
+                    buy_volume, sell_volume,
+                )
+                self._periods[chart_type] = period
+                self._candles[chart_type] = candle
+                self._pending[(chart_type, period)] = candle
+                continue
+
+            candle = self._candles[chart_type]
+            candle.volume += volume
+            candle.buy_volume += buy_volume
+            candle.sell_volume += sell_volume
+            if high_value > candle.high_value:
+                candle.high_value = high_value
+            if low_value < candle.low_value:
+                candle.low_value = low_value
+            if open_timestamp < candle.open_timestamp:
+                candle.open_timestamp, candle.open_value = open_timestamp, open_value
+            if close_timestamp >= candle.close_timestamp:
+                candle.close_timestamp, candle.close_value = close_timestamp, close_value
+            self._pending[(chart_type, period)] = candle
+
+    def drain(self) -> List[Candle]:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+        return pending
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        candles = list(pending.values())
+        try:
+            self._seed(candles)
+
+            with self._lock:
+                items = [c.to_table() for c in candles]
+
+            with ChartTable.batch_write() as batch:
+                for item in items:
+                    batch.save(item)
+        except Exception:
+            # Pending again so that the next flush writes them, closed candles included, which nothing else would
+            with self._lock:
+                for key, candle in pending.items():
+                    self._pending.setdefault(key, candle)
+            raise
+
+        return len(candles)
+
+    def _seed(self, candles: List[Candle]) -> None:
+        if not self._unseeded:
+            return
+
+        firsts: Dict[ChartType, Candle] = {}
+        for candle in candles:
+            if candle.chart_type in self._unseeded and candle.chart_type not in firsts:
+                firsts[candle.chart_type] = candle
+
+        stored: Dict[ChartType, ChartTable] = {}
+        for chart_type, candle in firsts.items():
+            try:
+                stored[chart_type] = ChartTable.get(chart_type, candle.period_from)
+            except DoesNotExist:
+                pass
+
+        with self._lock:
+            for chart_type, candle in firsts.items():
+                if chart_type in stored:
+                    candle.merge(stored[chart_type])
+                self._unseeded.discard(chart_type)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy
+
+from libraries.exchanges.bitflyer import Candlestick
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECONDS = 1_000_000
+# 1970-01-01 was a Thursday, ISO weeks start on Monday
+_WEEK_OFFSET = 3 * Candlestick.ONE_DAY.value
+
+
+def to_microseconds(ts: datetime) -> int:
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(us))
+
+
+def floor_period(epoch: float, candlestick: Candlestick) -> int:
+    duration = candlestick.value
+    if candlestick is Candlestick.ONE_WEEK:
+        return int((epoch + _WEEK_OFFSET) // duration * duration - _WEEK_OFFSET)
+    return int(epoch // duration * duration)
+
+
+def floor_periods(us: numpy.ndarray, candlestick: Candlestick) -> numpy.ndarray:
+    # `floor_period()` of microseconds, for whole arrays at once
+    duration = candlestick.value * _MICROSECONDS
+    if candlestick is Candlestick.ONE_WEEK:
+        offset = _WEEK_OFFSET * _MICROSECONDS
+        return (us + offset) // duration * duration - offset
+    return us // duration * duration
+
+
+def period_from(epoch: float, candlestick: Candlestick) -> datetime:
+    return datetime.fromtimestamp(floor_period(epoch, candlestick), tz=timezone.utc)
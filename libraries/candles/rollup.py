@@ -0,0 +1,121 @@
+from typing import Dict, Optional, Union
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy
+
+from libraries.exchanges.bitflyer import Candlestick
+
+from .period import floor_periods, from_microseconds
+
+
+@dataclass(frozen=True)
+class Sticks:
+    # All timestamps are int64 microseconds since the epoch
+    period: numpy.ndarray
+    open: numpy.ndarray
+    high: numpy.ndarray
+    low: numpy.ndarray
+    close: numpy.ndarray
+    volume: numpy.ndarray
+    open_ts: numpy.ndarray
+    close_ts: numpy.ndarray
+    # Only sticks built from trades, whose takers are known, have these
+    buy_volume: Optional[numpy.ndarray] = None
+    sell_volume: Optional[numpy.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.period)
+
+    @classmethod
+    def from_ticks(cls, ts: numpy.ndarray, ltp: numpy.ndarray, volume: numpy.ndarray) -> 'Sticks':
+        ts = numpy.asarray(ts, dtype=numpy.int64)
+        ltp = numpy.asarray(ltp, dtype=numpy.float64)
+        volume = numpy.asarray(volume, dtype=numpy.float64)
+
+        # A later ticker with the same timestamp replaces the earlier one, as keying sticks by timestamp always did
+        order = numpy.argsort(ts, kind='stable')
+        ts, ltp, volume = ts[order], ltp[order], volume[order]
+        last = numpy.append(ts[1:] != ts[:-1], True) if len(ts) else numpy.ones(0, dtype=bool)
+        ts, ltp, volume = ts[last], ltp[last], volume[last]
+
+        return cls(ts, ltp, ltp, ltp, ltp, volume, ts, ts)
+
+    @classmethod
+    def from_trades(
+            cls, ts: numpy.ndarray, price: numpy.ndarray, size: numpy.ndarray, buy_size: numpy.ndarray,
+            sell_size: numpy.ndarray,
+    ) -> 'Sticks':
+        # Unlike tickers, trades at the same timestamp are all kept, as each carries volume of its own
+        ts = numpy.asarray(ts, dtype=numpy.int64)
+        price = numpy.asarray(price, dtype=numpy.float64)
+        return cls(
+            ts, price, price, price, price, numpy.asarray(size, dtype=numpy.float64), ts, ts,
+            numpy.asarray(buy_size, dtype=numpy.float64), numpy.asarray(sell_size, dtype=numpy.float64),
+        )
+
+    def to_dict(self) -> Dict[datetime, Dict[str, Union[float, datetime]]]:
+        sticks = {
+            from_microseconds(p): {
+                'high': float(h),
+                'low': float(lo),
+                'open': float(o),
+                'close': float(c),
+                'volume': float(v),
+                'open_ts': from_microseconds(ots),
+                'close_ts': from_microseconds(cts),
+            }
+            for p, o, h, lo, c, v, ots, cts in zip(
+                self.period.tolist(), self.open.tolist(), self.high.tolist(), self.low.tolist(),
+                self.close.tolist(), self.volume.tolist(), self.open_ts.tolist(), self.close_ts.tolist(),
+            )
+        }
+        if self.buy_volume is not None and self.sell_volume is not None:
+            for stick, b, s in zip(sticks.values(), self.buy_volume.tolist(), self.sell_volume.tolist()):
+                stick['buy_volume'], stick['sell_volume'] = b, s
+        return sticks
+
+
+def rollup(sticks: Sticks, candlestick: Candlestick) -> Sticks:
+    if not len(sticks):
+        return sticks
+
+    periods = floor_periods(sticks.period, candlestick)
+    index = numpy.arange(len(periods))
+
+    order = numpy.argsort(periods, kind='stable')
+    sorted_periods = periods[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_periods[1:] != sorted_periods[:-1]])
+    ends = numpy.r_[starts[1:], len(order)] - 1
+
+    # The earliest open and the latest close win; on a tie the stick seen first is kept
+    by_open = numpy.lexsort((index, sticks.open_ts, periods))[starts]
+    by_close = numpy.lexsort((-index, sticks.close_ts, periods))[ends]
+
+    def total(volume: Optional[numpy.ndarray]) -> Optional[numpy.ndarray]:
+        return None if volume is None else numpy.add.reduceat(volume[order], starts)
+
+    return Sticks(
+        period=sorted_periods[starts],
+        open=sticks.open[by_open],
+        high=numpy.maximum.reduceat(sticks.high[order], starts),
+        low=numpy.minimum.reduceat(sticks.low[order], starts),
+        close=sticks.close[by_close],
+        volume=numpy.add.reduceat(sticks.volume[order], starts),
+        open_ts=sticks.open_ts[by_open],
+        close_ts=sticks.close_ts[by_close],
+        buy_volume=total(sticks.buy_volume),
+        sell_volume=total(sticks.sell_volume),
+    )
+
+
+def rollup_all(ticks: Sticks) -> Dict[Candlestick, Sticks]:
+    sticks_of: Dict[Candlestick, Sticks] = {}
+
+    for c in Candlestick:
+        # Roll up from the coarsest timeframe whose periods nest into `c`, e.g. 15 minutes from 5 not from 10
+        source = next((sticks_of[f] for f in reversed(sticks_of.keys()) if c.value % f.value == 0), ticks)
+        sticks_of[c] = rollup(source, c)
+
+    return sticks_of
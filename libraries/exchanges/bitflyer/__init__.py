@@ -1,3 +1,4 @@
-from .client import BitFlyer, BitFlyerRealTime
-from .enumerations import PublicChannel, ProductCode, State, Candlestick, ChartType
-from .responses import Ticker
+from .client import BitFlyer, BitFlyerRealTime, RestPolicy
+from .enumerations import PublicChannel, ProductCode, State, Side, Candlestick, ChartType
+from .responses import Ticker, Execution
+from .board import OrderBook
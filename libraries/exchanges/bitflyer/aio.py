@@ -0,0 +1,298 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import asyncio
+import json
+import logging
+from collections import deque
+
+import aiohttp
+
+from .board import OrderBook
+from .client import BitFlyer, BitFlyerRealTime, RestPolicy
+from .enumerations import ProductCode, PublicChannel
+from .ratelimit import TokenBucket
+from .responses import Ticker, Execution
+
+logger = logging.getLogger(__name__)
+
+AsyncHandler = Callable[[Any], Union[None, Awaitable[None]]]
+
+_STOP = object()
+
+
+class AsyncBitFlyer:
+    # The REST API on the caller's event loop, with the pool, timeout, retries and rate limit of `BitFlyer`. Clients
+    # of both kinds drawing from the same budget can be given a shared `bucket`.
+
+    URL = BitFlyer.URL
+    MAX_COUNT = BitFlyer.MAX_COUNT
+    RETRY_STATUSES = BitFlyer.RETRY_STATUSES
+
+    def __init__(
+            self, session: Optional[aiohttp.ClientSession] = None, policy: RestPolicy = RestPolicy(),
+            bucket: Optional[TokenBucket] = None,
+    ) -> None:
+        # A session given by the caller is shared and left open by `close()`
+        self.policy = policy
+        self.bucket = bucket or TokenBucket((policy.max_requests - policy.burst) / policy.period, policy.burst)
+
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self) -> 'AsyncBitFlyer':
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.policy.max_workers),
+                timeout=aiohttp.ClientTimeout(total=self.policy.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_ticker(self, product_code: ProductCode) -> Ticker:
+        return Ticker.from_bytes(await self._get('ticker', product_code=product_code.name))
+
+    async def get_tickers(self, product_codes: Iterable[ProductCode]) -> Dict[ProductCode, Ticker]:
+        product_codes = list(product_codes)
+        return dict(zip(product_codes, await asyncio.gather(*(self.get_ticker(p) for p in product_codes))))
+
+    async def get_board(self, product_code: ProductCode) -> OrderBook:
+        book = OrderBook(product_code)
+        book.apply_snapshot(json.loads(await self._get('board', product_code=product_code.name)))
+        return book
+
+    async def get_executions(
+            self, product_code: ProductCode, count: int = MAX_COUNT, before: Optional[int] = None,
+            after: Optional[int] = None,
+    ) -> List[Execution]:
+        params: Dict[str, Any] = {'product_code': product_code.name, 'count': count}
+        if before is not None:
+            params['before'] = before
+        if after is not None:
+            params['after'] = after
+        return Execution.from_list(json.loads(await self._get('executions', **params)))
+
+    async def _get(self, path: str, **params: Any) -> bytes:
+        # Retried as `BitFlyer._get` does, every attempt taking a token; the last failure is raised
+        attempt = 0
+        while True:
+            wait = self.bucket.try_acquire()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.bucket.try_acquire()
+
+            retry_after = None
+            try:
+                async with self.session.get(f'{self.URL}/{path}', params=params) as response:
+                    if response.status not in self.RETRY_STATUSES or attempt >= self.policy.max_retries:
+                        response.raise_for_status()
+                        return await response.read()
+                    reason = f'HTTP {response.status}'
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.policy.max_retries:
+                    raise
+                reason = repr(e)
+
+            logger.warning(f'retrying `{path}` after {reason}')
+            await asyncio.sleep(self.policy.delay(attempt, retry_after))
+            attempt += 1
+
+
+class Subscription:
+    # Messages of one channel as an async iterator; when the consumer falls `max_queued` messages behind, the oldest
+    # ones are dropped rather than holding up the connection every channel shares
+
+    def __init__(self, channel: PublicChannel, product_code: ProductCode, max_queued: int = 1000) -> None:
+        self.channel = channel
+        self.product_code = product_code
+        self.max_queued = max_queued
+        self.dropped = 0
+
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self
+
+    async def __anext__(self) -> Any:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+
+        message = self._queue.popleft()
+        if message is _STOP:
+            self._queue.append(_STOP)
+            raise StopAsyncIteration
+        return message
+
+    def _put(self, message: Any) -> None:
+        if len(self._queue) >= self.max_queued:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(message)
+        self._ready.set()
+
+    def _close(self) -> None:
+        self._queue.append(_STOP)
+        self._ready.set()
+
+
+class AsyncBitFlyerRealTime:
+    # Any combination of channels and products over a single connection, run on the caller's event loop; messages are
+    # handed to callbacks, which may be coroutines, and to `Subscription` iterators
+
+    ENDPOINT = BitFlyerRealTime.ENDPOINT
+
+    def __init__(
+            self, endpoint: str = ENDPOINT, reconnect_interval: float = 1.0, heartbeat: float = 30.0,
+            session: Optional[aiohttp.ClientSession] = None,
+    ) -> None:
+        self.endpoint = endpoint
+        self.reconnect_interval = reconnect_interval
+        self.heartbeat = heartbeat
+
+        self._session = session
+        self._owns_session = session is None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._handlers_of: Dict[str, List[AsyncHandler]] = {}
+        self._subscriptions_of: Dict[str, List[Subscription]] = {}
+        self._channel_of: Dict[str, Tuple[PublicChannel, ProductCode]] = {}
+        self._books: List[OrderBook] = []
+        self._connected: Optional[asyncio.Event] = None
+        self._closed = False
+
+    async def __aenter__(self) -> 'AsyncBitFlyerRealTime':
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    @property
+    def connected(self) -> asyncio.Event:
+        # Created lazily, to belong to the loop the client runs on
+        if self._connected is None:
+            self._connected = asyncio.Event()
+        return self._connected
+
+    async def subscribe(
+            self, channel: PublicChannel, product_code: ProductCode, handler: Optional[AsyncHandler] = None,
+    ) -> None:
+        channel_name = self._register(channel, product_code)
+        if handler is not None:
+            self._handlers_of[channel_name].append(handler)
+        await self._subscribe(channel_name)
+
+    async def order_book(self, product_code: ProductCode) -> OrderBook:
+        # A book of `product_code` kept up to date from its board snapshots and diffs
+        book = OrderBook(product_code)
+        await self.subscribe(PublicChannel.lightning_board_snapshot, product_code, book.apply_snapshot)
+        await self.subscribe(PublicChannel.lightning_board, product_code, book.apply_diff)
+        self._books.append(book)
+        return book
+
+    async def messages(
+            self, channel: PublicChannel, product_code: ProductCode, max_queued: int = 1000,
+    ) -> Subscription:
+        channel_name = self._register(channel, product_code)
+        subscription = Subscription(channel, product_code, max_queued)
+        self._subscriptions_of[channel_name].append(subscription)
+        await self._subscribe(channel_name)
+        return subscription
+
+    async def run(self) -> None:
+        # Keeps the connection up, reconnecting and subscribing again after it drops, until `close()` is called
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+
+        while not self._closed:
+            try:
+                async with self._session.ws_connect(self.endpoint, heartbeat=self.heartbeat) as ws:
+                    self._ws = ws
+                    for channel_name in self._channel_of:
+                        await self._subscribe(channel_name)
+                    self.connected.set()
+                    logger.info('websocket connection has been established')
+
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._on_message(msg.data)
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            logger.error(ws.exception())
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(e)
+            finally:
+                self._ws = None
+                self.connected.clear()
+                # Diffs sent while disconnected are lost, so books wait for the snapshot sent once subscribed again
+                for book in self._books:
+                    book.invalidate()
+
+            if not self._closed:
+                logger.info('connection closed')
+                await asyncio.sleep(self.reconnect_interval)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+        for subscriptions in self._subscriptions_of.values():
+            for s in subscriptions:
+                s._close()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _register(self, channel: PublicChannel, product_code: ProductCode) -> str:
+        channel_name = f'{channel.name}_{product_code.name}'
+        self._channel_of[channel_name] = (channel, product_code)
+        self._handlers_of.setdefault(channel_name, [])
+        self._subscriptions_of.setdefault(channel_name, [])
+        return channel_name
+
+    async def _subscribe(self, channel_name: str) -> None:
+        # Sent again by `run()` on every connection, so nothing is lost while disconnected
+        if self._ws is None or self._ws.closed:
+            return
+        await self._ws.send_str(json.dumps({
+            'method': 'subscribe',
+            'params': {'channel': channel_name},
+        }))
+
+    async def _on_message(self, json_str: str) -> None:
+        msg = json.loads(json_str)
+        params = msg.get('params')
+        if not params or params.get('channel') not in self._channel_of:
+            return
+
+        channel_name: str = params['channel']
+        message = self._decode(self._channel_of[channel_name][0], params['message'])
+
+        for s in self._subscriptions_of[channel_name]:
+            s._put(message)
+        for handler in self._handlers_of[channel_name]:
+            try:
+                result = handler(message)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(e)
+
+    @staticmethod
+    def _decode(channel: PublicChannel, message: Any) -> Any:
+        if channel is PublicChannel.lightning_ticker:
+            return Ticker.from_dict(message)
+        if channel is PublicChannel.lightning_executions:
+            return Execution.from_list(message)
+        return message
@@ -0,0 +1,150 @@
+from typing import Dict, Iterable, Iterator, Tuple
+
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy
+
+from libraries.candles.period import from_microseconds, to_microseconds
+
+from .enumerations import ProductCode, State
+from .responses import Ticker
+
+logger = logging.getLogger(__name__)
+
+TICKER_DTYPE = numpy.dtype([
+    ('timestamp', '<i8'),  # microseconds since the epoch
+    ('tick_id', '<i8'),
+    ('state', 'u1'),  # `State.value`
+    ('best_bid', '<f8'),
+    ('best_ask', '<f8'),
+    ('best_bid_size', '<f8'),
+    ('best_ask_size', '<f8'),
+    ('total_bid_depth', '<f8'),
+    ('total_ask_depth', '<f8'),
+    ('market_bid_size', '<f8'),
+    ('market_ask_size', '<f8'),
+    ('ltp', '<f8'),
+    ('volume', '<f8'),
+    ('volume_by_product', '<f8'),
+])
+
+_FLOAT_FIELDS = TICKER_DTYPE.names[3:]
+
+
+class TickArchive:
+    # Append-only files of `TICKER_DTYPE` records, one per product and UTC day, without any header so that
+    # the number of complete records is always `file size // itemsize` while a writer is appending
+
+    def __init__(self, root: str = os.environ.get('TICK_ARCHIVE_DIR', 'archive')) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._fds: Dict[Tuple[ProductCode, date], int] = {}
+        self._last_timestamp_of: Dict[Tuple[ProductCode, date], int] = {}
+
+    def __enter__(self) -> 'TickArchive':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def path(self, product_code: ProductCode, day: date) -> str:
+        return os.path.join(self.root, product_code.name, f'{day.isoformat()}.ticks')
+
+    def append(self, ticker: Ticker) -> bool:
+        return self.extend((ticker, )) == 1
+
+    def extend(self, tickers: Iterable[Ticker]) -> int:
+        records_of: Dict[Tuple[ProductCode, date], list] = {}
+
+        with self._lock:
+            for t in tickers:
+                key = (t.product_code, t.timestamp.astimezone(timezone.utc).date())
+                ts = to_microseconds(t.timestamp)
+
+                # Records are kept sorted by timestamp so that readers can binary-search them
+                if ts < self._last_timestamp(key):
+                    logger.debug(f'dropped a ticker older than the last archived one: {t.tick_id}')
+                    continue
+                self._last_timestamp_of[key] = ts
+
+                records_of.setdefault(key, []).append((
+                    ts, t.tick_id, t.state.value, *(getattr(t, f) for f in _FLOAT_FIELDS),
+                ))
+
+            for key, records in records_of.items():
+                # A single `write()` on an O_APPEND descriptor, readers never see records out of order
+                os.write(self._fd(key), numpy.array(records, dtype=TICKER_DTYPE).tobytes())
+
+        return sum(len(r) for r in records_of.values())
+
+    def close(self) -> None:
+        # Records are on disk once it returns, not only handed to the OS, as it is called on the way out
+        with self._lock:
+            for fd in self._fds.values():
+                os.fsync(fd)
+                os.close(fd)
+            self._fds = {}
+
+    def _fd(self, key: Tuple[ProductCode, date]) -> int:
+        if key not in self._fds:
+            # Days are appended in order, so the descriptors of past days are not needed anymore
+            for k in [k for k in self._fds.keys() if k[0] is key[0] and k[1] < key[1]]:
+                os.close(self._fds.pop(k))
+
+            path = self.path(*key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path) and (size := os.path.getsize(path)) % TICKER_DTYPE.itemsize:
+                # Left over by a writer that died in the middle of a record
+                os.truncate(path, size - size % TICKER_DTYPE.itemsize)
+            self._fds[key] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        return self._fds[key]
+
+    def _last_timestamp(self, key: Tuple[ProductCode, date]) -> int:
+        if key not in self._last_timestamp_of:
+            records = self.read(*key)
+            self._last_timestamp_of[key] = int(records['timestamp'][-1]) if len(records) else -1
+        return self._last_timestamp_of[key]
+
+    def read(self, product_code: ProductCode, day: date) -> numpy.ndarray:
+        path = self.path(product_code, day)
+        try:
+            n = os.path.getsize(path) // TICKER_DTYPE.itemsize
+        except FileNotFoundError:
+            n = 0
+
+        if n == 0:
+            return numpy.empty(0, dtype=TICKER_DTYPE)
+
+        return numpy.memmap(path, dtype=TICKER_DTYPE, mode='r', shape=(n, ))
+
+    def scan(self, product_code: ProductCode, _from: datetime, until: datetime) -> Iterator[numpy.ndarray]:
+        lower, upper = to_microseconds(_from), to_microseconds(until)
+        day = _from.astimezone(timezone.utc).date()
+        last_day = until.astimezone(timezone.utc).date()
+
+        while day <= last_day:
+            records = self.read(product_code, day)
+            timestamps = records['timestamp']
+            i, j = numpy.searchsorted(timestamps, lower, 'left'), numpy.searchsorted(timestamps, upper, 'right')
+            if i < j:
+                yield records[i:j]
+            day += timedelta(days=1)
+
+    def load(self, product_code: ProductCode, _from: datetime, until: datetime) -> numpy.ndarray:
+        chunks = list(self.scan(product_code, _from, until))
+        if not chunks:
+            return numpy.empty(0, dtype=TICKER_DTYPE)
+        return numpy.concatenate(chunks)
+
+    @staticmethod
+    def to_tickers(product_code: ProductCode, records: numpy.ndarray) -> Iterator[Ticker]:
+        states = {s.value: s for s in State}
+        for r in records.tolist():
+            yield Ticker(
+                product_code, states[r[2]], from_microseconds(r[0]), r[1],
+                *r[3:],
+            )
@@ -0,0 +1,161 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import threading
+
+from sortedcontainers import SortedDict
+
+from .enumerations import ProductCode, PublicChannel, Side
+
+Level = Tuple[float, float]
+
+
+class _Levels:
+    # Price levels of one side as sizes in a `SortedDict` keyed by prices for bids and negated prices for asks, so that
+    # the best level is always the last one: reading it is O(1), setting any level O(log n), and reading the `k` best
+    # ones, or those up to a price, O(log n + k).
+
+    def __init__(self, sign: int) -> None:
+        self.sign = sign
+        self._sizes: SortedDict = SortedDict()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def clear(self) -> None:
+        self._sizes.clear()
+
+    def set(self, price: float, size: float) -> None:
+        if size <= 0:
+            self._sizes.pop(self.sign * price, None)
+        else:
+            self._sizes[self.sign * price] = size
+
+    def best(self) -> Optional[Level]:
+        if not self._sizes:
+            return None
+        key, size = self._sizes.peekitem(-1)
+        return self.sign * key, size
+
+    def trim(self, mid_price: float) -> None:
+        # Removes the levels on the wrong side of `mid_price`, better than it
+        while self._sizes and self._sizes.peekitem(-1)[0] > self.sign * mid_price:
+            self._sizes.popitem(-1)
+
+    def top(self, n: Optional[int] = None) -> List[Level]:
+        if n is None:
+            keys: Iterable[float] = reversed(self._sizes)
+        else:
+            keys = self._sizes.islice(max(len(self._sizes) - max(n, 0), 0), reverse=True)
+        return [(self.sign * k, self._sizes[k]) for k in keys]
+
+    def depth(self, price_limit: Optional[float] = None) -> float:
+        # Total size of the levels at or better than `price_limit`, of all of them by default
+        if price_limit is None:
+            return sum(self._sizes.values())
+        return sum(self._sizes[k] for k in self._sizes.irange(minimum=self.sign * price_limit))
+
+    def vwap(self, size: float) -> Optional[float]:
+        # Average price of taking `size` from the best level on, or None when the side is not that deep
+        remaining, cost = size, 0.0
+        for key in reversed(self._sizes):
+            taken = min(remaining, self._sizes[key])
+            cost += taken * self.sign * key
+            remaining -= taken
+            if remaining <= 0:
+                return cost / size
+        return None
+
+
+class OrderBook:
+    # Kept up to date from `lightning_board_snapshot` and `lightning_board` messages, which have the shape
+    # {'mid_price': float, 'bids': [{'price': float, 'size': float}, ...], 'asks': [...]}; a size of 0 in a diff
+    # removes the level. Diffs only apply to the book they were sent for, so the book is `stale` and ignores them until
+    # a snapshot has been applied, at first and again whenever some may have been missed, e.g. while disconnected.
+
+    def __init__(self, product_code: ProductCode) -> None:
+        self.product_code = product_code
+        self.mid_price: Optional[float] = None
+        self.stale = True
+        self._bids = _Levels(1)
+        self._asks = _Levels(-1)
+        self._lock = threading.Lock()
+
+    def apply_snapshot(self, message: Dict[str, Any]) -> None:
+        with self._lock:
+            self._bids.clear()
+            self._asks.clear()
+            self._apply(message)
+            self.stale = False
+
+    def apply_diff(self, message: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self.stale:
+                self._apply(message)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.stale = True
+
+    def handle(self, update: Tuple[Optional[PublicChannel], Optional[Dict[str, Any]]]) -> None:
+        # Messages of both board channels in the order they were received, as `(channel, message)`; `(None, None)`
+        # when some may have been missed since
+        channel, message = update
+        if channel is PublicChannel.lightning_board_snapshot:
+            self.apply_snapshot(message)
+        elif channel is PublicChannel.lightning_board:
+            self.apply_diff(message)
+        else:
+            self.invalidate()
+
+    def _apply(self, message: Dict[str, Any]) -> None:
+        if message.get('mid_price') is not None:
+            self.mid_price = message['mid_price']
+        for level in message.get('bids', ()):
+            self._bids.set(level['price'], level['size'])
+        for level in message.get('asks', ()):
+            self._asks.set(level['price'], level['size'])
+
+        # Removals of levels the market has traded through are not always sent; those are on the wrong side of the mid
+        if self.mid_price is not None:
+            self._bids.trim(self.mid_price)
+            self._asks.trim(self.mid_price)
+
+    def _side(self, side: Side) -> _Levels:
+        # The levels an order of `side` is matched against
+        return self._asks if side is Side.BUY else self._bids
+
+    @property
+    def best_bid(self) -> Optional[Level]:
+        with self._lock:
+            return self._bids.best()
+
+    @property
+    def best_ask(self) -> Optional[Level]:
+        with self._lock:
+            return self._asks.best()
+
+    @property
+    def spread(self) -> Optional[float]:
+        with self._lock:
+            bid, ask = self._bids.best(), self._asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def bids(self, n: Optional[int] = None) -> List[Level]:
+        with self._lock:
+            return self._bids.top(n)
+
+    def asks(self, n: Optional[int] = None) -> List[Level]:
+        with self._lock:
+            return self._asks.top(n)
+
+    def depth(self, side: Side, price_limit: Optional[float] = None) -> float:
+        # Size available to an order of `side` at `price_limit` or better
+        with self._lock:
+            return self._side(side).depth(price_limit)
+
+    def vwap(self, side: Side, size: float) -> Optional[float]:
+        # Average price an order of `side` and `size` would be filled at right now
+        with self._lock:
+            return self._side(side).vwap(size)
@@ -0,0 +1,237 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy
+import pandas
+
+from .enumerations import ProductCode, Candlestick, ChartType
+
+logger = logging.getLogger(__name__)
+
+# Queries the table for candles of a range, of every column when none are given
+Fetch = Callable[[datetime, datetime, Optional[Sequence[str]]], pandas.DataFrame]
+Part = Tuple[numpy.ndarray, Dict[str, numpy.ndarray]]
+
+_CANDLESTICK_OF: Dict[ChartType, Candlestick] = {
+    getattr(ChartType, f'{p.name}_{c.name}'): c for p in ProductCode for c in Candlestick
+}
+_NS = 1_000_000_000
+
+
+def _ns(ts: datetime) -> int:
+    return pandas.Timestamp(ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).value
+
+
+def _datetime(ns: int) -> datetime:
+    return pandas.Timestamp(ns, tz=timezone.utc).to_pydatetime()
+
+
+class CandleCache:
+    # Candles of `ChartTable` that can not change anymore, in NPY files of `periods_per_block` periods of a chart type
+    # each, or of `max_span` for long candlesticks. A block is written once the last of its periods has been closed for
+    # `settle`, so whatever is still open or may yet be merged into comes from the table every time. Files are evicted
+    # least recently used first once they take more than `max_bytes`.
+    # `invalidate()` removes the blocks of periods rewritten in the table, but only from the cache of the host doing
+    # it; caches elsewhere, e.g. of a backfill run on another host, read a block again once it is older than `ttl`.
+
+    _defaults: Dict[str, 'CandleCache'] = {}
+    _defaults_lock = threading.Lock()
+
+    def __init__(
+            self, root: str, max_bytes: int = 1 << 30, periods_per_block: int = 1440,
+            max_span: timedelta = timedelta(days=7), settle: timedelta = timedelta(minutes=5),
+            ttl: timedelta = timedelta(hours=1),
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.periods_per_block = periods_per_block
+        self.max_span = max_span
+        self.settle = settle
+        self.ttl = ttl
+
+        # Sizes of the files, least recently used first, and their total; found by walking `root` once, and kept up
+        # to date as files are written, read and removed rather than walking it again
+        self._lock = threading.Lock()
+        self._files: Optional['OrderedDict[str, int]'] = None
+        self._bytes = 0
+
+    @classmethod
+    def default(cls) -> Optional['CandleCache']:
+        # The cache `CANDLE_CACHE_DIR` points at, shared by the whole process, or None when it is not set
+        root = os.environ.get('CANDLE_CACHE_DIR')
+        if not root:
+            return None
+
+        with cls._defaults_lock:
+            if root not in cls._defaults:
+                cls._defaults[root] = cls(
+                    root, int(os.environ.get('CANDLE_CACHE_MAX_BYTES', 1 << 30)),
+                    ttl=timedelta(seconds=float(os.environ.get('CANDLE_CACHE_TTL_SECONDS', 3600))),
+                )
+            return cls._defaults[root]
+
+    def path(self, chart_type: ChartType, block: int) -> str:
+        return os.path.join(self.root, chart_type.name, f'{block}.npy')
+
+    def load(
+            self, chart_type: ChartType, lower: datetime, upper: datetime, columns: Sequence[str], fetch: Fetch,
+    ) -> pandas.DataFrame:
+        # Candles of [lower, upper], both inclusive as in `between`; `fetch` queries the table for the same range
+        span = self._span(chart_type)
+        lower_ns, upper_ns = _ns(lower), _ns(upper)
+        # Periods are not aligned with blocks, e.g. weeks, so the last one of a block may close a period after its end
+        duration = _CANDLESTICK_OF[chart_type].value * _NS
+        closed_until = time.time_ns() - int(self.settle.total_seconds() * _NS) - duration
+        first = lower_ns // span
+        last = min(upper_ns // span, closed_until // span - 1)
+
+        parts: Dict[int, Part] = {}
+        missing: List[int] = []
+        for block in range(first, last + 1):
+            part = self._read(chart_type, block, columns)
+            if part is None:
+                missing.append(block)
+            else:
+                parts[block] = part
+
+        # Runs of missing blocks are fetched with a query each, with every column so that any projection is served
+        wrote = False
+        for start, stop in self._runs(missing):
+            df = fetch(_datetime(start * span), _datetime(stop * span - 1000), None)
+            index = df.index.asi8
+            bounds = numpy.searchsorted(index, numpy.arange(start, stop + 1) * span)
+            for block, i, j in zip(range(start, stop), bounds[:-1], bounds[1:]):
+                self._write(chart_type, block, index[i:j], {c: df[c].to_numpy()[i:j] for c in df.columns})
+                parts[block] = index[i:j], {c: df[c].to_numpy()[i:j] for c in columns}
+            wrote = True
+
+        tail: List[Part] = []
+        if upper_ns >= (last + 1) * span:
+            tail_from = _datetime(max(lower_ns, (last + 1) * span))
+            df = fetch(tail_from, upper, columns)
+            tail.append((df.index.asi8, {c: df[c].to_numpy() for c in columns}))
+
+        if wrote:
+            self.evict()
+
+        ordered = [parts[b] for b in sorted(parts)] + tail
+        index = numpy.concatenate([p[0] for p in ordered]) if ordered else numpy.empty(0, dtype=numpy.int64)
+        mask = (index >= lower_ns) & (index <= upper_ns)
+        data = {
+            c: numpy.concatenate([p[1][c] for p in ordered])[mask] if ordered else numpy.empty(0) for c in columns
+        }
+
+        df = pandas.DataFrame(data, index=pandas.to_datetime(index[mask], utc=True), columns=list(columns))
+        df.index.name = 'Date'
+        return df
+
+    def invalidate(self, chart_type: ChartType, periods: Iterable[datetime]) -> int:
+        span = self._span(chart_type)
+        return sum(self._remove(self.path(chart_type, block)) for block in {_ns(p) // span for p in periods})
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            self._index()
+            return self._bytes
+
+    def evict(self) -> None:
+        while True:
+            with self._lock:
+                files = self._index()
+                if self._bytes <= self.max_bytes or not files:
+                    return
+                path = next(iter(files))
+            self._remove(path)
+
+    def _index(self) -> 'OrderedDict[str, int]':
+        # Callers hold the lock
+        if self._files is None:
+            found = []
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    if not name.endswith('.npy'):
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_mtime, path, stat.st_size))
+
+            self._files = OrderedDict((path, size) for _, path, size in sorted(found))
+            self._bytes = sum(self._files.values())
+        return self._files
+
+    def _used(self, path: str, size: Optional[int] = None) -> None:
+        with self._lock:
+            files = self._index()
+            if size is not None:
+                self._bytes += size - files.get(path, 0)
+                files[path] = size
+            if path in files:
+                files.move_to_end(path)
+
+    def _remove(self, path: str) -> bool:
+        with self._lock:
+            self._bytes -= self._index().pop(path, 0)
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _span(self, chart_type: ChartType) -> int:
+        duration = _CANDLESTICK_OF[chart_type].value
+        return max(duration, min(duration * self.periods_per_block, int(self.max_span.total_seconds()))) * _NS
+
+    @staticmethod
+    def _runs(blocks: List[int]) -> List[Tuple[int, int]]:
+        runs: List[Tuple[int, int]] = []
+        for b in blocks:
+            if runs and runs[-1][1] == b:
+                runs[-1] = (runs[-1][0], b + 1)
+            else:
+                runs.append((b, b + 1))
+        return runs
+
+    def _read(self, chart_type: ChartType, block: int, columns: Sequence[str]) -> Optional[Part]:
+        # Files are never touched once written, so their mtime is when they were
+        path = self.path(chart_type, block)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl.total_seconds():
+                return None
+            records = numpy.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(e)
+            return None
+
+        if any(c not in records.dtype.names for c in columns):
+            return None
+
+        self._used(path)
+        return records['Date'], {c: records[c] for c in columns}
+
+    def _write(
+            self, chart_type: ChartType, block: int, index: numpy.ndarray, values: Dict[str, numpy.ndarray],
+    ) -> None:
+        records = numpy.empty(len(index), dtype=[('Date', '<i8')] + [(c, '<f8') for c in values])
+        records['Date'] = index
+        for c, v in values.items():
+            records[c] = v
+
+        path = self.path(chart_type, block)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            numpy.save(f, records)
+        os.replace(tmp, path)
+        self._used(path, os.path.getsize(path))
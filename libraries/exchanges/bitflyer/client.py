@@ -1,36 +1,169 @@
-from typing import Callable, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import json
 import requests
 import time
 import logging
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from threading import Thread
 
 import websocket
+from requests.adapters import HTTPAdapter
 from websocket._app import WebSocketApp
 from websocket._exceptions import WebSocketConnectionClosedException
 
+from .board import OrderBook
+from .dispatcher import Dispatcher, DispatchPolicy, ChannelStats, Overflow
 from .enumerations import ProductCode, Channel, PublicChannel
-from .responses import Ticker
+from .ratelimit import TokenBucket
+from .responses import Ticker, Execution
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+@dataclass(frozen=True)
+class RestPolicy:
+    # bitFlyer allows 500 requests per 5 minutes from an IP address to the public API
+    max_requests: int = 500
+    period: float = 300.0
+    # Requests that may go out at once; the bucket refills slower by as many, so no window of `period` exceeds the limit
+    burst: int = 20
+    # Connections kept alive in the pool, and threads fetching pages concurrently
+    max_workers: int = 4
+    timeout: float = 10.0
+    max_retries: int = 3
+    # Seconds before the first retry, doubled on every further one up to `max_backoff`
+    backoff: float = 0.5
+    max_backoff: float = 8.0
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # Seconds before retrying after `attempt` failed ones; as long as the server asks in `Retry-After` when it does,
+        # since retrying any sooner is only throttled again
+        if retry_after is not None:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+        return min(self.backoff * 2 ** attempt, self.max_backoff)
+
+
 class BitFlyer:
     URL = 'https://api.bitflyer.com/v1'
+    # Most executions a page of `/executions` has
+    MAX_COUNT = 500
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+    def __init__(self, policy: RestPolicy = RestPolicy()) -> None:
+        self.policy = policy
+        self.bucket = TokenBucket((policy.max_requests - policy.burst) / policy.period, policy.burst)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.max_workers)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def __enter__(self) -> 'BitFlyer':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._session.close()
 
     def get_ticker(self, product_code: ProductCode) -> Ticker:
-        response = requests.get(f'{self.URL}/ticker', params={'product_code': product_code.name})
-        response.raise_for_status()
-        return Ticker.from_dict(response.json())
+        return Ticker.from_bytes(self._get('ticker', product_code=product_code.name).content)
+
+    def get_tickers(self, product_codes: Iterable[ProductCode]) -> Dict[ProductCode, Ticker]:
+        return self._map(self.get_ticker, product_codes)
+
+    def get_board(self, product_code: ProductCode) -> OrderBook:
+        book = OrderBook(product_code)
+        book.apply_snapshot(self._get('board', product_code=product_code.name).json())
+        return book
+
+    def get_boards(self, product_codes: Iterable[ProductCode]) -> Dict[ProductCode, OrderBook]:
+        return self._map(self.get_board, product_codes)
+
+    def get_executions(
+            self, product_code: ProductCode, count: int = MAX_COUNT, before: Optional[int] = None,
+            after: Optional[int] = None,
+    ) -> List[Execution]:
+        # A page of executions with ids between `after` and `before`, both exclusive, newest first
+        params: Dict[str, Any] = {'product_code': product_code.name, 'count': count}
+        if before is not None:
+            params['before'] = before
+        if after is not None:
+            params['after'] = after
+        return Execution.from_list(self._get('executions', **params).json())
+
+    def iter_executions(
+            self, product_code: ProductCode, before: Optional[int] = None, after: Optional[int] = None,
+            count: int = MAX_COUNT,
+    ) -> Iterator[List[Execution]]:
+        # Pages going back from `before` until `after`, or as far as the history the exchange keeps
+        while True:
+            page = self.get_executions(product_code, count, before, after)
+            if page:
+                yield page
+            if len(page) < count:
+                return
+            before = page[-1].id
+
+    def get_executions_between(
+            self, product_code: ProductCode, after: int, before: int, num_of_segments: Optional[int] = None,
+    ) -> List[Execution]:
+        # Ids are split into as many ranges as there are workers by default, each paged through on its own thread.
+        # Every range ends with its upper edge included, so that no id falls between two of them.
+        n = max(min(num_of_segments or self.policy.max_workers, before - after - 1), 1)
+        edges = [after + (before - after) * i // n for i in range(n)] + [before - 1]
+
+        def fetch(i: int) -> List[Execution]:
+            executions: List[Execution] = []
+            for page in self.iter_executions(product_code, edges[i + 1] + 1, edges[i]):
+                executions.extend(page)
+            return executions
+
+        with ThreadPoolExecutor(max_workers=self.policy.max_workers) as executor:
+            segments = list(executor.map(fetch, range(n)))
+        return [e for executions in reversed(segments) for e in executions]
+
+    def _map(self, fetch: Callable[[ProductCode], Any], product_codes: Iterable[ProductCode]) -> Dict[ProductCode, Any]:
+        product_codes = list(product_codes)
+        with ThreadPoolExecutor(max_workers=self.policy.max_workers) as executor:
+            return dict(zip(product_codes, executor.map(fetch, product_codes)))
+
+    def _get(self, path: str, **params: Any) -> requests.Response:
+        # Every attempt takes a token, retries included; the last failure is raised
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                response = self._session.get(f'{self.URL}/{path}', params=params, timeout=self.policy.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.policy.max_retries:
+                    raise
+                reason = repr(e)
+            else:
+                if response.status_code not in self.RETRY_STATUSES or attempt >= self.policy.max_retries:
+                    response.raise_for_status()
+                    return response
+                reason = f'HTTP {response.status_code}'
+                retry_after = response.headers.get('Retry-After')
+
+            logger.warning(f'retrying `{path}` after {reason}')
+            time.sleep(self.policy.delay(attempt, retry_after))
+            attempt += 1
 
 
 class BitFlyerRealTime:
     ENDPOINT = 'wss://ws.lightstream.bitflyer.com/json-rpc'
 
-    def __init__(self) -> None:
+    def __init__(self, dispatch_policy: DispatchPolicy = DispatchPolicy()) -> None:
         websocket.enableTrace(False)
         self._ws_app = websocket.WebSocketApp(
             self.ENDPOINT,
@@ -41,28 +174,65 @@ class BitFlyerRealTime:
         )
 
         self._message_handler_of: Dict[str, Callable] = {}
+        # Handlers run on the workers of the dispatcher rather than on the thread reading frames
+        self._dispatcher = Dispatcher(dispatch_policy)
+        # Board channels and the dispatcher channel of their book, shared by snapshots and diffs
+        self._book_of: Dict[str, str] = {}
+        self._thread: Optional[Thread] = None
+        self._closed = False
 
     def start(self) -> None:
         logger.info('websocket server is now starting')
+        self._dispatcher.start()
 
         def run(ws: WebSocketApp) -> None:
-            while True:
+            while not self._closed:
                 ws.run_forever(ping_interval=30, ping_timeout=10)
                 time.sleep(1)
 
-        t = Thread(target=run, args=(self._ws_app, ))
-        t.start()
+        self._thread = Thread(target=run, args=(self._ws_app, ))
+        self._thread.start()
 
         logger.info('websocket server has started')
 
+    def close(self) -> None:
+        # Stops reading the websocket, and returns once the messages received so far have been handled
+        self._closed = True
+        self._ws_app.close()
+        if self._thread is not None:
+            self._thread.join()
+        self._dispatcher.close()
+
     def subscribe(self, channel: Channel, product_code: ProductCode, handler: Callable) -> None:
         channel_name = f'{channel.name}_{product_code.name}'
         self._message_handler_of[channel_name] = handler
+        self._dispatcher.register(channel_name, handler)
         try:
             self._subscribe(channel_name)
         except WebSocketConnectionClosedException:
             pass
 
+    def order_book(self, product_code: ProductCode) -> OrderBook:
+        # A book of `product_code` kept up to date from its board snapshots and diffs. Both go through one dispatcher
+        # channel, so that they are applied in the order received whatever the number of workers, and that channel
+        # blocks rather than drop any diff.
+        book = OrderBook(product_code)
+        book_channel = f'book_{product_code.name}'
+        self._dispatcher.register(book_channel, book.handle, Overflow.BLOCK)
+        for channel in (PublicChannel.lightning_board_snapshot, PublicChannel.lightning_board):
+            channel_name = f'{channel.name}_{product_code.name}'
+            self._book_of[channel_name] = book_channel
+            self._message_handler_of[channel_name] = book.handle
+            try:
+                self._subscribe(channel_name)
+            except WebSocketConnectionClosedException:
+                pass
+        return book
+
+    def stats(self) -> Dict[str, ChannelStats]:
+        # Queue depth, handled and dropped messages, and lag of handlers per channel
+        return self._dispatcher.stats()
+
     def _subscribe(self, channel: str) -> None:
         self._ws_app.send(json.dumps({
             'method': 'subscribe',
@@ -74,16 +244,27 @@ class BitFlyerRealTime:
         params = msg['params']
         channel: str = params['channel']
         message = params['message']
-        handler = self._message_handler_of[channel]
 
         if channel.startswith(PublicChannel.lightning_ticker.name):
-            handler(Ticker.from_dict(message))
+            message = Ticker.from_dict(message)
+        elif channel.startswith(PublicChannel.lightning_executions.name):
+            message = Execution.from_list(message)
+        elif channel in self._book_of:
+            kind = PublicChannel.lightning_board_snapshot
+            if not channel.startswith(kind.name):
+                kind = PublicChannel.lightning_board
+            channel, message = self._book_of[channel], (kind, message)
+        self._dispatcher.put(channel, message)
 
     def _on_error(self, _: WebSocketApp, error) -> None:
         logger.error(error)
 
     def _on_close(self, ws: WebSocketApp, close_status_code, close_msg) -> None:
         logger.info('connection closed')
+        # Diffs sent while disconnected are lost, so books wait for the snapshot sent once subscribed again; queued
+        # behind what has been received so far
+        for book_channel in set(self._book_of.values()):
+            self._dispatcher.put(book_channel, (None, None))
 
     def _on_open(self, _: WebSocketApp):
         for c in self._message_handler_of.keys():
@@ -0,0 +1,197 @@
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import enum
+import logging
+import threading
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from queue import Queue
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Overflow(enum.Enum):
+    # Discard the oldest queued message of the channel to make room for the new one
+    DROP_OLDEST = enum.auto()
+    # Make the receiving thread wait until a worker has made room
+    BLOCK = enum.auto()
+
+
+@dataclass(frozen=True)
+class DispatchPolicy:
+    # Threads running handlers; messages of one channel are still handled one at a time and in order
+    num_of_workers: int = 1
+    # Capacity of the queue of each channel
+    max_queued: int = 1000
+    overflow: Overflow = Overflow.DROP_OLDEST
+
+
+@dataclass(frozen=True)
+class ChannelStats:
+    depth: int
+    handled: int
+    dropped: int
+    # Seconds from the `timestamp` of a message, or the `exec_date` of the latest of a list of executions, until its
+    # handler was called, of the last one and the worst so far
+    lag: Optional[float]
+    max_lag: Optional[float]
+
+
+class _Channel:
+    def __init__(self, name: str, handler: Callable[[Any], None], overflow: Overflow) -> None:
+        self.name = name
+        self.handler = handler
+        self.overflow = overflow
+        self.queue: Deque[Any] = deque()
+        self.not_full = threading.Condition()
+        # Whether the channel is waiting for or being handled by a worker, so that no two workers take it at once
+        self.scheduled = False
+        self.handled = 0
+        self.dropped = 0
+        self.lag: Optional[float] = None
+        self.max_lag: Optional[float] = None
+
+
+class Dispatcher:
+    # Hands messages received on the websocket thread over to a pool of workers, so that slow handlers do not delay
+    # reading frames. Each channel has a bounded queue and is taken by one worker at a time; workers pick channels in
+    # the order they became ready.
+
+    def __init__(self, policy: DispatchPolicy = DispatchPolicy()) -> None:
+        self.policy = policy
+
+        self._channels: Dict[str, _Channel] = {}
+        self._ready: Queue = Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self) -> 'Dispatcher':
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+
+            for i in range(self.policy.num_of_workers):
+                t = threading.Thread(target=self._run, name=f'{self.__class__.__name__}-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def register(self, channel: str, handler: Callable[[Any], None], overflow: Optional[Overflow] = None) -> None:
+        # `overflow` overrides that of the policy for the channel, e.g. for messages that must not be dropped
+        overflow = overflow or self.policy.overflow
+        with self._lock:
+            if channel in self._channels:
+                self._channels[channel].handler = handler
+                self._channels[channel].overflow = overflow
+            else:
+                self._channels[channel] = _Channel(channel, handler, overflow)
+
+    def put(self, channel: str, message: Any) -> None:
+        if self._closed:
+            raise RuntimeError('dispatcher has already been closed')
+
+        c = self._channels[channel]
+        with c.not_full:
+            if len(c.queue) >= self.policy.max_queued:
+                if c.overflow is Overflow.BLOCK:
+                    c.not_full.wait_for(lambda: len(c.queue) < self.policy.max_queued or self._closed)
+                else:
+                    c.queue.popleft()
+                    c.dropped += 1
+                    if c.dropped & (c.dropped - 1) == 0:
+                        # At 1, 2, 4, 8... drops, so that a long burst is reported without flooding the log
+                        logger.warning(f'{c.dropped} messages of `{c.name}` have been dropped so far')
+
+            c.queue.append(message)
+            if c.scheduled:
+                return
+            c.scheduled = True
+
+        self._ready.put(c)
+
+    def stats(self) -> Dict[str, ChannelStats]:
+        with self._lock:
+            channels = list(self._channels.values())
+
+        stats = {}
+        for c in channels:
+            with c.not_full:
+                stats[c.name] = ChannelStats(
+                    depth=len(c.queue), handled=c.handled, dropped=c.dropped, lag=c.lag, max_lag=c.max_lag,
+                )
+        return stats
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        # Stops once the messages queued so far have been handled, or after `timeout` seconds
+        if self._closed:
+            return
+
+        self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        for c in list(self._channels.values()):
+            with c.not_full:
+                c.not_full.notify_all()
+                if self._threads:
+                    c.not_full.wait_for(lambda: not c.scheduled, remaining())
+
+        for _ in self._threads:
+            self._ready.put(_STOP)
+        for t in self._threads:
+            t.join(remaining())
+
+    def _run(self) -> None:
+        while True:
+            c = self._ready.get()
+            if c is _STOP:
+                return
+
+            with c.not_full:
+                message = c.queue.popleft()
+                c.not_full.notify_all()
+
+            self._handle(c, message)
+
+            with c.not_full:
+                if not c.queue:
+                    c.scheduled = False
+                    c.not_full.notify_all()
+                    continue
+
+            # Back to the end of the line, so that a busy channel does not starve the others
+            self._ready.put(c)
+
+    @staticmethod
+    def _timestamp(message: Any) -> Optional[datetime]:
+        if isinstance(message, list):
+            return getattr(message[-1], 'exec_date', None) if message else None
+        return getattr(message, 'timestamp', None)
+
+    def _handle(self, c: _Channel, message: Any) -> None:
+        timestamp = self._timestamp(message)
+        if timestamp is not None:
+            lag = (datetime.now(timezone.utc) - timestamp).total_seconds()
+            c.lag = lag
+            c.max_lag = lag if c.max_lag is None else max(c.max_lag, lag)
+
+        try:
+            c.handler(message)
+        except Exception as e:
+            logger.error(e)
+        finally:
+            c.handled += 1
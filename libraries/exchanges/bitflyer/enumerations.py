@@ -48,6 +48,11 @@ class State(enum.Enum):
     MATURED = enum.auto()
 
 
+class Side(enum.Enum):
+    BUY = enum.auto()
+    SELL = enum.auto()
+
+
 chart_types = []
 for p in ProductCode:
     for c in Candlestick:
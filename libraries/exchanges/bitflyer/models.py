@@ -1,15 +1,21 @@
-from typing import Any, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import os
+import numpy
 import pandas
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, EnumMeta
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
+from pynamodb.expressions.condition import Between, Condition
 from pynamodb.models import Model, GlobalSecondaryIndex
 from pynamodb.indexes import AllProjection
-from pynamodb.attributes import UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, TTLAttribute
+from pynamodb.attributes import (
+    UnicodeAttribute, UnicodeSetAttribute, NumberAttribute, UTCDateTimeAttribute, TTLAttribute,
+)
 
 from libraries.exchanges.bitflyer import ProductCode, State, ChartType
+from libraries.exchanges.bitflyer.cache import CandleCache
 
 
 class EnumAttribute(UnicodeAttribute):
@@ -39,10 +45,19 @@ class ProductCodeIndex(GlobalSecondaryIndex):
     timestamp = UTCDateTimeAttribute(range_key=True)
 
 
+class WrittenAtIndex(GlobalSecondaryIndex):
+    class Meta:
+        projection = AllProjection()
+
+    product_code = EnumAttribute(ProductCode, hash_key=True)
+    written_at = UTCDateTimeAttribute(range_key=True)
+
+
 class TickerTable(Model):
     class Meta:
         table_name = os.environ.get('DDB_TABLE_NAME', 'Ticker')
         region = os.environ.get('AWS_REGION', 'ap-northeast-1')
+        host = os.environ.get('DDB_HOST')
         billing_mode = 'PAY_PER_REQUEST'
 
     tick_id = NumberAttribute(hash_key=True)
@@ -60,8 +75,11 @@ class TickerTable(Model):
     ltp = NumberAttribute()
     volume = NumberAttribute()
     volume_by_product = NumberAttribute()
+    # When the collector wrote it, which unlike `timestamp` only grows in the order tickers become visible
+    written_at = UTCDateTimeAttribute(null=True)
 
     product_code_index = ProductCodeIndex()
+    written_at_index = WrittenAtIndex()
     ttl = TTLAttribute(default=datetime(9999, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc))
 
 
@@ -69,6 +87,7 @@ class ChartTable(Model):
     class Meta:
         table_name = os.environ.get('DDB_TABLE_NAME', 'Chart')
         region = os.environ.get('AWS_REGION', 'ap-northeast-1')
+        host = os.environ.get('DDB_HOST')
         billing_mode = 'PAY_PER_REQUEST'
 
     period_from = UTCDateTimeAttribute(range_key=True)
@@ -79,29 +98,138 @@ class ChartTable(Model):
     low_value = NumberAttribute()
     close_value = NumberAttribute()
     volume = NumberAttribute()
+    # Only candles built from executions have these
+    buy_volume = NumberAttribute(null=True)
+    sell_volume = NumberAttribute(null=True)
 
     open_timestamp = UTCDateTimeAttribute()
     close_timestamp = UTCDateTimeAttribute()
+    # Upper bound of the last batch of tickers merged into the candle, so that merging the same batch again is a no-op
+    merged_until = UTCDateTimeAttribute(null=True)
+    # Chunks of executions backfilled into the candle, which come in no particular order, for the same purpose
+    backfilled = UnicodeSetAttribute(null=True)
 
     ttl = TTLAttribute(default=datetime(9999, 12, 31, 23, 59, 59, 999999, tzinfo=timezone.utc))
 
+    # Columns of the data frames loaded from the table, and the attributes they come from
+    DATA_FRAME_COLUMNS = {
+        'Open': 'open_value',
+        'High': 'high_value',
+        'Low': 'low_value',
+        'Close': 'close_value',
+        'Volume': 'volume',
+        'BuyVolume': 'buy_volume',
+        'SellVolume': 'sell_volume',
+    }
+
+    @classmethod
+    def query_as_data_frame(
+            cls, chart_type: ChartType, range_key_condition: Optional[Condition] = None,
+            columns: Sequence[str] = ('Open', 'High', 'Low', 'Close', 'Volume'), num_of_segments: int = 1,
+            cache: Optional[CandleCache] = None, **kwargs: Any,
+    ) -> pandas.DataFrame:
+        # Closed candles of a `between` range are read through `cache`, or through the one `CANDLE_CACHE_DIR` points at
+        cache = cache or CandleCache.default()
+        if cache is None or not isinstance(range_key_condition, Between) or kwargs:
+            return cls._query_as_data_frame(chart_type, range_key_condition, columns, num_of_segments, **kwargs)
+
+        def fetch(lower: datetime, upper: datetime, fetched: Optional[Sequence[str]]) -> pandas.DataFrame:
+            return cls._query_as_data_frame(
+                chart_type, cls.period_from.between(lower, upper), fetched or tuple(cls.DATA_FRAME_COLUMNS),
+                num_of_segments,
+            )
+
+        return cache.load(chart_type, *cls._bounds(range_key_condition), columns, fetch)
+
     @classmethod
-    def query_as_data_frame(cls, *args, **kwargs) -> pandas.DataFrame:
-        data = []
-        index = []
-        q = ChartTable.query(*args, **kwargs)
-
-        for c in q:
-            index.append(c.period_from)
-            data.append({
-                'Open': c.open_value,
-                'High': c.high_value,
-                'Low': c.low_value,
-                'Close': c.close_value,
-                'Volume': c.volume,
-            })
-
-        data_frame = pandas.DataFrame(data, index=index)
+    def _bounds(cls, condition: Between) -> Tuple[datetime, datetime]:
+        lower, upper = (cls.period_from.deserialize(v.value['S']) for v in condition.values[1:])
+        return lower, upper
+
+    @classmethod
+    def _query_as_data_frame(
+            cls, chart_type: ChartType, range_key_condition: Optional[Condition], columns: Sequence[str],
+            num_of_segments: int, **kwargs: Any,
+    ) -> pandas.DataFrame:
+        # Only the attributes of `columns` are read, and items are decoded from the raw pages without building models.
+        # A `between` range can be split into `num_of_segments` queried at once, as pages of one query come in turn.
+        if num_of_segments > 1:
+            if not isinstance(range_key_condition, Between):
+                raise ValueError('only a `between` condition can be split into segments')
+
+            lower, upper = cls._bounds(range_key_condition)
+            step = (upper - lower) / num_of_segments
+            edges = [lower + step * i for i in range(num_of_segments)] + [upper + timedelta(microseconds=1)]
+            # Both ends of `between` are inclusive, so each segment ends right before where the next begins
+            conditions = [
+                cls.period_from.between(edges[i], edges[i + 1] - timedelta(microseconds=1))
+                for i in range(num_of_segments) if edges[i] < edges[i + 1]
+            ]
+            with ThreadPoolExecutor(max_workers=len(conditions)) as executor:
+                pages = [
+                    page for segment in executor.map(
+                        lambda c: cls._query_pages(chart_type, c, columns, **kwargs), conditions,
+                    ) for page in segment
+                ]
+        else:
+            pages = cls._query_pages(chart_type, range_key_condition, columns, **kwargs)
+
+        n = sum(len(page) for page in pages)
+        index = numpy.empty(n, dtype='datetime64[us]')
+        values = numpy.empty((n, len(columns)), dtype=numpy.float64)
+
+        offset = 0
+        for page in pages:
+            end = offset + len(page)
+            # Serialized as `%Y-%m-%dT%H:%M:%S.%f+0000`, all but the offset of which numpy parses
+            index[offset:end] = [item['period_from']['S'][:26] for item in page]
+            for j, c in enumerate(columns):
+                name = cls.DATA_FRAME_COLUMNS[c]
+                values[offset:end, j] = [float(item[name]['N']) if name in item else numpy.nan for item in page]
+            offset = end
+
+        data_frame = pandas.DataFrame(
+            values, index=pandas.DatetimeIndex(index).tz_localize(timezone.utc), columns=list(columns),
+        )
         data_frame.index.name = 'Date'
 
         return data_frame
+
+    @classmethod
+    def _query_pages(
+            cls, chart_type: ChartType, range_key_condition: Optional[Condition], columns: Sequence[str],
+            **kwargs: Any,
+    ) -> List[List[Dict[str, Dict[str, str]]]]:
+        connection = cls._get_connection()
+        hash_key = cls.chart_type.serialize(chart_type)
+        attributes_to_get = ['period_from'] + [cls.DATA_FRAME_COLUMNS[c] for c in columns]
+
+        pages = []
+        last_evaluated_key = None
+        while True:
+            data = connection.query(
+                hash_key, range_key_condition=range_key_condition, attributes_to_get=attributes_to_get,
+                exclusive_start_key=last_evaluated_key, **kwargs,
+            )
+            pages.append(data['Items'])
+            last_evaluated_key = data.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return pages
+
+
+class WatermarkTable(Model):
+    # How far a consumer of `TickerTable` has got, per consumer and product, and how far the collector has written
+    class Meta:
+        table_name = os.environ.get('DDB_WATERMARK_TABLE_NAME', 'Watermark')
+        region = os.environ.get('AWS_REGION', 'ap-northeast-1')
+        host = os.environ.get('DDB_HOST')
+        billing_mode = 'PAY_PER_REQUEST'
+
+    name = UnicodeAttribute(hash_key=True)
+    # Tickers up to here have been consumed
+    done = UTCDateTimeAttribute()
+    # Where the cycle in progress goes up to; a cycle that failed is run again up to the same point
+    pending = UTCDateTimeAttribute(null=True)
+
+    # Name of the watermark holding `BufferedWriter.written_until` of the collector
+    COLLECTOR = 'collector'
@@ -0,0 +1,57 @@
+from typing import Callable
+
+import threading
+import time
+
+
+class TokenBucket:
+    # Holds up to `capacity` tokens and gains `rate` of them per second; `acquire()` takes one, waiting for it when the
+    # bucket is empty. Shared by the threads of a client, so bursts of concurrent requests stay within the budget.
+
+    def __init__(
+            self, rate: float, capacity: float,
+            clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError('rate must be positive and capacity at least 1')
+
+        self.rate = rate
+        self.capacity = capacity
+
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def acquire(self) -> float:
+        # Returns the seconds waited
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return waited
+
+            self._sleep(wait)
+            waited += wait
+
+    def try_acquire(self) -> float:
+        # Takes a token and returns 0 when there is one, or the seconds until there will be without waiting, so that
+        # callers that can not block, e.g. coroutines, wait their own way
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
@@ -1,13 +1,51 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Union
 
+import json
 from dataclasses import dataclass
 from datetime import datetime
 
-from .enumerations import ProductCode, State, ChartType
+from .enumerations import ProductCode, State, Side, ChartType
+
+_PRODUCT_CODE_OF: Dict[str, ProductCode] = {p.name: p for p in ProductCode}
+# bitFlyer spells states with spaces, e.g. `CIRCUIT BREAK`
+_STATE_OF: Dict[str, State] = {
+    **{s.name: s for s in State},
+    **{s.name.replace('_', ' '): s for s in State},
+}
+# Executions matched by itayose have no taker side, which comes as an empty string
+_SIDE_OF: Dict[str, Optional[Side]] = {**{s.name: s for s in Side}, '': None}
+
+
+def _parse_timestamp(ts: str) -> datetime:
+    # bitFlyer sends `2021-11-08T12:34:56.1234567Z`, with more fractional digits than `datetime` holds; cutting the
+    # string at microseconds leaves the one form `fromisoformat` parses in C on every supported Python version
+    rest = ts[26:].rstrip('Z')
+    if len(ts) >= 26 and ts[19] == '.' and (not rest or rest.isdigit()):
+        try:
+            return datetime.fromisoformat(ts[:26] + '+00:00')
+        except ValueError:
+            pass
+
+    if ts.endswith('Z'):
+        ts = ts[:-1]
+    if '.' in ts and (sub := len(ts.split('.')[-1]) - 6) > 0:
+        ts = ts[:-sub]
+    timestamp_str = f'{ts}+00:00'
+    try:
+        return datetime.fromisoformat(timestamp_str)
+    except ValueError:
+        return datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M:%S.%f%z')
 
 
 @dataclass(frozen=True)
 class Ticker:
+    # Slotted by hand, as `dataclass(slots=True)` needs Python 3.10
+    __slots__ = (
+        'product_code', 'state', 'timestamp', 'tick_id', 'best_bid', 'best_ask', 'best_bid_size', 'best_ask_size',
+        'total_bid_depth', 'total_ask_depth', 'market_bid_size', 'market_ask_size', 'ltp', 'volume',
+        'volume_by_product',
+    )
+
     product_code: ProductCode
     state: State
     timestamp: datetime
@@ -26,22 +64,76 @@ class Ticker:
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Ticker':
-        ts: str = data['timestamp']
-        if ts.endswith('Z'):
-            ts = ts[:-1]
-        if (sub := len(ts.split('.')[-1]) - 6) > 0:
-            ts = ts[:-sub]
-        timestamp_str = f'{ts}+00:00'
-        try:
-            timestamp = datetime.fromisoformat(timestamp_str)
-        except ValueError:
-            timestamp = datetime.strptime(timestamp_str, '%Y-%m-%dT%H:%M:%S.%f%z')
+        state: str = data['state']
+        return cls(
+            _PRODUCT_CODE_OF[data['product_code']],
+            _STATE_OF.get(state) or getattr(State, '_'.join(state.split())),
+            _parse_timestamp(data['timestamp']),
+            data['tick_id'],
+            data['best_bid'],
+            data['best_ask'],
+            data['best_bid_size'],
+            data['best_ask_size'],
+            data['total_bid_depth'],
+            data['total_ask_depth'],
+            data['market_bid_size'],
+            data['market_ask_size'],
+            data['ltp'],
+            data['volume'],
+            data['volume_by_product'],
+        )
+
+    @classmethod
+    def from_bytes(cls, raw: Union[bytes, str]) -> 'Ticker':
+        return cls.from_dict(json.loads(raw))
+
+    def __getstate__(self) -> tuple:
+        # Slots of a frozen instance can not be restored through `setattr`, which pickle and copy do by default
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+
+@dataclass(frozen=True)
+class Execution:
+    __slots__ = (
+        'id', 'side', 'price', 'size', 'exec_date', 'buy_child_order_acceptance_id', 'sell_child_order_acceptance_id',
+    )
+
+    id: int
+    side: Optional[Side]
+    price: float
+    size: float
+    exec_date: datetime
+    buy_child_order_acceptance_id: str
+    sell_child_order_acceptance_id: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Execution':
+        return cls(
+            data['id'],
+            _SIDE_OF[data['side']],
+            data['price'],
+            data['size'],
+            _parse_timestamp(data['exec_date']),
+            data['buy_child_order_acceptance_id'],
+            data['sell_child_order_acceptance_id'],
+        )
+
+    @classmethod
+    def from_list(cls, data: List[Dict[str, Any]]) -> List['Execution']:
+        # `lightning_executions` messages carry every execution since the previous one
+        from_dict = cls.from_dict
+        return [from_dict(d) for d in data]
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
 
-        return Ticker(**{**data, **{
-            'product_code': getattr(ProductCode, data['product_code']),
-            'state': getattr(State, '_'.join(data['state'].split())),
-            'timestamp': timestamp,
-        }})
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
 
 @dataclass(frozen=True)
@@ -0,0 +1,183 @@
+from typing import List, Optional, Type
+
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from queue import Queue, Empty
+
+from pynamodb.models import Model
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class FlushPolicy:
+    # Number of items written per `batch_write()`; pynamodb splits it into requests of 25 by itself
+    max_items: int = 100
+    # Seconds an item may wait in the buffer before the batch holding it is flushed
+    max_age: float = 1.0
+    # Capacity of the buffer; `put()` blocks once it is full
+    max_buffered: int = 10000
+    # Seconds between updates of `written_until` while there is nothing to write
+    idle_interval: float = 1.0
+    # Retries of a failed batch before it is held for the next flush, after `backoff` seconds doubled on every one
+    max_retries: int = 3
+    backoff: float = 0.5
+
+
+class BufferedWriter:
+    # With `stamp`, items are given the time they are written at in that attribute, and `written_until` tells up to
+    # when, exclusive, every item stamped has been written. Only this thread stamps items, one batch at a time, so it
+    # is raised to the current time whenever nothing is left unwritten: after a batch has been written, and while the
+    # writer is idle. A batch that still fails once retried is held and written again ahead of the next one, keeping
+    # `written_until` where it was until it has been.
+
+    def __init__(self, model: Type[Model], policy: FlushPolicy = FlushPolicy(), stamp: Optional[str] = None) -> None:
+        self.model = model
+        self.policy = policy
+        self.stamp = stamp
+        self.written_until = datetime.now(timezone.utc)
+
+        self._queue: Queue = Queue(maxsize=policy.max_buffered)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._stopping = False
+        # Items of failed batches, in the order they were put
+        self._held: List[Model] = []
+
+    def __enter__(self) -> 'BufferedWriter':
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @property
+    def buffered(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def held(self) -> int:
+        return len(self._held)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name=f'{self.__class__.__name__}-{self.model.__name__}')
+        self._thread.start()
+
+    def put(self, item: Model, timeout: Optional[float] = None) -> None:
+        if self._closed:
+            raise RuntimeError('writer has already been closed')
+
+        # Blocks the caller while the buffer is full, raises `queue.Full` if `timeout` expires
+        self._queue.put(item, timeout=timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._thread is None:
+            self._flush(self._drain())
+            self._give_up()
+            return
+
+        # Also stops a writer that has stopped taking items from the buffer, which may be full then
+        self._stopping = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            if len(self._held) < self.policy.max_buffered:
+                items = self._collect()
+            else:
+                # Leaves new items in the buffer, so that `put()` blocks rather than the held ones growing unbounded
+                items = []
+                time.sleep(self.policy.idle_interval)
+
+            if items or self._held:
+                self._flush(items)
+            else:
+                self.written_until = datetime.now(timezone.utc)
+
+        self._flush(self._drain())
+        self._give_up()
+
+    def _collect(self) -> List[Model]:
+        items: List[Model] = []
+        deadline: Optional[float] = None
+
+        while len(items) < self.policy.max_items:
+            timeout = self.policy.idle_interval
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except Empty:
+                break
+
+            if item is _STOP:
+                self._stopping = True
+                break
+
+            items.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.policy.max_age
+
+        return items
+
+    def _drain(self) -> List[Model]:
+        items: List[Model] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _flush(self, items: List[Model]) -> None:
+        items, self._held = self._held + items, []
+        for i in range(0, len(items), self.policy.max_items):
+            if not self._write(items[i:i + self.policy.max_items]):
+                # Later items are held too, as `written_until` can not pass the failed ones whatever becomes of them
+                self._held = items[i:]
+                return
+
+    def _write(self, chunk: List[Model]) -> bool:
+        if self.stamp is not None:
+            now = datetime.now(timezone.utc)
+            for item in chunk:
+                setattr(item, self.stamp, now)
+        for attempt in range(self.policy.max_retries + 1):
+            if attempt:
+                time.sleep(self.policy.backoff * 2 ** (attempt - 1))
+            try:
+                with self.model.batch_write() as batch:
+                    for item in chunk:
+                        batch.save(item)
+                break
+            except Exception as e:
+                logger.error(f'failed to write {len(chunk)} items into `{self.model.__name__}` ({attempt + 1}): {e}')
+        else:
+            return False
+
+        # Whatever is stamped from now on is stamped later
+        self.written_until = datetime.now(timezone.utc)
+        return True
+
+    def _give_up(self) -> None:
+        if self._held:
+            logger.error(f'gave up on writing {len(self._held)} items into `{self.model.__name__}`')
+            self._held = []
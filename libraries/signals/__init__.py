@@ -1 +1,3 @@
 from .rsi import RSI
+from .sma import SimpleMovingAverage
+from .engine import IndicatorEngine
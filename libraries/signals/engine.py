@@ -0,0 +1,228 @@
+from typing import Dict, Optional, Tuple
+
+import threading
+
+from abc import ABC, abstractmethod
+
+import numpy
+
+from libraries.exchanges.bitflyer import ProductCode, Candlestick
+
+from .rsi import gain_and_loss, gains_and_losses, relative_strength_index, smooth
+from .sma import slide
+
+
+class RingBuffer:
+    # Every value is written twice, `capacity` apart, so that the latest `n` values are always one contiguous slice
+    # of the underlying array and can be handed out as a view without copying
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data = numpy.full(capacity * 2, numpy.nan)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def __getitem__(self, i: int) -> float:
+        # Only negative indices are supported, `-1` being the latest value
+        if not -len(self) <= i < 0:
+            raise IndexError(i)
+        return self._data[self._head + self.capacity + i]
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        self._data[self._head] = self._data[self._head + self.capacity] = value
+        self._head = (self._head + 1) % self.capacity
+        self._count += 1
+
+    def last(self, n: int) -> numpy.ndarray:
+        if n > len(self):
+            raise IndexError(n)
+        end = self._head + self.capacity
+        view = self._data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+
+class StreamIndicator(ABC):
+    def __init__(self) -> None:
+        self.value: Optional[float] = None
+
+    @property
+    @abstractmethod
+    def window(self) -> int:
+        # Number of the latest prices `update()` reads from the buffer
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, prices: RingBuffer) -> Optional[float]:
+        # Called right after the latest price has been appended to `prices`
+        raise NotImplementedError
+
+
+class StreamSMA(StreamIndicator):
+    # `SimpleMovingAverage` of the stream, whose running sum drops the price leaving the window as read from the buffer
+
+    def __init__(self, timeperiod: int = 30) -> None:
+        super().__init__()
+        self.timeperiod = timeperiod
+        self._sum = 0.0
+
+    @property
+    def window(self) -> int:
+        return self.timeperiod + 1
+
+    def update(self, prices: RingBuffer) -> Optional[float]:
+        n = self.timeperiod
+        self._sum = slide(self._sum, prices[-1], prices[-n - 1] if prices.count > n else None)
+        if prices.count % n == 0:
+            # Re-sum the window now and then so that rounding errors of the running sum do not accumulate
+            self._sum = float(prices.last(n).sum())
+
+        if prices.count >= n:
+            self.value = self._sum / n
+        return self.value
+
+
+class StreamRSI(StreamIndicator):
+    # `RSI` of the stream, of the same `wilder` flavours; the difference leaving the window of the plain one is read
+    # from the buffer
+
+    def __init__(self, timeperiod: int = 14, wilder: bool = True) -> None:
+        super().__init__()
+        self.timeperiod = timeperiod
+        self.wilder = wilder
+        self._gain = 0.0
+        self._loss = 0.0
+
+    @property
+    def window(self) -> int:
+        return 2 if self.wilder else self.timeperiod + 2
+
+    def update(self, prices: RingBuffer) -> Optional[float]:
+        n = self.timeperiod
+        diffs = prices.count - 1
+        if diffs < 1:
+            return None
+
+        gain, loss = gain_and_loss(prices[-1] - prices[-2])
+        if diffs <= n:
+            self._gain, self._loss = self._gain + gain, self._loss + loss
+        elif self.wilder:
+            self._gain, self._loss = smooth(self._gain, gain, n), smooth(self._loss, loss, n)
+        else:
+            leaving_gain, leaving_loss = gain_and_loss(prices[-n - 1] - prices[-n - 2])
+            self._gain, self._loss = slide(self._gain, gain, leaving_gain), slide(self._loss, loss, leaving_loss)
+            if diffs % n == 0:
+                # Re-sum the window now and then so that rounding errors of the running sums do not accumulate
+                gains, losses = gains_and_losses(prices.last(n + 1))
+                self._gain, self._loss = float(gains.sum()), float(losses.sum())
+
+        if diffs >= n:
+            self.value = relative_strength_index(self._gain, self._loss)
+        return self.value
+
+
+class _Extremum(StreamIndicator):
+    def __init__(self, timeperiod: int) -> None:
+        super().__init__()
+        self.timeperiod = timeperiod
+
+    @property
+    def window(self) -> int:
+        return self.timeperiod + 1
+
+    @staticmethod
+    @abstractmethod
+    def _reduce(prices: numpy.ndarray) -> float:
+        raise NotImplementedError
+
+    @staticmethod
+    @abstractmethod
+    def _is_beyond(a: float, b: float) -> bool:
+        raise NotImplementedError
+
+    def update(self, prices: RingBuffer) -> Optional[float]:
+        n = self.timeperiod
+        if prices.count < n:
+            return None
+
+        latest = prices[-1]
+        if self.value is None or prices.count == n:
+            self.value = float(self._reduce(prices.last(n)))
+        elif self._is_beyond(latest, self.value):
+            self.value = latest
+        elif prices[-n - 1] == self.value:
+            # Only when the extremum itself has just left the window it has to be searched again
+            self.value = float(self._reduce(prices.last(n)))
+
+        return self.value
+
+
+class Highest(_Extremum):
+    _reduce = staticmethod(numpy.max)
+
+    @staticmethod
+    def _is_beyond(a: float, b: float) -> bool:
+        return a >= b
+
+
+class Lowest(_Extremum):
+    _reduce = staticmethod(numpy.min)
+
+    @staticmethod
+    def _is_beyond(a: float, b: float) -> bool:
+        return a <= b
+
+
+class _Stream:
+    def __init__(self, capacity: int) -> None:
+        self.lock = threading.Lock()
+        self.prices = RingBuffer(capacity)
+        self.indicators: Dict[str, StreamIndicator] = {}
+
+
+class IndicatorEngine:
+    def __init__(self, capacity: int = 256) -> None:
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._streams: Dict[Tuple[ProductCode, Candlestick], _Stream] = {}
+
+    def _stream(self, product_code: ProductCode, candlestick: Candlestick) -> _Stream:
+        key = (product_code, candlestick)
+        with self._lock:
+            if key not in self._streams:
+                self._streams[key] = _Stream(self.capacity)
+            return self._streams[key]
+
+    def register(
+            self, product_code: ProductCode, candlestick: Candlestick, name: str, indicator: StreamIndicator,
+    ) -> None:
+        stream = self._stream(product_code, candlestick)
+        with stream.lock:
+            if stream.prices.count:
+                raise RuntimeError(f'`{name}` must be registered before any price of the stream is fed')
+            if indicator.window > stream.prices.capacity:
+                stream.prices = RingBuffer(indicator.window)
+            stream.indicators[name] = indicator
+
+    def update(self, product_code: ProductCode, candlestick: Candlestick, price: float) -> Dict[str, Optional[float]]:
+        stream = self._stream(product_code, candlestick)
+        with stream.lock:
+            stream.prices.append(price)
+            return {name: indicator.update(stream.prices) for name, indicator in stream.indicators.items()}
+
+    def values(self, product_code: ProductCode, candlestick: Candlestick) -> Dict[str, Optional[float]]:
+        stream = self._stream(product_code, candlestick)
+        with stream.lock:
+            return {name: indicator.value for name, indicator in stream.indicators.items()}
+
+    def prices(self, product_code: ProductCode, candlestick: Candlestick, n: int) -> numpy.ndarray:
+        stream = self._stream(product_code, candlestick)
+        with stream.lock:
+            return stream.prices.last(min(n, len(stream.prices))).copy()
@@ -1,2 +1,111 @@
+from typing import Optional, Tuple
+
+from collections import deque
+
+import numpy
+import pandas
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .sma import slide
+
+
+def gain_and_loss(diff: float) -> Tuple[float, float]:
+    return (diff if diff > 0 else 0.0), (-diff if diff < 0 else 0.0)
+
+
+def gains_and_losses(prices: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    diff = numpy.diff(prices)
+    return numpy.where(diff > 0, diff, 0.0), numpy.where(diff < 0, -diff, 0.0)
+
+
+def smooth(total: float, value: float, timeperiod: int) -> float:
+    # Wilder smoothing of a running average kept as a sum, i.e. `avg * timeperiod`
+    return total * (timeperiod - 1) / timeperiod + value
+
+
+def relative_strength_index(gain: float, loss: float) -> float:
+    total = gain + loss
+    return 100 * gain / total if total != 0 else 0.0
+
+
 class RSI:
-    pass
+    # `wilder=True` is the Wilder-smoothed RSI of `talib.RSI`, `wilder=False` is the ratio of gains over only the last
+    # `timeperiod` differences, which is what `talib.RSI` returns when it is fed just `timeperiod + 1` prices
+
+    def __init__(self, timeperiod: int = 14, wilder: bool = True) -> None:
+        self.timeperiod = timeperiod
+        self.wilder = wilder
+
+        self._last_price: Optional[float] = None
+        self._gains: deque = deque(maxlen=timeperiod)
+        self._losses: deque = deque(maxlen=timeperiod)
+        self._gain = 0.0
+        self._loss = 0.0
+        self._value: Optional[float] = None
+        self._updates = 0
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+    def update(self, price: float) -> Optional[float]:
+        if self._last_price is not None:
+            self._gain, self._loss = self._next(price)
+            gain, loss = gain_and_loss(price - self._last_price)
+            self._gains.append(gain)
+            self._losses.append(loss)
+            self._updates += 1
+            if not self.wilder and self._updates % self.timeperiod == 0:
+                # Re-sum the window now and then so that rounding errors of the running sums do not accumulate
+                self._gain, self._loss = sum(self._gains), sum(self._losses)
+            if len(self._gains) == self.timeperiod:
+                self._value = relative_strength_index(self._gain, self._loss)
+
+        self._last_price = price
+        return self._value
+
+    def peek(self, price: float) -> Optional[float]:
+        # The value `update(price)` would return, without consuming `price`; e.g. for the close of an open candle
+        if self._last_price is None or len(self._gains) < self.timeperiod - 1:
+            return None
+        return relative_strength_index(*self._next(price))
+
+    def _next(self, price: float) -> Tuple[float, float]:
+        gain, loss = gain_and_loss(price - self._last_price)
+        n = self.timeperiod
+
+        if len(self._gains) < n:
+            return self._gain + gain, self._loss + loss
+
+        if self.wilder:
+            return smooth(self._gain, gain, n), smooth(self._loss, loss, n)
+
+        return slide(self._gain, gain, self._gains[0]), slide(self._loss, loss, self._losses[0])
+
+    @classmethod
+    def batch(cls, prices: numpy.ndarray, timeperiod: int = 14, wilder: bool = True) -> numpy.ndarray:
+        prices = numpy.asarray(prices, dtype=numpy.float64)
+        rsi = numpy.full(len(prices), numpy.nan)
+        if len(prices) <= timeperiod:
+            return rsi
+
+        gains, losses = gains_and_losses(prices)
+
+        if wilder:
+            gain = cls._smooth(gains, timeperiod)
+            loss = cls._smooth(losses, timeperiod)
+        else:
+            gain = sliding_window_view(gains, timeperiod).sum(axis=1)
+            loss = sliding_window_view(losses, timeperiod).sum(axis=1)
+
+        total = gain + loss
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            rsi[timeperiod:] = numpy.where(total != 0, 100 * gain / total, 0.0)
+
+        return rsi
+
+    @staticmethod
+    def _smooth(values: numpy.ndarray, timeperiod: int) -> numpy.ndarray:
+        # Wilder smoothing seeded with the simple average of the first `timeperiod` values
+        seeded = numpy.concatenate(([values[:timeperiod].mean()], values[timeperiod:]))
+        return pandas.Series(seeded).ewm(alpha=1 / timeperiod, adjust=False).mean().to_numpy()
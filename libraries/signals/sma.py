@@ -1,2 +1,57 @@
+from typing import Optional
+
+from collections import deque
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def slide(total: float, entering: float, leaving: Optional[float] = None) -> float:
+    # The sum of a window once `entering` has been added to it and `leaving`, the oldest value of a full one, has left
+    return total + entering if leaving is None else total - leaving + entering
+
+
 class SimpleMovingAverage:
-    pass
+    def __init__(self, timeperiod: int = 30) -> None:
+        self.timeperiod = timeperiod
+
+        self._prices: deque = deque(maxlen=timeperiod)
+        self._sum = 0.0
+        self._updates = 0
+        self._value: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+    def update(self, price: float) -> Optional[float]:
+        self._sum = self._next_sum(price)
+        self._prices.append(price)
+
+        self._updates += 1
+        if self._updates % self.timeperiod == 0:
+            # Re-sum the window now and then so that rounding errors of the running sum do not accumulate
+            self._sum = sum(self._prices)
+
+        if len(self._prices) == self.timeperiod:
+            self._value = self._sum / self.timeperiod
+        return self._value
+
+    def peek(self, price: float) -> Optional[float]:
+        # The value `update(price)` would return, without consuming `price`; e.g. for the close of an open candle
+        if len(self._prices) < self.timeperiod - 1:
+            return None
+        return self._next_sum(price) / self.timeperiod
+
+    def _next_sum(self, price: float) -> float:
+        return slide(self._sum, price, self._prices[0] if len(self._prices) == self.timeperiod else None)
+
+    @staticmethod
+    def batch(prices: numpy.ndarray, timeperiod: int = 30) -> numpy.ndarray:
+        prices = numpy.asarray(prices, dtype=numpy.float64)
+        sma = numpy.full(len(prices), numpy.nan)
+        if len(prices) < timeperiod:
+            return sma
+
+        sma[timeperiod - 1:] = sliding_window_view(prices, timeperiod).mean(axis=1)
+        return sma
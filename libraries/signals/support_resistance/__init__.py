@@ -1,4 +1,5 @@
 from ._abc import SupportResistance
 from .fractal import Fractal
 from .window_shifting import WindowShifting
-from .kmeans import KMeans
\ No newline at end of file
+from .kmeans import KMeans
+from .scan import scan_levels
\ No newline at end of file
@@ -1,5 +1,6 @@
 from typing import List
 
+import bisect
 from abc import ABC, abstractmethod
 
 import pandas
@@ -7,12 +8,21 @@ import pandas
 
 class SupportResistance(ABC):
     def __init__(self, df: pandas.DataFrame) -> None:
-        self.df = df
+        self._frames: List[pandas.DataFrame] = [df]
         self._levels: List[int] = []
         self._supports: List[int] = []
         self._resistances: List[int] = []
+        # `_levels` in ascending order, to find the nearest accepted levels by binary search
+        self._sorted_levels: List[int] = []
         self._set_levels()
 
+    @property
+    def df(self) -> pandas.DataFrame:
+        # Rows given to `update` are concatenated only once the whole frame is asked for
+        if len(self._frames) > 1:
+            self._frames = [pandas.concat(self._frames)]
+        return self._frames[0]
+
     @property
     def levels(self) -> List[int]:
         return self._levels
@@ -25,6 +35,35 @@ class SupportResistance(ABC):
     def resistances(self) -> List[int]:
         return self._resistances
 
+    def update(self, new_rows: pandas.DataFrame) -> None:
+        # Folds candles newer than the last one seen into the levels at a cost proportional to their number, so that a
+        # detector can follow a growing chart; rows that are not newer are ignored and levels found before are kept
+        last_rows = self._frames[-1]
+        if len(last_rows):
+            new_rows = new_rows[new_rows.index > last_rows.index[-1]]
+        if new_rows.empty:
+            return
+
+        self._frames.append(new_rows)
+        self._update_levels(new_rows)
+
     @abstractmethod
     def _set_levels(self) -> None:
         raise NotImplementedError
+
+    @abstractmethod
+    def _update_levels(self, new_rows: pandas.DataFrame) -> None:
+        raise NotImplementedError
+
+    def _is_far_from_level(self, level: int, distance: float) -> bool:
+        i = bisect.bisect_left(self._sorted_levels, level)
+        if i < len(self._sorted_levels) and abs(self._sorted_levels[i] - level) < distance:
+            return False
+        if i > 0 and abs(level - self._sorted_levels[i - 1]) < distance:
+            return False
+        return True
+
+    def _add_level_if_far(self, level: int, distance: float) -> None:
+        if self._is_far_from_level(level, distance):
+            self._levels.append(level)
+            bisect.insort(self._sorted_levels, level)
@@ -1,4 +1,5 @@
 import numpy
+import pandas
 
 from ._abc import SupportResistance
 
@@ -8,32 +9,46 @@ class Fractal(SupportResistance):
     # Ref: https://medium.datadriveninvestor.com/how-to-detect-support-resistance-levels-and-breakout-using-python-f8b5dac42f21
 
     def _set_levels(self) -> None:
-        mean = numpy.mean(self.df['High'] - self.df['Low'])
-
-        for i in range(2, self.df.shape[0] - 2):
-            level = None
-
-            if self._is_support(i):
-                level = int(self.df['Low'][i])
+        self._low_tail = numpy.empty(0)
+        self._high_tail = numpy.empty(0)
+        self._range_sum = 0.0
+        self._num_of_rows = 0
+        self._update_levels(self.df)
+
+    def _update_levels(self, new_rows: pandas.DataFrame) -> None:
+        # Only the last four rows are carried over: pivots on the last two of them could not be resolved yet, the ones
+        # before already were. Levels are told apart by the mean range of the candles seen so far.
+        new_low = new_rows['Low'].to_numpy(dtype=numpy.float64)
+        new_high = new_rows['High'].to_numpy(dtype=numpy.float64)
+        self._range_sum += float(numpy.sum(new_high - new_low))
+        self._num_of_rows += len(new_low)
+
+        low = numpy.r_[self._low_tail, new_low]
+        high = numpy.r_[self._high_tail, new_high]
+        self._low_tail, self._high_tail = low[-4:], high[-4:]
+        if len(low) < 5:
+            return
+
+        mean = self._range_sum / self._num_of_rows
+        is_support = self._is_pivot(low, numpy.less)
+        is_resistance = self._is_pivot(high, numpy.greater) & ~is_support
+
+        # Pivots are visited in time order, as which of two close levels is kept depends on it
+        for i in numpy.flatnonzero(is_support | is_resistance).tolist():
+            if is_support[i]:
+                level = int(low[i + 2])
                 self._supports.append(level)
-            elif self._is_resistance(i):
-                level = int(self.df['High'][i])
+            else:
+                level = int(high[i + 2])
                 self._resistances.append(level)
 
-            if level is not None and self._is_far_from_level(mean, level):
-                self._levels.append(level)
-
-    def _is_support(self, i: int) -> bool:
-        return (
-                self.df['Low'][i] < self.df['Low'][i - 1] < self.df['Low'][i - 2] and
-                self.df['Low'][i] < self.df['Low'][i + 1] < self.df['Low'][i + 2]
-        )
+            self._add_level_if_far(level, mean)
 
-    def _is_resistance(self, i: int) -> bool:
+    @staticmethod
+    def _is_pivot(nums: numpy.ndarray, op: numpy.ufunc) -> numpy.ndarray:
+        # Whether nums[i + 2] is the tip of a fractal: strictly beyond both neighbours, which are beyond theirs
+        center = nums[2:-2]
         return (
-                self.df['High'][i] > self.df['High'][i - 1] > self.df['High'][i - 2] and
-                self.df['High'][i] > self.df['High'][i + 1] > self.df['High'][i + 2]
+            op(center, nums[1:-3]) & op(nums[1:-3], nums[:-4]) &
+            op(center, nums[3:-1]) & op(nums[3:-1], nums[4:])
         )
-
-    def _is_far_from_level(self, mean: numpy.float64, level: int) -> bool:
-        return numpy.sum([abs(level - x) < mean for x in self._levels]) == 0
@@ -1,56 +1,163 @@
-from typing import List
+from typing import List, Optional, Tuple
+
+from dataclasses import dataclass
 
 import numpy
-from sklearn.cluster import KMeans as _KMeans
+import pandas
 from kneed import KneeLocator
 
 from ._abc import SupportResistance
 
 
+def _segment_argmin(values: numpy.ndarray, starts: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # The minimum of every segment `values[starts[i]:starts[i + 1]]` and the position of its first occurrence
+    minimums = numpy.minimum.reduceat(values, starts)
+    counts = numpy.diff(numpy.r_[starts, len(values)])
+    hits = numpy.flatnonzero(values == numpy.repeat(minimums, counts))
+    return minimums, hits[numpy.searchsorted(hits, starts)]
+
+
+def optimal_kmeans_1d(nums: numpy.ndarray, max_k: int) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    # Exact k-means on a line for every k up to `max_k` at once: clusters of sorted values are contiguous, so the best
+    # cost of covering the first i values with m clusters follows from the one with m - 1 clusters. Each layer is
+    # solved by divide and conquer over the monotone split points, one vectorized pass per recursion depth.
+    # Returns the sorted unique values, the inertia of every k and the start index of the last cluster per (k, i).
+    values, weights = numpy.unique(numpy.asarray(nums, dtype=numpy.float64), return_counts=True)
+    n = len(values)
+    max_k = min(max_k, n)
+
+    centered = values - values.mean()
+    w = numpy.r_[0.0, numpy.cumsum(weights)]
+    s1 = numpy.r_[0.0, numpy.cumsum(weights * centered)]
+    s2 = numpy.r_[0.0, numpy.cumsum(weights * centered ** 2)]
+
+    def cost(j: numpy.ndarray, i: numpy.ndarray) -> numpy.ndarray:
+        # Sum of squared distances of values[j..i] to their mean
+        sw, sx = w[i + 1] - w[j], s1[i + 1] - s1[j]
+        return numpy.maximum(s2[i + 1] - s2[j] - sx * sx / sw, 0.0)
+
+    indices = numpy.arange(n)
+    previous = cost(numpy.zeros(n, dtype=numpy.int64), indices)
+    inertias = [previous[-1]]
+    splits = numpy.zeros((max_k, n), dtype=numpy.int64)
+
+    for m in range(1, max_k):
+        current = numpy.full(n, numpy.inf)
+        ilo, ihi = numpy.array([m]), numpy.array([n - 1])
+        jlo, jhi = numpy.array([m]), numpy.array([n - 1])
+
+        while len(ilo):
+            mid = (ilo + ihi) // 2
+            lo, hi = numpy.maximum(jlo, m), numpy.minimum(jhi, mid)
+            counts = hi - lo + 1
+            starts = numpy.r_[0, numpy.cumsum(counts)[:-1]]
+
+            j = numpy.repeat(lo - starts, counts) + numpy.arange(counts.sum())
+            i = numpy.repeat(mid, counts)
+            best, at = _segment_argmin(previous[j - 1] + cost(j, i), starts)
+
+            current[mid] = best
+            splits[m, mid] = j[at]
+
+            left, right = ilo <= mid - 1, mid + 1 <= ihi
+            ilo, ihi, jlo, jhi = (
+                numpy.r_[ilo[left], mid[right] + 1],
+                numpy.r_[mid[left] - 1, ihi[right]],
+                numpy.r_[jlo[left], j[at][right]],
+                numpy.r_[j[at][left], jhi[right]],
+            )
+
+        previous = current
+        inertias.append(previous[-1])
+
+    return values, numpy.array(inertias), splits
+
+
+def _clusters(splits: numpy.ndarray, k: int, n: int) -> List[Tuple[int, int]]:
+    # (first, last) indices of the sorted values in each of the `k` clusters, in ascending order
+    bounds, end = [], n - 1
+    for m in range(k - 1, -1, -1):
+        start = int(splits[m, end]) if m else 0
+        bounds.append((start, end))
+        end = start - 1
+    return bounds[::-1]
+
+
+@dataclass
+class _Clusters:
+    # Running size, sum and bounds of every cluster, in ascending order
+    count: numpy.ndarray
+    total: numpy.ndarray
+    low: numpy.ndarray
+    high: numpy.ndarray
+
+    @classmethod
+    def fit(cls, k: int, nums: numpy.ndarray) -> '_Clusters':
+        values, _, splits = optimal_kmeans_1d(nums, k)
+        _, weights = numpy.unique(numpy.asarray(nums, dtype=numpy.float64), return_counts=True)
+        bounds = numpy.array(_clusters(splits, min(k, len(values)), len(values)))
+        first, last = bounds[:, 0], bounds[:, 1] + 1
+        w = numpy.r_[0, numpy.cumsum(weights)]
+        s = numpy.r_[0.0, numpy.cumsum(weights * values)]
+        return cls(
+            count=(w[last] - w[first]).astype(numpy.float64), total=s[last] - s[first],
+            low=values[first], high=values[last - 1],
+        )
+
+    def update(self, nums: numpy.ndarray) -> None:
+        # Warm start from the current centroids: new values join the nearest cluster, which then moves towards them
+        if not len(nums):
+            return
+
+        centroids = self.total / self.count
+        order = numpy.argsort(centroids)
+        midpoints = (centroids[order][1:] + centroids[order][:-1]) / 2
+        labels = order[numpy.searchsorted(midpoints, nums)]
+
+        self.count += numpy.bincount(labels, minlength=len(self.count))
+        self.total += numpy.bincount(labels, weights=nums, minlength=len(self.total))
+        numpy.minimum.at(self.low, labels, nums)
+        numpy.maximum.at(self.high, labels, nums)
+
+
 class KMeans(SupportResistance):
     # Ref: https://towardsdatascience.com/using-k-means-clustering-to-create-support-and-resistance-b13fdeeba12
     # Ref: https://www.nbshare.io/notebook/190163492/How-To-Calculate-Stocks-Support-And-Resistance-Using-Clustering/
 
+    MAX_K = 14
+
     def _set_levels(self) -> None:
-        high_array = numpy.array(self.df['High'])
-        low_array = numpy.array(self.df['Low'])
-
-        k = self._determine_k(high_array)
-        high = self._detect_levels(k, high_array)
-        low = self._detect_levels(k, low_array)
-
-        for i in range(k):
-            self._resistances.append(max(int(high[i][0]), int(high[i][1])))
-            self._supports.append(min(int(low[i][0]), int(low[i][1])))
-        self._levels = self._resistances + self._supports
-
-    @staticmethod
-    def _detect_levels(k: int, nums: numpy.ndarray) -> List[List[numpy.int64]]:
-        kmeans = _KMeans(n_clusters=k).fit(nums.reshape(-1, 1))
-        clusters = kmeans.predict(nums.reshape(-1, 1))  # noqa
-
-        min_and_max = []
-        for i in range(k):
-            min_and_max.append([-numpy.inf, numpy.inf])
-
-        for i in range(len(nums)):
-            c = clusters[i]
-            if nums[i] > min_and_max[c][0]:
-                min_and_max[c][0] = nums[i]
-            if nums[i] < min_and_max[c][1]:
-                min_and_max[c][1] = nums[i]
-
-        return min_and_max
-
-    @staticmethod
-    def _determine_k(nums: numpy.ndarray) -> int:
-        sum_of_squared_distances = []
-        _k = range(1, 15)
-        for k in _k:
-            km = _KMeans(n_clusters=k)
-            km = km.fit(nums.reshape(-1, 1))
-            sum_of_squared_distances.append(km.inertia_)  # noqa
+        self._high_clusters: Optional[_Clusters] = None
+        self._low_clusters: Optional[_Clusters] = None
+        self._update_levels(self.df)
+
+    def _update_levels(self, new_rows: pandas.DataFrame) -> None:
+        # k is chosen once, by the first rows; later ones only move the clusters found then
+        high_array = new_rows['High'].to_numpy(dtype=numpy.float64)
+        low_array = new_rows['Low'].to_numpy(dtype=numpy.float64)
+        if len(high_array) == 0:
+            return
+
+        if self._high_clusters is None or self._low_clusters is None:
+            k = self._determine_k(high_array)
+            self._high_clusters = _Clusters.fit(k, high_array)
+            self._low_clusters = _Clusters.fit(k, low_array)
+        else:
+            self._high_clusters.update(high_array)
+            self._low_clusters.update(low_array)
+
+        n = min(len(self._high_clusters.high), len(self._low_clusters.low))
+        self._resistances[:] = [int(h) for h in self._high_clusters.high[:n]]
+        self._supports[:] = [int(v) for v in self._low_clusters.low[:n]]
+        self._levels[:] = self._resistances + self._supports
+
+    @classmethod
+    def _determine_k(cls, nums: numpy.ndarray) -> int:
+        _, sum_of_squared_distances, _ = optimal_kmeans_1d(nums, cls.MAX_K)
+        _k = range(1, len(sum_of_squared_distances) + 1)
+        if len(_k) < 3:
+            return len(_k)
 
         kn = KneeLocator(_k, sum_of_squared_distances, S=1.0, curve='convex', direction='decreasing')
 
-        return kn.knee
+        return kn.knee or 1
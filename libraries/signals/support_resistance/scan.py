@@ -0,0 +1,88 @@
+from typing import Hashable, List, Mapping, Optional, Sequence, Tuple, Type
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy
+import pandas
+
+from ._abc import SupportResistance
+
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# (offset, length, detector) of a frame within the shared block
+_Task = Tuple[int, int, Type[SupportResistance]]
+_Levels = Tuple[List[int], List[int], List[int]]
+
+# The shared block and the views over it, attached once per worker process
+_shm: Optional[shared_memory.SharedMemory] = None
+_values = numpy.empty((0, len(COLUMNS)))
+_index = numpy.empty(0, dtype=numpy.int64)
+
+
+def _views(buffer: memoryview, num_of_rows: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # The candles as a row-major (num_of_rows, len(COLUMNS)) block followed by their periods in nanoseconds
+    values = numpy.ndarray((num_of_rows, len(COLUMNS)), dtype=numpy.float64, buffer=buffer)
+    index = numpy.ndarray((num_of_rows, ), dtype=numpy.int64, buffer=buffer, offset=values.nbytes)
+    return values, index
+
+
+def _attach(name: str, num_of_rows: int) -> None:
+    global _shm, _values, _index
+    _shm = shared_memory.SharedMemory(name=name)
+    _values, _index = _views(_shm.buf, num_of_rows)
+
+
+def _detect(task: _Task) -> _Levels:
+    offset, length, detector = task
+
+    # A frame over a slice of the block is a view, no candle is copied into the worker
+    periods = pandas.DatetimeIndex(_index[offset:offset + length].view('datetime64[ns]'), name='Date')
+    df = pandas.DataFrame(
+        _values[offset:offset + length], columns=list(COLUMNS), index=periods.tz_localize('UTC'), copy=False,
+    )
+    sr = detector(df)
+    return sr.levels, sr.supports, sr.resistances
+
+
+def scan_levels(
+        frames: Mapping[Hashable, pandas.DataFrame], detectors: Sequence[Type[SupportResistance]],
+        max_workers: Optional[int] = None,
+) -> pandas.DataFrame:
+    # Runs every detector over every frame in a process pool and returns one row per (frame, detector) with the
+    # levels, supports and resistances found. The frames are packed into one shared memory block once, which workers
+    # map instead of receiving pickled copies.
+    labels = list(frames.keys())
+    num_of_rows = sum(len(df) for df in frames.values())
+
+    size = num_of_rows * (len(COLUMNS) + 1) * numpy.dtype(numpy.float64).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        values, index = _views(shm.buf, num_of_rows)
+        tasks: List[_Task] = []
+        offset = 0
+        for df in frames.values():
+            length = len(df)
+            if length:
+                values[offset:offset + length] = df.loc[:, list(COLUMNS)].to_numpy(dtype=numpy.float64)
+                periods = pandas.DatetimeIndex(df.index)
+                if periods.tz is not None:
+                    periods = periods.tz_convert('UTC').tz_localize(None)
+                index[offset:offset + length] = periods.to_numpy(dtype='datetime64[ns]').view(numpy.int64)
+            tasks.extend((offset, length, detector) for detector in detectors)
+            offset += length
+        del values, index
+
+        with ProcessPoolExecutor(max_workers, initializer=_attach, initargs=(shm.name, num_of_rows)) as executor:
+            results = list(executor.map(_detect, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows = [
+        (label, detector.__name__, *results[i * len(detectors) + j])
+        for i, label in enumerate(labels) for j, detector in enumerate(detectors)
+    ]
+    return pandas.DataFrame(
+        rows, columns=['chart_type', 'detector', 'levels', 'supports', 'resistances'],
+    ).set_index(['chart_type', 'detector'])
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Optional, Tuple
 
 import pandas
 import numpy
@@ -10,51 +10,74 @@ from ._abc import SupportResistance
 class WindowShifting(SupportResistance):
     # Ref: https://medium.datadriveninvestor.com/how-to-detect-support-resistance-levels-and-breakout-using-python-f8b5dac42f21
 
-    def __init__(self, df: pandas.DataFrame) -> None:
-        self.window_size = math.ceil(len(df) / 7)
-        print(self.window_size)
+    def __init__(self, df: pandas.DataFrame, window_size: Optional[int] = None, num_of_windows: int = 7) -> None:
+        # Unless given explicitly, the window spans `1 / num_of_windows` of the frame; it stays the same on `update`
+        self.window_size = window_size or math.ceil(len(df) / num_of_windows)
         super().__init__(df)
 
     def _set_levels(self) -> None:
-        self._mean = numpy.mean(self.df['High'] - self.df['Low'])
-        high_range = self._determine_max_or_min_within_window('High', max)
-        low_range = self._determine_max_or_min_within_window('Low', min)
+        self._range_sum = 0.0
+        self._num_of_rows = 0
+        # The last `window_size - 1` rows, to slide the window over the next ones
+        self._tails: Dict[str, numpy.ndarray] = {'High': numpy.empty(0), 'Low': numpy.empty(0)}
+        # The extremum of the last window and for how many windows in a row it has been so
+        self._runs: Dict[str, Tuple[int, int]] = {'High': (0, 0), 'Low': (0, 0)}
+        self._update_levels(self.df)
+
+    def _update_levels(self, new_rows: pandas.DataFrame) -> None:
+        self._range_sum += float(numpy.sum(new_rows['High'] - new_rows['Low']))
+        self._num_of_rows += len(new_rows)
+        if not self._num_of_rows:
+            return
+
+        self._mean = self._range_sum / self._num_of_rows
+        high_range = self._determine_max_or_min_within_window('High', new_rows, numpy.maximum)
+        low_range = self._determine_max_or_min_within_window('Low', new_rows, numpy.minimum)
 
         pivot = math.ceil(self.window_size / 2)
-        self.__set_levels(high_range, pivot, self._resistances)
-        self.__set_levels(low_range, pivot, self._supports)
+        self.__set_levels('High', high_range, pivot, self._resistances)
+        self.__set_levels('Low', low_range, pivot, self._supports)
+
+    def __set_levels(self, high_or_low: str, nums: numpy.ndarray, pivot: int, target: List[int]) -> None:
+        # A level is a value that stays the extremum of `pivot` windows in a row; the first window of a run is not
+        # counted towards it, so a `pivot` of 1 never yields any level
+        if len(nums) == 0 or pivot < 2:
+            return
 
-    def __set_levels(self, nums: List[int], pivot: int, target: List[int]) -> None:
-        previous, counter = None, 0
-        for n in nums:
-            if n != previous:
-                previous, counter = n, 1
-                continue
+        starts = numpy.flatnonzero(numpy.r_[True, nums[1:] != nums[:-1]])
+        lengths = numpy.diff(numpy.r_[starts, len(nums)])
 
-            counter += 1
-            if counter != pivot:
-                continue
+        # The first run may go on from the previous update, and then has been taken already if it was long enough
+        taken = numpy.zeros(len(starts), dtype=bool)
+        value, length = self._runs[high_or_low]
+        if length and nums[0] == value:
+            lengths[0] += length
+            taken[0] = length >= pivot
+        self._runs[high_or_low] = (int(nums[-1]), int(lengths[-1]))
 
+        for n in nums[starts[(lengths >= pivot) & ~taken]].tolist():
             target.append(n)
-            if self._is_far_from_level(n):
-                self._levels.append(n)
+            self._add_level_if_far(n, self._mean)
 
-    def _is_far_from_level(self, level: int) -> bool:
-        return numpy.sum([abs(level - x) < self._mean for x in self._levels]) == 0
+    def _determine_max_or_min_within_window(
+            self, high_or_low: str, new_rows: pandas.DataFrame, max_or_min: numpy.ufunc,
+    ) -> numpy.ndarray:
+        # Sliding window extrema in O(n) by splitting into blocks of the window size: the extremum of a window is the
+        # one of the suffix of the block it starts in and the prefix of the block it ends in
+        k = self.window_size
+        nums = numpy.r_[self._tails[high_or_low], new_rows[high_or_low].to_numpy(dtype=numpy.float64)]
+        self._tails[high_or_low] = nums[max(len(nums) - k + 1, 0):] if k > 1 else numpy.empty(0)
 
-    def _determine_max_or_min_within_window(self, high_or_low: str, max_or_min: Union[max, min]) -> List[int]:
-        nums = numpy.array(self.df[high_or_low])
         n = len(nums)
-        k = self.window_size
-        if n * k == 0:
-            return []
+        if n * k == 0 or k > n:
+            return numpy.empty(0, dtype=numpy.int64)
 
-        left, right = [0] * n, [0] * n
-        left[0], right[n - 1] = nums[0], nums[n - 1]
+        padding = -numpy.inf if max_or_min is numpy.maximum else numpy.inf
+        blocks = numpy.full(math.ceil(n / k) * k, padding)
+        blocks[:n] = nums
+        blocks = blocks.reshape(-1, k)
 
-        for i in range(1, n):
-            j = n - i - 1
-            left[i] = nums[i] if i % k == 0 else max_or_min(left[i - 1], nums[i])
-            right[j] = nums[j] if (j + 1) % k == 0 else max_or_min(right[j + 1], nums[j])
+        left = max_or_min.accumulate(blocks, axis=1).ravel()[:n]
+        right = max_or_min.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()[:n]
 
-        return [int(max_or_min(left[i + k - 1], right[i])) for i in range(n - k + 1)]
+        return max_or_min(left[k - 1:], right[:n - k + 1]).astype(numpy.int64)
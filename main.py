@@ -4,12 +4,8 @@ import logging
 import threading
 import time
 
-import numpy
-import talib
-
-from collections import deque
-
 from libraries.exchanges.bitflyer import BitFlyer, ProductCode
+from libraries.signals import RSI
 
 bf = BitFlyer()
 
@@ -27,7 +23,9 @@ tx_logger.addHandler(logging.FileHandler(filename='transaction.log'))
 
 class Processor:
     def __init__(self) -> None:
-        self.ltp = deque(maxlen=15)
+        self.last_ltp: Optional[float] = None
+        # Only the last 14 differences count, as when `talib.RSI` was fed the latest 15 prices on every tick
+        self.rsi = RSI(timeperiod=14, wilder=False)
 
         self.profits: Dict[float, float] = {}
         self.positions: Dict[float, Optional[float]] = {}
@@ -40,16 +38,16 @@ class Processor:
 
     def _process(self) -> None:
         ticker = bf.get_ticker(ProductCode.BTC_JPY)
-        diff = ticker.ltp - self.ltp[-1] if self.ltp else 0.0
+        diff = ticker.ltp - self.last_ltp if self.last_ltp is not None else 0.0
         timestamp = ticker.timestamp.timestamp()
         lb = {'tick_id': ticker.tick_id, 'timestamp': timestamp, 'ltp': ticker.ltp, 'diff': diff, 'rsi': None}
 
-        self.ltp.append(ticker.ltp)
-        if len(self.ltp) < 15:
+        self.last_ltp = ticker.ltp
+        rsi = self.rsi.update(ticker.ltp)
+        if rsi is None:
             ticker_logger.info(lb)
             return
 
-        rsi = talib.RSI(numpy.array(self.ltp), timeperiod=14)[-1]
         ticker_logger.info({**lb, **{'rsi': rsi}})
 
         for n in range(1, 31):
@@ -0,0 +1,60 @@
+from typing import List
+
+import numpy
+import pandas
+import pytest
+
+from libraries.analyzer.buffer import CandleBuffer, COLUMNS
+
+
+def _frame(minutes: List[int], close: float = 0.0) -> pandas.DataFrame:
+    index = pandas.DatetimeIndex(
+        [pandas.Timestamp('2021-11-08T00:00:00Z') + pandas.Timedelta(minutes=m) for m in minutes], name='Date',
+    )
+    return pandas.DataFrame({c: [float(m) + close for m in minutes] for c in COLUMNS}, index=index)
+
+
+class TestCandleBuffer:
+    def test_append_and_overwrite_open_candle(self) -> None:
+        buffer = CandleBuffer()
+        buffer.upsert_data_frame(_frame([0, 1, 2]))
+        buffer.upsert_data_frame(_frame([2, 3], close=0.5))
+
+        df = buffer.to_data_frame()
+        pandas.testing.assert_frame_equal(df, pandas.concat([_frame([0, 1]), _frame([2, 3], close=0.5)]))
+        assert str(df.index.tz) == 'UTC'
+
+    @pytest.mark.parametrize('capacity', (1, 3, 5))
+    def test_capacity(self, capacity: int) -> None:
+        buffer = CandleBuffer(capacity)
+        minutes = list(range(50))
+        for m in minutes:
+            buffer.upsert_data_frame(_frame([m]))
+            buffer.upsert_data_frame(_frame([m], close=0.5))
+            assert len(buffer) == min(m + 1, capacity)
+
+        pandas.testing.assert_frame_equal(buffer.to_data_frame(), _frame(minutes[-capacity:], close=0.5))
+
+    def test_grows_without_capacity(self) -> None:
+        buffer = CandleBuffer(initial_size=2)
+        buffer.upsert_data_frame(_frame(list(range(3))))
+        buffer.upsert_data_frame(_frame(list(range(2, 20))))
+
+        pandas.testing.assert_frame_equal(buffer.to_data_frame(), _frame(list(range(20))))
+
+    def test_batch_larger_than_capacity(self) -> None:
+        buffer = CandleBuffer(4)
+        buffer.upsert_data_frame(_frame([0]))
+        buffer.upsert_data_frame(_frame(list(range(10))))
+
+        pandas.testing.assert_frame_equal(buffer.to_data_frame(), _frame(list(range(6, 10))))
+
+    def test_snapshot_is_a_copy(self) -> None:
+        buffer = CandleBuffer()
+        buffer.upsert_data_frame(_frame([0]))
+        df = buffer.to_data_frame()
+        buffer.upsert_data_frame(_frame([0], close=0.5))
+
+        assert df['Close'].tolist() == [0.0]
+        assert buffer.column('Close').tolist() == [0.5]
+        assert buffer.last_index == numpy.datetime64('2021-11-08T00:00:00')
@@ -0,0 +1,33 @@
+import numpy
+import pandas
+import pytest
+
+from libraries.analyzer import Chart
+from libraries.exchanges.bitflyer import Candlestick, ProductCode
+from libraries.exchanges.bitflyer.models import ChartTable
+from libraries.signals.support_resistance import Fractal
+
+
+@pytest.fixture
+def candles() -> pandas.DataFrame:
+    rng = numpy.random.default_rng(0)
+    close = (7_000_000 + numpy.cumsum(rng.normal(0, 3_000, 500))).round()
+    index = pandas.date_range('2021-11-08', periods=len(close), freq='min', tz='UTC', name='Date')
+    return pandas.DataFrame({
+        'Open': close, 'High': close + 1_500, 'Low': close - 1_500, 'Close': close, 'Volume': 1.0,
+    }, index=index)
+
+
+class TestChart:
+    def test_support_resistance_follows_closed_candles(self, monkeypatch, candles: pandas.DataFrame) -> None:
+        monkeypatch.setattr(ChartTable, 'query_as_data_frame', lambda *_, **__: candles.iloc[:200])
+        chart = Chart(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, auto_following=False)
+        fractal = chart.add_support_resistance('fractal', Fractal)
+        assert chart.support_resistance('fractal') is fractal
+        assert fractal.df.index.equals(candles.index[:199])
+
+        # The last candle is still open and is only taken once a newer one shows up
+        for i in range(199, 500, 50):
+            chart._apply(candles.iloc[i:i + 51])
+        assert fractal.df.index.equals(candles.index[:499])
+        assert fractal.levels == Fractal(candles.iloc[:499]).levels
@@ -0,0 +1,62 @@
+from typing import List, Tuple
+
+import time
+from datetime import datetime
+
+import pandas
+import pytest
+
+from libraries.analyzer import ChartHub
+from libraries.exchanges.bitflyer import ChartType
+from libraries.exchanges.bitflyer.models import ChartTable
+
+
+@pytest.fixture
+def queries(monkeypatch) -> List[Tuple[ChartType, str]]:
+    calls: List[Tuple[ChartType, str]] = []
+
+    def query_as_data_frame(chart_type: ChartType, condition) -> pandas.DataFrame:
+        calls.append((chart_type, str(condition)))
+        index = pandas.DatetimeIndex([pandas.Timestamp('2021-11-08T00:01:00Z')], name='Date')
+        return pandas.DataFrame({'Close': [float(len(calls))]}, index=index)
+
+    monkeypatch.setattr(ChartTable, 'query_as_data_frame', query_as_data_frame)
+    return calls
+
+
+class TestChartHub:
+    def test_one_poller_per_chart_type(self, queries: List[Tuple[ChartType, str]]) -> None:
+        hub = ChartHub(interval=0.05)
+        received: List[Tuple[str, float]] = []
+        since = datetime(2021, 11, 8)
+
+        ids = [
+            hub.subscribe(ChartType.BTC_JPY_ONE_MINUTE, lambda df: received.append(('a', df['Close'][-1])), since),
+            hub.subscribe(ChartType.BTC_JPY_ONE_MINUTE, lambda df: received.append(('b', df['Close'][-1])), since),
+        ]
+        assert hub.chart_types == [ChartType.BTC_JPY_ONE_MINUTE]
+
+        deadline = time.time() + 5
+        while len(received) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        for i in ids:
+            hub.unsubscribe(ChartType.BTC_JPY_ONE_MINUTE, i)
+        assert hub.chart_types == []
+
+        time.sleep(0.1)
+        n = len(queries)
+        assert n >= 2
+        assert all(c is ChartType.BTC_JPY_ONE_MINUTE for c, _ in queries)
+        a = [v for k, v in received if k == 'a']
+        b = [v for k, v in received if k == 'b']
+        # Both see every poll in order, except one that may slip in before 'b' subscribed or after 'a' unsubscribed
+        assert a == [float(i) for i in range(1, len(a) + 1)] and len(a) >= 2
+        assert b == [float(i) for i in range(int(b[0]), int(b[-1]) + 1)]
+        assert b[0] in (1.0, 2.0) and b[-1] - a[-1] in (0.0, 1.0) and b[-1] <= n
+
+        time.sleep(0.1)
+        assert len(queries) == n
+
+    def test_shared(self) -> None:
+        assert ChartHub.shared(1.0) is ChartHub.shared(1.0)
+        assert ChartHub.shared(1.0) is not ChartHub.shared(2.0)
@@ -0,0 +1,37 @@
+import numpy
+import pytest
+
+from libraries.backtest import RSIBacktest
+
+
+@pytest.fixture
+def prices() -> numpy.ndarray:
+    rng = numpy.random.default_rng(0)
+    return 7_000_000 + numpy.cumsum(rng.normal(0, 20_000, 3000)).round()
+
+
+class TestRSIBacktest:
+    def test_same_as_processor(self, prices: numpy.ndarray, tmp_path, monkeypatch) -> None:
+        monkeypatch.chdir(tmp_path)
+        from main import Processor
+
+        processor = Processor()
+        backtest = RSIBacktest(prices)
+        for i, price in enumerate(prices):
+            if processor.rsi.update(price) is None:
+                continue
+            for n in range(1, 31):
+                processor.transact(price, processor.rsi.value, float(i), n / 10)
+
+        result = backtest.run()
+        for rate, profit in processor.profits.items():
+            assert result.loc[rate, 'profit'] == pytest.approx(profit, abs=1e-6)
+        assert (result['trades'] > 0).all()
+
+    def test_drawdown(self) -> None:
+        prices = numpy.array([100.0] * 15 + [90.0] * 15 + [80.0] * 15 + [70.0])
+        result = RSIBacktest(prices).run((1.0, ))
+
+        assert result.loc[1.0, 'trades'] == 3
+        assert result.loc[1.0, 'loss_cuts'] == 3
+        assert result.loc[1.0, 'max_drawdown'] == pytest.approx(-result.loc[1.0, 'realized_profit'])
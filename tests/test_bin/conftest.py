@@ -0,0 +1,33 @@
+from typing import Iterator
+
+import os
+
+import pytest
+from pynamodb.models import Model
+
+from libraries.exchanges.bitflyer.models import ChartTable, TickerTable, WatermarkTable
+
+
+def _table(model: Model.__class__) -> Iterator[Model.__class__]:
+    if not os.environ.get('DDB_HOST'):
+        pytest.skip('`DDB_HOST` pointing at a local DynamoDB is required')
+
+    if not model.exists():
+        model.create_table(wait=True)
+    yield model
+    model.delete_table()
+
+
+@pytest.fixture
+def chart_table() -> Iterator[ChartTable.__class__]:
+    yield from _table(ChartTable)
+
+
+@pytest.fixture
+def ticker_table() -> Iterator[TickerTable.__class__]:
+    yield from _table(TickerTable)
+
+
+@pytest.fixture
+def watermark_table() -> Iterator[WatermarkTable.__class__]:
+    yield from _table(WatermarkTable)
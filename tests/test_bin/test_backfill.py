@@ -0,0 +1,193 @@
+from typing import Dict, List, Union
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from requests_mock.mocker import Mocker
+
+from bin.backfill import ONE_MINUTE, Checkpoints, aggregate, backfill, chunks, find_gaps, first_id_at
+from bin.chart_data_generator import store
+from libraries.candles.rollup import Sticks, rollup
+from libraries.exchanges.bitflyer import BitFlyer, Candlestick, ChartType, ProductCode, RestPolicy
+from libraries.exchanges.bitflyer.models import ChartTable
+
+T0 = datetime(2021, 11, 8, 1, 0, tzinfo=timezone.utc)
+
+
+def _at(i: int) -> datetime:
+    # Execution `i` happens `i` seconds after T0, every third id only
+    return T0 + timedelta(seconds=i)
+
+
+@pytest.fixture
+def executions_api(requests_mock: Mocker) -> List[int]:
+    ids = list(range(1, 1200, 3))
+    probes = []
+
+    def respond(request, _) -> List[Dict[str, Union[str, int, float]]]:
+        q = {k: int(v[0]) for k, v in request.qs.items() if k != 'product_code'}
+        if q['count'] == 1:
+            probes.append(q.get('before'))
+        matched = [i for i in reversed(ids) if q.get('after', 0) < i < q.get('before', 10 ** 9)][:q['count']]
+        return [{
+            'id': i, 'side': ('BUY', 'SELL', '')[i // 3 % 3], 'price': 1000.0 + i % 7, 'size': 0.5,
+            'exec_date': _at(i).isoformat()[:19] + '.000', 'buy_child_order_acceptance_id': '',
+            'sell_child_order_acceptance_id': '',
+        } for i in matched]
+
+    requests_mock.get(f'{BitFlyer.URL}/executions', json=respond)
+    return probes
+
+
+@pytest.fixture
+def client() -> BitFlyer:
+    return BitFlyer(RestPolicy(max_workers=2, backoff=0))
+
+
+class TestChunks:
+    def test_chunks(self) -> None:
+        gaps = [(T0, T0 + timedelta(minutes=5)), (T0 + timedelta(minutes=9), T0 + timedelta(minutes=10))]
+        assert list(chunks(gaps, timedelta(minutes=2))) == [
+            (T0, T0 + timedelta(minutes=2)),
+            (T0 + timedelta(minutes=2), T0 + timedelta(minutes=4)),
+            (T0 + timedelta(minutes=4), T0 + timedelta(minutes=5)),
+            (T0 + timedelta(minutes=9), T0 + timedelta(minutes=10)),
+        ]
+
+
+class TestFirstIdAt:
+    @pytest.mark.parametrize('seconds', (0, 1, 2, 4, 500, 501, 1197, 1198, 5000))
+    def test_first_id_at(self, seconds: int, client: BitFlyer, executions_api: List[int]) -> None:
+        expected = next((i for i in range(1, 1200, 3) if i >= seconds), 1200)
+        assert first_id_at(client, ProductCode.BTC_JPY, _at(seconds), 0, 1200) == expected
+        assert len(executions_api) <= 12
+
+
+class TestCheckpoints:
+    def test_survives_restarts(self, tmp_path) -> None:
+        path = os.path.join(tmp_path, 'backfill.json')
+        Checkpoints(path).cover(ProductCode.BTC_JPY, T0, T0 + timedelta(hours=1))
+
+        checkpoints = Checkpoints(path)
+        assert checkpoints.covered(ProductCode.BTC_JPY) == [(T0, T0 + timedelta(hours=1))]
+        assert checkpoints.covered(ProductCode.ETH_JPY) == []
+
+    def test_cover(self, tmp_path) -> None:
+        checkpoints = Checkpoints(os.path.join(tmp_path, 'backfill.json'))
+        hour = timedelta(hours=1)
+        checkpoints.cover(ProductCode.BTC_JPY, T0 + 4 * hour, T0 + 5 * hour)
+        checkpoints.cover(ProductCode.BTC_JPY, T0, T0 + hour)
+        checkpoints.cover(ProductCode.BTC_JPY, T0 + 2 * hour, T0 + 3 * hour)
+        checkpoints.cover(ProductCode.BTC_JPY, T0 + 3 * hour, T0 + 4 * hour)
+        assert checkpoints.covered(ProductCode.BTC_JPY) == [(T0, T0 + hour), (T0 + 2 * hour, T0 + 5 * hour)]
+
+        assert checkpoints.uncovered(ProductCode.BTC_JPY, T0 - hour, T0 + 6 * hour) == [
+            (T0 - hour, T0), (T0 + hour, T0 + 2 * hour), (T0 + 5 * hour, T0 + 6 * hour),
+        ]
+        assert checkpoints.uncovered(ProductCode.BTC_JPY, T0 + 2 * hour, T0 + 4 * hour) == []
+        assert checkpoints.uncovered(ProductCode.BTC_JPY, T0 + 30 * ONE_MINUTE, T0 + 90 * ONE_MINUTE) == [
+            (T0 + hour, T0 + 90 * ONE_MINUTE),
+        ]
+
+    def test_pending(self, tmp_path) -> None:
+        path = os.path.join(tmp_path, 'backfill.json')
+        chunk = (T0, T0 + timedelta(minutes=4))
+        Checkpoints(path).begin(ProductCode.BTC_JPY, chunk)
+        assert Checkpoints(path).pending(ProductCode.BTC_JPY) == chunk
+
+        Checkpoints(path).cover(ProductCode.BTC_JPY, *chunk)
+        assert Checkpoints(path).pending(ProductCode.BTC_JPY) is None
+        assert Checkpoints(path).covered(ProductCode.BTC_JPY) == [chunk]
+
+
+class TestBackfill:
+    def test_backfill(
+            self, tmp_path, client: BitFlyer, executions_api: List[int], chart_table: ChartTable.__class__,
+    ) -> None:
+        one_minute = ChartType.BTC_JPY_ONE_MINUTE
+        stored = ChartTable(
+            one_minute, T0 + timedelta(minutes=3), open_value=1, high_value=1, low_value=1, close_value=1, volume=1,
+            open_timestamp=T0 + timedelta(minutes=3), close_timestamp=T0 + timedelta(minutes=3),
+        )
+        stored.save()
+        until = T0 + timedelta(minutes=10)
+        assert find_gaps(ProductCode.BTC_JPY, T0, until) == [
+            (T0, T0 + timedelta(minutes=3)), (T0 + timedelta(minutes=4), until),
+        ]
+
+        checkpoints = Checkpoints(os.path.join(tmp_path, 'backfill.json'))
+        backfill(ProductCode.BTC_JPY, client, checkpoints, T0, until, timedelta(minutes=4))
+        assert checkpoints.covered(ProductCode.BTC_JPY) == [(T0, until)]
+        assert find_gaps(ProductCode.BTC_JPY, T0, until) == []
+
+        ids = [i for i in range(1, 600, 3) if not 180 <= i < 240]
+        sticks = rollup(Sticks.from_trades(
+            [int(_at(i).timestamp() * 1_000_000) for i in ids], [1000.0 + i % 7 for i in ids], [0.5] * len(ids),
+            [0.5 if i // 3 % 3 == 0 else 0 for i in ids], [0.5 if i // 3 % 3 == 1 else 0 for i in ids],
+        ), Candlestick.ONE_MINUTE).to_dict()
+        for minute, stick in sticks.items():
+            c = chart_table.get(one_minute, minute)
+            assert (c.open_value, c.high_value, c.low_value, c.close_value) == (
+                stick['open'], stick['high'], stick['low'], stick['close'],
+            )
+            assert (c.volume, c.buy_volume, c.sell_volume) == (
+                stick['volume'], stick['buy_volume'], stick['sell_volume'],
+            )
+
+        assert chart_table.get(one_minute, T0 + timedelta(minutes=3)).volume == 1
+        assert chart_table.get(ChartType.BTC_JPY_ONE_HOUR, T0).volume == pytest.approx(0.5 * len(ids))
+
+    def test_resumes_from_checkpoint(
+            self, tmp_path, client: BitFlyer, executions_api: List[int], chart_table: ChartTable.__class__,
+    ) -> None:
+        path = os.path.join(tmp_path, 'backfill.json')
+        until = T0 + timedelta(minutes=10)
+        with open(path, 'w') as f:
+            covered = [[T0.isoformat(), (T0 + timedelta(minutes=8)).isoformat()]]
+            json.dump({ProductCode.BTC_JPY.name: {'covered': covered}}, f)
+
+        touched = backfill(ProductCode.BTC_JPY, client, Checkpoints(path), T0, until, timedelta(minutes=4))
+        # Two one minute candles, and one of each longer candlestick
+        assert touched == 2 + len(Candlestick) - 1
+        assert chart_table.count(ChartType.BTC_JPY_ONE_MINUTE) == 2
+
+        # Nothing is left to do once it has finished
+        assert backfill(ProductCode.BTC_JPY, client, Checkpoints(path), T0, until, timedelta(minutes=4)) == 0
+
+    def test_extends_to_earlier_ranges(
+            self, tmp_path, client: BitFlyer, executions_api: List[int], chart_table: ChartTable.__class__,
+    ) -> None:
+        # A run over a longer range than the last one, as of `--days 14` after `--days 3`
+        path = os.path.join(tmp_path, 'backfill.json')
+        until = T0 + timedelta(minutes=10)
+        backfill(ProductCode.BTC_JPY, client, Checkpoints(path), T0 + timedelta(minutes=6), until, timedelta(minutes=4))
+        assert chart_table.count(ChartType.BTC_JPY_ONE_MINUTE) == 4
+
+        backfill(ProductCode.BTC_JPY, client, Checkpoints(path), T0, until, timedelta(minutes=4))
+        assert chart_table.count(ChartType.BTC_JPY_ONE_MINUTE) == 10
+        assert find_gaps(ProductCode.BTC_JPY, T0, until) == []
+        assert Checkpoints(path).covered(ProductCode.BTC_JPY) == [(T0, until)]
+
+    def test_resumes_an_interrupted_chunk(
+            self, tmp_path, client: BitFlyer, executions_api: List[int], chart_table: ChartTable.__class__,
+    ) -> None:
+        path = os.path.join(tmp_path, 'backfill.json')
+        chunk = (T0, T0 + timedelta(minutes=4))
+        sticks_of = aggregate(ProductCode.BTC_JPY, client, 1, 240, chunk)
+
+        # Written up to the one minute and five minute candles when it was interrupted
+        Checkpoints(path).begin(ProductCode.BTC_JPY, chunk)
+        written = (ChartType.BTC_JPY_ONE_MINUTE, ChartType.BTC_JPY_FIVE_MINUTES)
+        store({c: sticks_of[c] for c in written}, chunk=f'{chunk[0].isoformat()}/{chunk[1].isoformat()}')
+        assert find_gaps(ProductCode.BTC_JPY, *chunk) == []
+
+        backfill(ProductCode.BTC_JPY, client, Checkpoints(path), T0, chunk[1], timedelta(minutes=4))
+        assert Checkpoints(path).pending(ProductCode.BTC_JPY) is None
+
+        volume = 0.5 * len(range(1, 240, 3))
+        for chart_type in (ChartType.BTC_JPY_ONE_MINUTE, ChartType.BTC_JPY_FIVE_MINUTES, ChartType.BTC_JPY_ONE_HOUR):
+            assert sum(c.volume for c in chart_table.query(chart_type)) == pytest.approx(volume)
+        hour = chart_table.get(ChartType.BTC_JPY_ONE_HOUR, T0)
+        assert (hour.open_value, hour.close_value) == (1000.0 + 1 % 7, 1000.0 + 238 % 7)
@@ -0,0 +1,154 @@
+from typing import Optional
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bin import chart_data_generator
+from bin.chart_data_generator import SETTLE, START, STICKS_OF, run, store, watermark_of
+from libraries.exchanges.bitflyer import ChartType, ProductCode, State
+from libraries.exchanges.bitflyer.models import ChartTable, TickerTable, WatermarkTable
+
+T0 = datetime(2021, 11, 8, 1, 2, tzinfo=timezone.utc)
+
+
+def _stick(ts: datetime, o: float, h: float, l: float, c: float, v: float) -> dict:  # noqa: E741
+    return {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'open_ts': ts, 'close_ts': ts}
+
+
+class TestStore:
+    def test_store_merges_into_existing_candles(self, chart_table: ChartTable.__class__) -> None:
+        m1 = datetime(2021, 11, 8, 1, 2, tzinfo=timezone.utc)
+        m2 = datetime(2021, 11, 8, 1, 3, tzinfo=timezone.utc)
+
+        first: STICKS_OF = {
+            ChartType.BTC_JPY_ONE_MINUTE: {m1: _stick(m1.replace(second=10), 100, 120, 90, 110, 1.0)},
+            ChartType.BTC_JPY_ONE_HOUR: {m1.replace(minute=0): _stick(m1.replace(second=10), 100, 120, 90, 110, 1.0)},
+        }
+        assert store(first) == 2
+
+        second: STICKS_OF = {
+            ChartType.BTC_JPY_ONE_MINUTE: {
+                m1: _stick(m1.replace(second=50), 105, 130, 95, 125, 2.0),
+                m2: _stick(m2.replace(second=1), 126, 126, 126, 126, 0.5),
+            },
+        }
+        assert store(second) == 2
+
+        c1 = chart_table.get(ChartType.BTC_JPY_ONE_MINUTE, m1)
+        assert (c1.open_value, c1.high_value, c1.low_value, c1.close_value, c1.volume) == (100, 130, 90, 125, 3.0)
+        c2 = chart_table.get(ChartType.BTC_JPY_ONE_MINUTE, m2)
+        assert (c2.open_value, c2.high_value, c2.low_value, c2.close_value, c2.volume) == (126, 126, 126, 126, 0.5)
+        h = chart_table.get(ChartType.BTC_JPY_ONE_HOUR, m1.replace(minute=0))
+        assert h.volume == 1.0
+
+    def test_store_nothing(self, chart_table: ChartTable.__class__) -> None:
+        assert store({ChartType.BTC_JPY_ONE_MINUTE: {}}) == 0
+
+    def test_store_same_batch_again(self, chart_table: ChartTable.__class__) -> None:
+        m1 = datetime(2021, 11, 8, 1, 2, tzinfo=timezone.utc)
+        sticks: STICKS_OF = {ChartType.BTC_JPY_ONE_MINUTE: {m1: _stick(m1.replace(second=10), 100, 120, 90, 110, 1.0)}}
+
+        assert store(sticks, m1.replace(second=30)) == 1
+        assert store(sticks, m1.replace(second=30)) == 0
+        assert store(sticks, m1.replace(second=40)) == 1
+        assert chart_table.get(ChartType.BTC_JPY_ONE_MINUTE, m1).volume == 2.0
+
+
+def _ticker(
+        tick_id: int, ts: datetime, ltp: float, product_code: ProductCode = ProductCode.BTC_JPY,
+        written_at: Optional[datetime] = None,
+) -> TickerTable:
+    return TickerTable(
+        tick_id=tick_id, product_code=product_code, state=State.RUNNING, timestamp=ts, best_bid=ltp, best_ask=ltp,
+        best_bid_size=0.1, best_ask_size=0.1, total_bid_depth=1.0, total_ask_depth=1.0, market_bid_size=0.0,
+        market_ask_size=0.0, ltp=ltp, volume=1.0, volume_by_product=1.0, ttl=ts + timedelta(days=7),
+        written_at=written_at or ts,
+    )
+
+
+def _written_until(ts: datetime) -> None:
+    WatermarkTable(WatermarkTable.COLLECTOR, done=ts).save()
+
+
+@pytest.fixture
+def tables(
+        chart_table: ChartTable.__class__, ticker_table: TickerTable.__class__,
+        watermark_table: WatermarkTable.__class__,
+) -> None:
+    pass
+
+
+@pytest.mark.usefixtures('tables')
+class TestRun:
+    def test_consumes_only_newer_tickers(self) -> None:
+        for i in range(6):
+            _ticker(i, T0 + timedelta(seconds=10 * i), 100.0 + i).save()
+        _ticker(100, T0, 1.0, ProductCode.ETH_JPY).save()
+
+        # The last two have not been reported written by the collector yet, and are left to the next cycle
+        _written_until(T0 + timedelta(seconds=40))
+        assert run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5)) > 0
+        assert watermark_of(ProductCode.BTC_JPY).done == T0 + timedelta(seconds=40) - timedelta(microseconds=1)
+        c = ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0)
+        assert (c.open_value, c.high_value, c.low_value, c.close_value, c.volume) == (100, 103, 100, 103, 4)
+
+        # Written, but too recently for the index to be trusted to have them
+        _written_until(T0 + timedelta(minutes=5))
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(seconds=50) + SETTLE)
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0).volume == 5
+
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5))
+        c = ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0)
+        assert (c.open_value, c.high_value, c.low_value, c.close_value, c.volume) == (100, 105, 100, 105, 6)
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_DAY, T0.replace(hour=0, minute=0)).volume == 6
+
+        # Nothing left to consume, and tickers are left to their `ttl`
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=6))
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0).volume == 6
+        assert TickerTable.count() == 7
+
+    def test_consumes_tickers_written_late(self) -> None:
+        _ticker(1, T0, 100.0).save()
+        _written_until(T0 + timedelta(minutes=1))
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5))
+
+        # Stuck in the buffer of the collector for minutes, it is consumed when it is written whatever its timestamp
+        _ticker(2, T0 + timedelta(seconds=1), 120.0, written_at=T0 + timedelta(minutes=3)).save()
+        _written_until(T0 + timedelta(minutes=4))
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=10))
+
+        c = ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0)
+        assert (c.open_value, c.high_value, c.close_value, c.volume) == (100, 120, 120, 2)
+
+    def test_nothing_before_the_collector_reports(self) -> None:
+        _ticker(1, T0, 100.0).save()
+        assert run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5)) == 0
+        assert watermark_of(ProductCode.BTC_JPY).done == START
+
+    def test_rerun_after_failure(self, monkeypatch) -> None:
+        for i in range(6):
+            _ticker(i, T0 + timedelta(seconds=10 * i), 100.0 + i).save()
+        _written_until(T0 + timedelta(minutes=1))
+
+        def fail_after_store(*args, **kwargs) -> int:
+            store(*args, **kwargs)
+            raise RuntimeError('failed before the watermark was saved')
+
+        monkeypatch.setattr(chart_data_generator, 'store', fail_after_store)
+        with pytest.raises(RuntimeError):
+            run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5))
+        assert watermark_of(ProductCode.BTC_JPY).pending == T0 + timedelta(minutes=1) - timedelta(microseconds=1)
+
+        # A ticker of a later cycle is written before the failed one is run again
+        _ticker(6, T0 + timedelta(minutes=1, seconds=30), 200.0).save()
+        _written_until(T0 + timedelta(minutes=2))
+        monkeypatch.setattr(chart_data_generator, 'store', store)
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5))
+
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_MINUTE, T0).volume == 6
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_HOUR, T0.replace(minute=0)).volume == 6
+        assert watermark_of(ProductCode.BTC_JPY).done == T0 + timedelta(minutes=1) - timedelta(microseconds=1)
+
+        run(ProductCode.BTC_JPY, now=T0 + timedelta(minutes=5))
+        assert ChartTable.get(ChartType.BTC_JPY_ONE_HOUR, T0.replace(minute=0)).volume == 7
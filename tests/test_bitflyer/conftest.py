@@ -1,8 +1,24 @@
+from typing import Iterator
+
+import os
+
 import pytest
 
 from libraries.exchanges.bitflyer import BitFlyer
+from libraries.exchanges.bitflyer.models import ChartTable
 
 
 @pytest.fixture
 def client() -> BitFlyer:
     return BitFlyer()
+
+
+@pytest.fixture
+def chart_table() -> Iterator[ChartTable.__class__]:
+    if not os.environ.get('DDB_HOST'):
+        pytest.skip('`DDB_HOST` pointing at a local DynamoDB is required')
+
+    if not ChartTable.exists():
+        ChartTable.create_table(wait=True)
+    yield ChartTable
+    ChartTable.delete_table()
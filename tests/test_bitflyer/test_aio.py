@@ -0,0 +1,177 @@
+from typing import Any, Dict, List, Optional
+
+import asyncio
+import json
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from libraries.exchanges.bitflyer import ProductCode, PublicChannel, RestPolicy, Ticker
+from libraries.exchanges.bitflyer.aio import AsyncBitFlyer, AsyncBitFlyerRealTime
+
+
+def _ticker(product_code: str, tick_id: int) -> Dict[str, Any]:
+    return {
+        'product_code': product_code, 'state': 'RUNNING', 'timestamp': '2021-11-08T12:34:56.1234567Z',
+        'tick_id': tick_id, 'best_bid': 1.0, 'best_ask': 2.0, 'best_bid_size': 0.1, 'best_ask_size': 0.1,
+        'total_bid_depth': 1.0, 'total_ask_depth': 1.0, 'market_bid_size': 0.0, 'market_ask_size': 0.0,
+        'ltp': 1.5, 'volume': 1.0, 'volume_by_product': 1.0,
+    }
+
+
+class StandIn:
+    # A local lightstream: answers every subscription with two messages of the channel and one of another channel
+    def __init__(self, drop_first_connection: bool = False, statuses: Optional[List[int]] = None) -> None:
+        self.drop_first_connection = drop_first_connection
+        self.connections = 0
+        self.subscribed: List[str] = []
+        # Statuses the REST API answers with before it succeeds
+        self.statuses = list(statuses or [])
+        self.requests = 0
+
+        app = web.Application()
+        app.router.add_get('/json-rpc', self.json_rpc)
+        app.router.add_get('/v1/ticker', self.ticker)
+        self.server = TestServer(app)
+
+    async def json_rpc(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        connection = self.connections
+
+        async for msg in ws:
+            channel = json.loads(msg.data)['params']['channel']
+            self.subscribed.append(channel)
+            if self.drop_first_connection and connection == 1:
+                break
+
+            product_code = channel.split('_', 2)[-1]
+            for i in (1, 2):
+                message = _ticker(product_code, i) if channel.startswith('lightning_ticker') else {'n': i}
+                await ws.send_str(json.dumps({
+                    'jsonrpc': '2.0', 'method': 'channelMessage', 'params': {'channel': channel, 'message': message},
+                }))
+            await ws.send_str(json.dumps({
+                'jsonrpc': '2.0', 'method': 'channelMessage',
+                'params': {'channel': 'lightning_executions_XRP_JPY', 'message': []},
+            }))
+
+        await ws.close()
+        return ws
+
+    async def ticker(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0), headers={'Retry-After': '0'})
+        return web.json_response(_ticker(request.query['product_code'], 1))
+
+
+def _run(coroutine) -> Any:
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+class TestAsyncBitFlyerRealTime:
+    def test_iterators_and_callbacks(self) -> None:
+        async def scenario() -> None:
+            stand_in = StandIn()
+            await stand_in.server.start_server()
+            board: List[Any] = []
+            board_received = asyncio.Event()
+
+            async def on_board(message: Any) -> None:
+                board.append(message)
+                if len(board) == 2:
+                    board_received.set()
+
+            async with AsyncBitFlyerRealTime(str(stand_in.server.make_url('/json-rpc'))) as client:
+                tickers = await client.messages(PublicChannel.lightning_ticker, ProductCode.BTC_JPY)
+                await client.subscribe(PublicChannel.lightning_board, ProductCode.ETH_JPY, on_board)
+                task = asyncio.create_task(client.run())
+
+                received = [await tickers.__anext__(), await tickers.__anext__()]
+                await board_received.wait()
+
+            await task
+            await stand_in.server.close()
+
+            assert all(isinstance(t, Ticker) and t.product_code is ProductCode.BTC_JPY for t in received)
+            assert [t.tick_id for t in received] == [1, 2]
+            assert board == [{'n': 1}, {'n': 2}]
+            assert sorted(stand_in.subscribed) == ['lightning_board_ETH_JPY', 'lightning_ticker_BTC_JPY']
+            assert [t async for t in tickers] == []
+
+        _run(scenario())
+
+    def test_reconnects_and_subscribes_again(self) -> None:
+        async def scenario() -> None:
+            stand_in = StandIn(drop_first_connection=True)
+            await stand_in.server.start_server()
+
+            client = AsyncBitFlyerRealTime(str(stand_in.server.make_url('/json-rpc')), reconnect_interval=0.01)
+            tickers = await client.messages(PublicChannel.lightning_ticker, ProductCode.FX_BTC_JPY)
+            task = asyncio.create_task(client.run())
+            ticker = await tickers.__anext__()
+            await client.close()
+            await task
+            await stand_in.server.close()
+
+            assert ticker.product_code is ProductCode.FX_BTC_JPY
+            assert stand_in.connections == 2
+            assert stand_in.subscribed == ['lightning_ticker_FX_BTC_JPY'] * 2
+
+        _run(scenario())
+
+
+class TestAsyncBitFlyer:
+    @staticmethod
+    def _scenario(stand_in: StandIn, policy: RestPolicy, product_codes: List[ProductCode]):
+        async def scenario() -> Dict[ProductCode, Ticker]:
+            await stand_in.server.start_server()
+            try:
+                async with AsyncBitFlyer(policy=policy) as client:
+                    client.URL = str(stand_in.server.make_url('/v1'))
+                    return await client.get_tickers(product_codes)
+            finally:
+                await stand_in.server.close()
+
+        return scenario()
+
+    def test_get_ticker(self) -> None:
+        async def scenario() -> Ticker:
+            stand_in = StandIn()
+            await stand_in.server.start_server()
+            async with AsyncBitFlyer() as client:
+                client.URL = str(stand_in.server.make_url('/v1'))
+                ticker = await client.get_ticker(ProductCode.ETH_JPY)
+            await stand_in.server.close()
+            return ticker
+
+        assert _run(scenario()) == Ticker.from_dict(_ticker('ETH_JPY', 1))
+
+    def test_get_tickers(self) -> None:
+        product_codes = [ProductCode.BTC_JPY, ProductCode.ETH_JPY, ProductCode.FX_BTC_JPY]
+        tickers = _run(self._scenario(StandIn(), RestPolicy(), product_codes))
+        assert {p: t.product_code for p, t in tickers.items()} == {p: p for p in product_codes}
+
+    def test_retries(self) -> None:
+        stand_in = StandIn(statuses=[503, 429])
+        tickers = _run(self._scenario(stand_in, RestPolicy(backoff=0), [ProductCode.BTC_JPY]))
+        assert tickers[ProductCode.BTC_JPY].product_code is ProductCode.BTC_JPY
+        assert stand_in.requests == 3
+
+    def test_gives_up(self) -> None:
+        stand_in = StandIn(statuses=[502] * 5)
+        with pytest.raises(aiohttp.ClientResponseError):
+            _run(self._scenario(stand_in, RestPolicy(backoff=0, max_retries=2), [ProductCode.BTC_JPY]))
+        assert stand_in.requests == 3
+
+    def test_rate_limited(self) -> None:
+        # A burst of 2 and then 50 requests a second
+        policy = RestPolicy(max_requests=52, period=1, burst=2)
+        started = time.monotonic()
+        _run(self._scenario(StandIn(), policy, list(ProductCode)[:7]))
+        assert time.monotonic() - started >= 5 / 50 * 0.9
@@ -0,0 +1,83 @@
+from typing import Any, Dict
+
+from datetime import datetime, timezone
+
+import numpy
+import pytest
+
+from libraries.exchanges.bitflyer import Ticker, ProductCode
+from libraries.exchanges.bitflyer.archive import TickArchive
+
+
+def _ticker(timestamp: str, tick_id: int, product_code: str = 'BTC_JPY') -> Ticker:
+    data: Dict[str, Any] = {
+        'product_code': product_code,
+        'state': 'CIRCUIT BREAK',
+        'timestamp': timestamp,
+        'tick_id': tick_id,
+        'best_bid': 6936194.0,
+        'best_ask': 6940335.0,
+        'best_bid_size': 0.095,
+        'best_ask_size': 0.405,
+        'total_bid_depth': 681.4649319,
+        'total_ask_depth': 856.83601465,
+        'market_bid_size': 0.0,
+        'market_ask_size': 0.0,
+        'ltp': 6936198.0 + tick_id,
+        'volume': 11559.369918,
+        'volume_by_product': 1740.24096177,
+    }
+    return Ticker.from_dict(data)
+
+
+@pytest.fixture
+def archive(tmp_path) -> TickArchive:
+    with TickArchive(str(tmp_path)) as a:
+        yield a
+
+
+class TestTickArchive:
+    def test_round_trip(self, archive: TickArchive) -> None:
+        tickers = [_ticker('2021-11-08T23:59:59.9999999Z', 1), _ticker('2021-11-09T00:00:00.1Z', 2)]
+        assert archive.extend(tickers) == 2
+
+        records = archive.load(
+            ProductCode.BTC_JPY, datetime(2021, 11, 8, tzinfo=timezone.utc), datetime(2021, 11, 10, tzinfo=timezone.utc),
+        )
+        assert list(TickArchive.to_tickers(ProductCode.BTC_JPY, records)) == tickers
+        assert len(archive.read(ProductCode.BTC_JPY, datetime(2021, 11, 8).date())) == 1
+
+    def test_scan(self, archive: TickArchive) -> None:
+        archive.extend(_ticker(f'2021-11-08T01:00:{s:02}.0Z', s) for s in range(60))
+
+        chunks = list(archive.scan(
+            ProductCode.BTC_JPY,
+            datetime(2021, 11, 8, 1, 0, 10, tzinfo=timezone.utc), datetime(2021, 11, 8, 1, 0, 19, tzinfo=timezone.utc),
+        ))
+        assert len(chunks) == 1
+        assert isinstance(chunks[0], numpy.memmap)
+        assert chunks[0]['tick_id'].tolist() == list(range(10, 20))
+
+    def test_drops_older_tickers(self, archive: TickArchive, tmp_path) -> None:
+        assert archive.append(_ticker('2021-11-08T01:00:01.0Z', 1))
+        assert not archive.append(_ticker('2021-11-08T01:00:00.0Z', 2))
+
+        archive.close()
+        with TickArchive(str(tmp_path)) as reopened:
+            assert not reopened.append(_ticker('2021-11-08T01:00:00.5Z', 3))
+            assert reopened.append(_ticker('2021-11-08T01:00:02.0Z', 4))
+            assert reopened.read(ProductCode.BTC_JPY, datetime(2021, 11, 8).date())['tick_id'].tolist() == [1, 4]
+
+    def test_ignores_partially_written_record(self, archive: TickArchive) -> None:
+        archive.append(_ticker('2021-11-08T01:00:00.0Z', 1))
+        with open(archive.path(ProductCode.BTC_JPY, datetime(2021, 11, 8).date()), 'ab') as f:
+            f.write(b'\x00' * 10)
+
+        assert len(archive.read(ProductCode.BTC_JPY, datetime(2021, 11, 8).date())) == 1
+
+        archive.close()
+        archive.append(_ticker('2021-11-08T01:00:01.0Z', 2))
+        assert archive.read(ProductCode.BTC_JPY, datetime(2021, 11, 8).date())['tick_id'].tolist() == [1, 2]
+
+    def test_missing_day(self, archive: TickArchive) -> None:
+        assert len(archive.read(ProductCode.ETH_JPY, datetime(2021, 11, 8).date())) == 0
@@ -0,0 +1,152 @@
+from typing import Any, Dict, List, Optional
+
+import json
+import random
+
+import pytest
+
+from libraries.exchanges.bitflyer import BitFlyerRealTime, OrderBook, ProductCode, PublicChannel, Side
+from libraries.exchanges.bitflyer.dispatcher import DispatchPolicy
+
+
+def _levels(pairs) -> List[Dict[str, float]]:
+    return [{'price': p, 'size': s} for p, s in pairs]
+
+
+@pytest.fixture
+def book() -> OrderBook:
+    book = OrderBook(ProductCode.BTC_JPY)
+    book.apply_snapshot({
+        'mid_price': 100.0,
+        'bids': _levels(((99.0, 1.0), (98.0, 2.0), (97.0, 3.0))),
+        'asks': _levels(((101.0, 1.5), (102.0, 2.5), (103.0, 3.5))),
+    })
+    return book
+
+
+class TestOrderBook:
+    def test_snapshot(self, book: OrderBook) -> None:
+        assert book.best_bid == (99.0, 1.0)
+        assert book.best_ask == (101.0, 1.5)
+        assert book.spread == 2.0
+        assert book.bids() == [(99.0, 1.0), (98.0, 2.0), (97.0, 3.0)]
+        assert book.asks(2) == [(101.0, 1.5), (102.0, 2.5)]
+
+        book.apply_snapshot({'mid_price': 50.0, 'bids': _levels(((49.0, 1.0), )), 'asks': []})
+        assert book.bids() == [(49.0, 1.0)] and book.best_ask is None and book.spread is None
+
+    def test_diff(self, book: OrderBook) -> None:
+        book.apply_diff({
+            'mid_price': 100.0, 'bids': _levels(((99.0, 0.0), (98.5, 4.0))), 'asks': _levels(((102.0, 0.5), )),
+        })
+        assert book.bids() == [(98.5, 4.0), (98.0, 2.0), (97.0, 3.0)]
+        assert book.asks() == [(101.0, 1.5), (102.0, 0.5), (103.0, 3.5)]
+
+    def test_drops_levels_through_the_mid_price(self, book: OrderBook) -> None:
+        book.apply_diff({'mid_price': 102.5, 'bids': _levels(((102.0, 1.0), )), 'asks': _levels(((104.0, 1.0), ))})
+        assert book.best_bid == (102.0, 1.0)
+        assert book.asks() == [(103.0, 3.5), (104.0, 1.0)]
+
+    @pytest.mark.parametrize(('side', 'price_limit', 'expected'), (
+            (Side.BUY, None, 7.5),
+            (Side.BUY, 102.0, 4.0),
+            (Side.BUY, 100.0, 0.0),
+            (Side.SELL, None, 6.0),
+            (Side.SELL, 98.0, 3.0),
+    ))
+    def test_depth(self, book: OrderBook, side: Side, price_limit: float, expected: float) -> None:
+        assert book.depth(side, price_limit) == expected
+
+    @pytest.mark.parametrize(('side', 'size', 'expected'), (
+            (Side.BUY, 1.0, 101.0),
+            (Side.BUY, 2.0, (1.5 * 101.0 + 0.5 * 102.0) / 2.0),
+            (Side.SELL, 3.0, (99.0 + 2 * 98.0) / 3.0),
+            (Side.SELL, 6.5, None),
+    ))
+    def test_vwap(self, book: OrderBook, side: Side, size: float, expected: Optional[float]) -> None:
+        vwap = book.vwap(side, size)
+        assert vwap is None if expected is None else vwap == pytest.approx(expected)
+
+    def test_same_as_dict(self) -> None:
+        rng = random.Random(0)
+        book = OrderBook(ProductCode.BTC_JPY)
+        book.apply_snapshot({'bids': [], 'asks': []})
+        bids: Dict[float, float] = {}
+        asks: Dict[float, float] = {}
+
+        for _ in range(2000):
+            price = float(rng.randrange(1, 100))
+            size = rng.choice((0.0, rng.random()))
+            side, levels = (bids, 'bids') if price < 50 else (asks, 'asks')
+            book.apply_diff({levels: _levels(((price, size), ))})
+            if size:
+                side[price] = size
+            else:
+                side.pop(price, None)
+
+        assert book.bids() == sorted(bids.items(), reverse=True)
+        assert book.asks() == sorted(asks.items())
+        assert book.bids(3) == sorted(bids.items(), reverse=True)[:3]
+        assert book.best_ask == min(asks.items())
+        assert book.depth(Side.SELL, 25.0) == pytest.approx(sum(s for p, s in bids.items() if p >= 25.0))
+        assert book.depth(Side.BUY, 75.0) == pytest.approx(sum(s for p, s in asks.items() if p <= 75.0))
+
+    def test_stale_until_snapshot(self, book: OrderBook) -> None:
+        fresh = OrderBook(ProductCode.BTC_JPY)
+        fresh.apply_diff({'mid_price': 100.0, 'bids': _levels(((99.0, 1.0), ))})
+        assert fresh.stale and fresh.best_bid is None
+
+        book.handle((None, None))
+        book.handle((PublicChannel.lightning_board, {'bids': _levels(((99.0, 5.0), ))}))
+        assert book.stale and book.best_bid == (99.0, 1.0)
+
+        book.handle((PublicChannel.lightning_board_snapshot, {'mid_price': 100.0, 'bids': _levels(((98.0, 1.0), ))}))
+        book.handle((PublicChannel.lightning_board, {'bids': _levels(((99.0, 5.0), ))}))
+        assert not book.stale and book.bids() == [(99.0, 5.0), (98.0, 1.0)]
+
+
+class TestBitFlyerRealTime:
+    def test_dispatches_board(self) -> None:
+        client = BitFlyerRealTime()
+        book = client.order_book(ProductCode.ETH_JPY)
+        client._dispatcher.start()
+
+        def send(channel: str, message: Dict[str, Any]) -> None:
+            client._on_message(client._ws_app, json.dumps({
+                'jsonrpc': '2.0', 'method': 'channelMessage', 'params': {'channel': channel, 'message': message},
+            }))
+
+        send('lightning_board_snapshot_ETH_JPY', {
+            'mid_price': 100.0, 'bids': _levels(((99.0, 1.0), )), 'asks': _levels(((101.0, 1.0), )),
+        })
+        send('lightning_board_ETH_JPY', {'mid_price': 100.0, 'bids': _levels(((99.5, 2.0), )), 'asks': []})
+        client._dispatcher.close()
+
+        assert book.best_bid == (99.5, 2.0)
+        assert book.best_ask == (101.0, 1.0)
+
+    def test_board_in_order_with_workers(self) -> None:
+        # Snapshots and diffs alternate, each diff changing the level its snapshot has just set; applied out of order,
+        # the book would end up with the size of a snapshot or of an earlier diff
+        client = BitFlyerRealTime(DispatchPolicy(num_of_workers=4, max_queued=8))
+        book = client.order_book(ProductCode.BTC_JPY)
+        client._dispatcher.start()
+
+        def send(channel: str, message: Dict[str, Any]) -> None:
+            client._on_message(client._ws_app, json.dumps({
+                'jsonrpc': '2.0', 'method': 'channelMessage', 'params': {'channel': channel, 'message': message},
+            }))
+
+        for i in range(500):
+            send('lightning_board_snapshot_BTC_JPY', {
+                'mid_price': 100.0, 'bids': _levels(((99.0, float(i)), )), 'asks': _levels(((101.0, 1.0), )),
+            })
+            send('lightning_board_BTC_JPY', {'mid_price': 100.0, 'bids': _levels(((99.0, i + 0.5), )), 'asks': []})
+            send('lightning_board_BTC_JPY', {'bids': _levels(((98.0 - i % 3, 1.0), )), 'asks': []})
+        client._on_close(client._ws_app, None, None)
+        send('lightning_board_BTC_JPY', {'bids': _levels(((99.0, 1000.0), )), 'asks': []})
+        client._dispatcher.close()
+
+        assert book.stale
+        assert book.best_bid == (99.0, 499.5) and book.bids(2) == [(99.0, 499.5), (98.0 - 499 % 3, 1.0)]
+        assert client.stats()['book_BTC_JPY'].dropped == 0
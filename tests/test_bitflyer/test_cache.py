@@ -0,0 +1,173 @@
+from typing import List, Optional, Sequence, Tuple
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy
+import pandas
+import pytest
+
+from libraries.exchanges.bitflyer import ChartType
+from libraries.exchanges.bitflyer.cache import CandleCache
+from libraries.exchanges.bitflyer.models import ChartTable
+
+T0 = datetime(2021, 11, 8, tzinfo=timezone.utc)
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume', 'BuyVolume', 'SellVolume')
+
+
+class FakeTable:
+    # A one minute candle for every minute, valued by how many minutes it is after T0
+    def __init__(self) -> None:
+        self.fetched: List[Tuple[datetime, datetime, Optional[Sequence[str]]]] = []
+        self.offset = 0.0
+
+    def __call__(self, lower: datetime, upper: datetime, columns: Optional[Sequence[str]]) -> pandas.DataFrame:
+        self.fetched.append((lower, upper, columns))
+        index = pandas.to_datetime(
+            pandas.date_range(pandas.Timestamp(lower).ceil('min'), upper, freq='min').asi8, utc=True,
+        ).rename('Date')
+        minutes = ((index - pandas.Timestamp(T0)) // pandas.Timedelta(minutes=1)).to_numpy(dtype=numpy.float64)
+        return pandas.DataFrame(
+            {c: minutes + COLUMNS.index(c) / 10 + self.offset for c in columns or COLUMNS}, index=index,
+        )
+
+
+@pytest.fixture
+def table() -> FakeTable:
+    return FakeTable()
+
+
+@pytest.fixture
+def cache(tmp_path) -> CandleCache:
+    return CandleCache(str(tmp_path), periods_per_block=60)
+
+
+class TestCandleCache:
+    def test_serves_closed_blocks(self, cache: CandleCache, table: FakeTable) -> None:
+        lower, upper = T0 + timedelta(minutes=30), T0 + timedelta(hours=5, minutes=10)
+        expected = table(lower, upper, ('Close', 'Volume'))
+
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close', 'Volume'), table)
+        pandas.testing.assert_frame_equal(df, expected)
+        assert len(os.listdir(os.path.join(cache.root, ChartType.BTC_JPY_ONE_MINUTE.name))) == 6
+
+        table.fetched.clear()
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close', 'Volume'), table)
+        pandas.testing.assert_frame_equal(df, expected)
+        assert table.fetched == []
+
+        # Every column is cached, whichever were asked for first
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('BuyVolume', 'Open'), table)
+        pandas.testing.assert_frame_equal(df, table(lower, upper, ('BuyVolume', 'Open')))
+
+    def test_open_tail_is_always_fetched(self, cache: CandleCache, table: FakeTable) -> None:
+        upper = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        lower = upper - timedelta(hours=3)
+
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+        table.fetched.clear()
+        table.offset = 0.5
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+
+        assert len(table.fetched) == 1 and table.fetched[0][1] == upper
+        tail_from = table.fetched[0][0]
+        assert upper - tail_from >= cache.settle
+        assert (df.loc[tail_from:, 'Close'] % 1 >= 0.5).all()
+        assert (df.loc[:tail_from - timedelta(minutes=1), 'Close'] % 1 < 0.5).all()
+        assert len(df) == 181
+
+    def test_invalidate(self, cache: CandleCache, table: FakeTable) -> None:
+        lower, upper = T0, T0 + timedelta(hours=3) - timedelta(minutes=1)
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+
+        table.offset = 0.5
+        periods = [T0 + timedelta(minutes=61), T0 + timedelta(minutes=62)]
+        assert cache.invalidate(ChartType.BTC_JPY_ONE_MINUTE, periods) == 1
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+
+        assert (df['Close'].to_numpy() % 1 >= 0.5).tolist() == [False] * 60 + [True] * 60 + [False] * 60
+
+    def test_evicts_least_recently_used(self, cache: CandleCache, table: FakeTable) -> None:
+        block = lambda i: (T0 + timedelta(hours=i), T0 + timedelta(hours=i + 1) - timedelta(minutes=1))  # noqa: E731
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, *block(0), ('Close',), table)
+        size = os.path.getsize(cache.path(ChartType.BTC_JPY_ONE_MINUTE, int(T0.timestamp() // 3600)))
+        cache.max_bytes = 2 * size
+
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, *block(1), ('Close',), table)
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, *block(0), ('Close',), table)
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, *block(2), ('Close',), table)
+
+        files = sorted(os.listdir(os.path.join(cache.root, ChartType.BTC_JPY_ONE_MINUTE.name)))
+        first = int(int(T0.timestamp() // 3600))
+        assert files == [f'{first}.npy', f'{first + 2}.npy']
+        assert cache.size == 2 * size
+
+    def test_size_is_tracked_without_walking(self, cache: CandleCache, table: FakeTable, monkeypatch) -> None:
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, T0, T0 + timedelta(hours=2), ('Close',), table)
+        # Another process finds what is there by walking it once
+        other = CandleCache(cache.root, periods_per_block=60)
+        assert other.size == cache.size > 0
+
+        def walk(*_) -> None:
+            raise AssertionError('walked again')
+
+        directory = os.path.join(cache.root, ChartType.BTC_JPY_ONE_MINUTE.name)
+        monkeypatch.setattr(os, 'walk', walk)
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, T0 + timedelta(hours=3), T0 + timedelta(hours=5), ('Close',), table)
+        cache.invalidate(ChartType.BTC_JPY_ONE_MINUTE, [T0])
+        assert cache.size == sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    def test_expires_blocks_rewritten_elsewhere(self, cache: CandleCache, table: FakeTable) -> None:
+        lower, upper = T0, T0 + timedelta(hours=1) - timedelta(minutes=1)
+        cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+
+        # Rewritten by a host whose invalidation does not reach this cache
+        table.offset = 0.5
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+        assert (df['Close'] % 1 < 0.5).all()
+
+        path = cache.path(ChartType.BTC_JPY_ONE_MINUTE, int(T0.timestamp() // 3600))
+        written = os.path.getmtime(path) - cache.ttl.total_seconds() - 1
+        os.utime(path, (written, written))
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, lower, upper, ('Close',), table)
+        assert (df['Close'] % 1 >= 0.5).all()
+        assert os.path.getmtime(path) > written
+
+    def test_empty(self, cache: CandleCache) -> None:
+        def fetch(*_) -> pandas.DataFrame:
+            return pandas.DataFrame(
+                {c: [] for c in COLUMNS}, index=pandas.DatetimeIndex([], tz=timezone.utc, name='Date'), dtype=float,
+            )
+
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, T0, T0 + timedelta(hours=2), ('Close',), fetch)
+        assert df.empty and list(df.columns) == ['Close']
+        df = cache.load(ChartType.BTC_JPY_ONE_MINUTE, T0, T0 + timedelta(hours=2), ('Close',), fetch)
+        assert df.empty
+
+
+class TestQueryAsDataFrame:
+    def test_read_through(self, tmp_path, chart_table: ChartTable.__class__) -> None:
+        def save(ts: datetime, value: float) -> None:
+            chart_table(
+                ChartType.BTC_JPY_ONE_HOUR, ts, open_value=value, high_value=value, low_value=value,
+                close_value=value, volume=1, open_timestamp=ts, close_timestamp=ts,
+            ).save()
+
+        for i in range(48):
+            save(T0 + timedelta(hours=i), i)
+        cache = CandleCache(str(tmp_path), periods_per_block=24)
+        condition = ChartTable.period_from.between(T0, T0 + timedelta(days=2))
+
+        expected = ChartTable.query_as_data_frame(ChartType.BTC_JPY_ONE_HOUR, condition)
+        pandas.testing.assert_frame_equal(
+            ChartTable.query_as_data_frame(ChartType.BTC_JPY_ONE_HOUR, condition, cache=cache), expected,
+        )
+
+        # Served from the cache until the period is invalidated
+        save(T0 + timedelta(hours=30), 1000)
+        df = ChartTable.query_as_data_frame(ChartType.BTC_JPY_ONE_HOUR, condition, cache=cache)
+        pandas.testing.assert_frame_equal(df, expected)
+
+        cache.invalidate(ChartType.BTC_JPY_ONE_HOUR, [T0 + timedelta(hours=30)])
+        df = ChartTable.query_as_data_frame(ChartType.BTC_JPY_ONE_HOUR, condition, cache=cache)
+        assert df['Close'].tolist() == [float(i) if i != 30 else 1000.0 for i in range(48)]
@@ -1,12 +1,13 @@
-from typing import Dict, Union
+from typing import Dict, List, Optional, Union
 
 from datetime import datetime, timezone
 import json
 
 import pytest
+import requests
 from requests_mock.mocker import Mocker
 
-from libraries.exchanges.bitflyer import BitFlyer, Ticker, ProductCode, State
+from libraries.exchanges.bitflyer import BitFlyer, RestPolicy, Ticker, ProductCode, State
 
 
 class TestGetTicker:
@@ -77,3 +78,129 @@ class TestGetTicker:
                 assert attr.tzinfo == timezone.utc
             else:
                 assert attr == v
+
+
+def _execution(i: int) -> Dict[str, Union[str, int, float]]:
+    return {
+        'id': i, 'side': 'BUY' if i % 2 else 'SELL', 'price': 6936198.0 + i, 'size': 0.01,
+        'exec_date': '2021-10-31T10:26:34.06', 'buy_child_order_acceptance_id': f'JRF-{i}-B',
+        'sell_child_order_acceptance_id': f'JRF-{i}-S',
+    }
+
+
+@pytest.fixture
+def fast_client() -> BitFlyer:
+    return BitFlyer(RestPolicy(backoff=0, max_retries=2))
+
+
+@pytest.fixture
+def executions_api(requests_mock: Mocker) -> List[Dict[str, int]]:
+    # Answers `/executions` like the exchange does, from ids 1 to 1000 that are every third one, and records queries
+    ids = list(range(1, 1001, 3))
+    queries = []
+
+    def respond(request, _) -> List[Dict[str, Union[str, int, float]]]:
+        q = {k: int(v[0]) for k, v in request.qs.items() if k != 'product_code'}
+        queries.append(q)
+        matched = [i for i in reversed(ids) if q.get('after', 0) < i < q.get('before', 10 ** 9)]
+        return [_execution(i) for i in matched[:q['count']]]
+
+    requests_mock.get(f'{BitFlyer.URL}/executions', json=respond)
+    return queries
+
+
+class TestRestPolicy:
+    @pytest.mark.parametrize(('attempt', 'retry_after', 'expected'), (
+            (0, None, 0.5),
+            (3, None, 4.0),
+            (10, None, 8.0),
+            (0, '2', 2.0),
+            # As long as the server asks, past `max_backoff` too
+            (0, '60', 60.0),
+            (2, 'Wed, 21 Oct 2015 07:28:00 GMT', 2.0),
+    ))
+    def test_delay(self, attempt: int, retry_after: Optional[str], expected: float) -> None:
+        assert RestPolicy().delay(attempt, retry_after) == expected
+
+
+class TestRetry:
+    def test_retries_unavailable(self, fast_client: BitFlyer, requests_mock: Mocker) -> None:
+        adapter = requests_mock.get(f'{BitFlyer.URL}/executions', [
+            {'status_code': 503}, {'status_code': 429, 'headers': {'Retry-After': '0'}}, {'json': [_execution(1)]},
+        ])
+        assert [e.id for e in fast_client.get_executions(ProductCode.BTC_JPY)] == [1]
+        assert adapter.call_count == 3
+
+    def test_retries_connection_errors(self, fast_client: BitFlyer, requests_mock: Mocker) -> None:
+        adapter = requests_mock.get(f'{BitFlyer.URL}/executions', [
+            {'exc': requests.ConnectTimeout}, {'json': []},
+        ])
+        assert fast_client.get_executions(ProductCode.BTC_JPY) == []
+        assert adapter.call_count == 2
+
+    def test_gives_up(self, fast_client: BitFlyer, requests_mock: Mocker) -> None:
+        adapter = requests_mock.get(f'{BitFlyer.URL}/executions', status_code=502)
+        with pytest.raises(requests.HTTPError):
+            fast_client.get_executions(ProductCode.BTC_JPY)
+        assert adapter.call_count == 3
+
+    def test_does_not_retry_client_errors(self, fast_client: BitFlyer, requests_mock: Mocker) -> None:
+        adapter = requests_mock.get(f'{BitFlyer.URL}/executions', status_code=400)
+        with pytest.raises(requests.HTTPError):
+            fast_client.get_executions(ProductCode.BTC_JPY)
+        assert adapter.call_count == 1
+
+    def test_takes_a_token_per_attempt(self, fast_client: BitFlyer, requests_mock: Mocker) -> None:
+        requests_mock.get(f'{BitFlyer.URL}/executions', [{'status_code': 503}, {'json': []}])
+        tokens = fast_client.bucket.tokens
+        fast_client.get_executions(ProductCode.BTC_JPY)
+        assert fast_client.bucket.tokens == pytest.approx(tokens - 2, abs=0.1)
+
+
+class TestExecutions:
+    def test_iter_executions(self, client: BitFlyer, executions_api: List[Dict[str, int]]) -> None:
+        pages = list(client.iter_executions(ProductCode.BTC_JPY, count=100))
+        assert [len(p) for p in pages] == [100, 100, 100, 34]
+        assert [e.id for p in pages for e in p] == list(range(1000, 0, -3))
+        assert [q.get('before') for q in executions_api] == [None] + [p[-1].id for p in pages[:-1]]
+
+    def test_iter_executions_after(self, client: BitFlyer, executions_api: List[Dict[str, int]]) -> None:
+        pages = list(client.iter_executions(ProductCode.BTC_JPY, before=500, after=400))
+        assert [e.id for p in pages for e in p] == list(range(499, 400, -3))
+
+    @pytest.mark.parametrize(('after', 'before', 'num_of_segments'), (
+            (0, 1001, None), (0, 1001, 7), (100, 103, 8), (1, 2, None), (400, 1000, 3),
+    ))
+    def test_get_executions_between(
+            self, after: int, before: int, num_of_segments: Optional[int], executions_api: List[Dict[str, int]],
+    ) -> None:
+        client = BitFlyer(RestPolicy(max_workers=3))
+        executions = client.get_executions_between(ProductCode.BTC_JPY, after, before, num_of_segments)
+        assert [e.id for e in executions] == [i for i in range(1000, 0, -3) if after < i < before]
+
+
+class TestConcurrent:
+    def test_get_tickers(self, client: BitFlyer, requests_mock: Mocker) -> None:
+        def respond(request, _) -> Dict[str, Union[str, int, float]]:
+            product_code = request.qs['product_code'][0].upper()
+            return {
+                'product_code': product_code, 'state': 'RUNNING', 'timestamp': '2021-10-31T10:26:34.06',
+                'tick_id': len(product_code), 'best_bid': 1.0, 'best_ask': 2.0, 'best_bid_size': 0.1,
+                'best_ask_size': 0.1, 'total_bid_depth': 1.0, 'total_ask_depth': 1.0, 'market_bid_size': 0.0,
+                'market_ask_size': 0.0, 'ltp': 1.5, 'volume': 10.0, 'volume_by_product': 10.0,
+            }
+
+        requests_mock.get(f'{BitFlyer.URL}/ticker', json=respond)
+        tickers = client.get_tickers(ProductCode)
+        assert list(tickers) == list(ProductCode)
+        assert all(t.product_code is p for p, t in tickers.items())
+
+    def test_get_boards(self, client: BitFlyer, requests_mock: Mocker) -> None:
+        requests_mock.get(f'{BitFlyer.URL}/board', json={
+            'mid_price': 100.5,
+            'bids': [{'price': 100.0, 'size': 1.0}, {'price': 99.0, 'size': 2.0}],
+            'asks': [{'price': 101.0, 'size': 0.5}],
+        })
+        boards = client.get_boards([ProductCode.BTC_JPY, ProductCode.ETH_JPY])
+        assert [b.product_code for b in boards.values()] == [ProductCode.BTC_JPY, ProductCode.ETH_JPY]
+        assert all(b.best_bid == (100.0, 1.0) and b.best_ask == (101.0, 0.5) for b in boards.values())
@@ -0,0 +1,160 @@
+from typing import List
+
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from libraries.exchanges.bitflyer import BitFlyerRealTime, Execution, PublicChannel, ProductCode, Side, Ticker
+from libraries.exchanges.bitflyer.dispatcher import Dispatcher, DispatchPolicy, Overflow
+
+
+@dataclass(frozen=True)
+class Message:
+    n: int
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class TestDispatcher:
+    @pytest.mark.parametrize('num_of_workers', (1, 4))
+    def test_in_order_per_channel(self, num_of_workers: int) -> None:
+        received = {'a': [], 'b': []}
+        with Dispatcher(DispatchPolicy(num_of_workers=num_of_workers, max_queued=10000)) as dispatcher:
+            for name in received:
+                dispatcher.register(name, lambda m, name=name: received[name].append(m.n))
+            for i in range(1000):
+                dispatcher.put('a', Message(i))
+                dispatcher.put('b', Message(i))
+
+        assert received == {'a': list(range(1000)), 'b': list(range(1000))}
+        assert {k: (s.depth, s.handled, s.dropped) for k, s in dispatcher.stats().items()} == {
+            'a': (0, 1000, 0), 'b': (0, 1000, 0),
+        }
+
+    def test_drop_oldest(self) -> None:
+        received: List[int] = []
+        release = threading.Event()
+        dispatcher = Dispatcher(DispatchPolicy(max_queued=3))
+        dispatcher.register('a', lambda m: release.wait() and received.append(m.n))
+        dispatcher.start()
+
+        dispatcher.put('a', Message(0))
+        deadline = time.time() + 5
+        while dispatcher.stats()['a'].depth and time.time() < deadline:
+            time.sleep(0.01)
+        for i in range(1, 11):
+            dispatcher.put('a', Message(i))
+
+        stats = dispatcher.stats()['a']
+        assert (stats.depth, stats.dropped) == (3, 7)
+        release.set()
+        dispatcher.close()
+        assert received == [0, 8, 9, 10]
+
+    def test_block(self) -> None:
+        release = threading.Event()
+        dispatcher = Dispatcher(DispatchPolicy(max_queued=1, overflow=Overflow.BLOCK))
+        dispatcher.register('a', lambda m: release.wait())
+        dispatcher.start()
+
+        put = threading.Thread(target=lambda: [dispatcher.put('a', Message(i)) for i in range(3)])
+        put.start()
+        put.join(0.2)
+        assert put.is_alive()
+
+        release.set()
+        put.join(5)
+        assert not put.is_alive()
+        dispatcher.close()
+        assert dispatcher.stats()['a'].handled == 3 and dispatcher.stats()['a'].dropped == 0
+
+    def test_slow_channel_does_not_hold_others(self) -> None:
+        release = threading.Event()
+        fast = threading.Event()
+        with Dispatcher(DispatchPolicy(num_of_workers=2)) as dispatcher:
+            dispatcher.register('slow', lambda m: release.wait())
+            dispatcher.register('fast', lambda m: fast.set())
+            dispatcher.put('slow', Message(0))
+            dispatcher.put('fast', Message(0))
+            assert fast.wait(5)
+            release.set()
+
+    def test_lag_and_failing_handler(self) -> None:
+        def handler(m: Message) -> None:
+            raise ValueError(m.n)
+
+        with Dispatcher() as dispatcher:
+            dispatcher.register('a', handler)
+            dispatcher.put('a', Message(0, datetime.now(timezone.utc) - timedelta(seconds=2)))
+            dispatcher.put('a', Message(1))
+
+        stats = dispatcher.stats()['a']
+        assert stats.handled == 2
+        assert 2 <= stats.max_lag < 10 and stats.lag < stats.max_lag
+
+
+    def test_lag_of_executions(self) -> None:
+        executions = [
+            Execution(i, Side.BUY, 1.0, 0.1, datetime.now(timezone.utc) - timedelta(seconds=s), '', '')
+            for i, s in enumerate((5, 3))
+        ]
+        with Dispatcher() as dispatcher:
+            dispatcher.register('a', lambda _: None)
+            dispatcher.put('a', executions)
+            dispatcher.put('a', [])
+
+        stats = dispatcher.stats()['a']
+        assert stats.handled == 2
+        assert 3 <= stats.lag == stats.max_lag < 5
+
+    def test_drops_are_logged(self, caplog) -> None:
+        release = threading.Event()
+        dispatcher = Dispatcher(DispatchPolicy(max_queued=1))
+        dispatcher.register('a', lambda _: release.wait())
+        for i in range(6):
+            dispatcher.put('a', Message(i))
+
+        assert dispatcher.stats()['a'].dropped == 5
+        assert [r.getMessage() for r in caplog.records] == [
+            f'{n} messages of `a` have been dropped so far' for n in (1, 2, 4)
+        ]
+        release.set()
+
+
+class TestBitFlyerRealTime:
+    def test_dispatches_tickers(self) -> None:
+        received: List[Ticker] = []
+        client = BitFlyerRealTime()
+        client.subscribe(PublicChannel.lightning_ticker, ProductCode.BTC_JPY, received.append)
+        client._dispatcher.start()
+
+        message = {
+            'product_code': 'BTC_JPY', 'state': 'RUNNING', 'timestamp': '2021-11-08T12:34:56.1234567Z',
+            'tick_id': 1, 'best_bid': 1.0, 'best_ask': 2.0, 'best_bid_size': 0.1, 'best_ask_size': 0.1,
+            'total_bid_depth': 1.0, 'total_ask_depth': 1.0, 'market_bid_size': 0.0, 'market_ask_size': 0.0,
+            'ltp': 1.5, 'volume': 1.0, 'volume_by_product': 1.0,
+        }
+        client._on_message(client._ws_app, json.dumps({
+            'jsonrpc': '2.0', 'method': 'channelMessage',
+            'params': {'channel': 'lightning_ticker_BTC_JPY', 'message': message},
+        }))
+        client._dispatcher.close()
+
+        assert received == [Ticker.from_dict(message)]
+        assert client.stats()['lightning_ticker_BTC_JPY'].handled == 1
+
+    def test_close(self, monkeypatch) -> None:
+        received: List[Ticker] = []
+        client = BitFlyerRealTime()
+        client.subscribe(PublicChannel.lightning_ticker, ProductCode.BTC_JPY, received.append)
+        # Connects to nothing, as if the connection was lost right away every time
+        monkeypatch.setattr(client._ws_app, 'run_forever', lambda **_: None)
+        client.start()
+        client._dispatcher.put('lightning_ticker_BTC_JPY', Message(0))
+
+        client.close()
+        assert not client._thread.is_alive()
+        assert [m.n for m in received] == [0]
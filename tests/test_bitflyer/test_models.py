@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas
+import pytest
+
+from libraries.exchanges.bitflyer import ChartType
+from libraries.exchanges.bitflyer.models import ChartTable
+
+T0 = datetime(2021, 11, 8, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def charts(chart_table: ChartTable.__class__) -> pandas.DataFrame:
+    rows = []
+    with chart_table.batch_write() as batch:
+        for i in range(1500):
+            ts = T0 + timedelta(minutes=i)
+            value = 6_000_000 + (i * 7919) % 1000 + 0.5
+            batch.save(chart_table(
+                ChartType.BTC_JPY_ONE_MINUTE, ts, open_value=value, high_value=value + 10, low_value=value - 10,
+                close_value=value + 1, volume=i / 3, buy_volume=i / 5 if i % 2 else None, open_timestamp=ts,
+                close_timestamp=ts,
+            ))
+            rows.append((ts, value, value + 10, value - 10, value + 1, i / 3, i / 5 if i % 2 else float('nan')))
+        # Another chart type must not show up
+        batch.save(chart_table(
+            ChartType.BTC_JPY_ONE_HOUR, T0, open_value=1, high_value=1, low_value=1, close_value=1, volume=1,
+            open_timestamp=T0, close_timestamp=T0,
+        ))
+
+    df = pandas.DataFrame(
+        [r[1:] for r in rows], index=pandas.DatetimeIndex([r[0] for r in rows], name='Date'),
+        columns=['Open', 'High', 'Low', 'Close', 'Volume', 'BuyVolume'],
+    )
+    return df
+
+
+class TestQueryAsDataFrame:
+    @pytest.mark.parametrize(('num_of_segments', 'page_size'), ((1, None), (1, 250), (2, None), (7, 100)))
+    def test_query_as_data_frame(self, num_of_segments: int, page_size: int, charts: pandas.DataFrame) -> None:
+        since, until = T0 + timedelta(minutes=100), T0 + timedelta(minutes=1400)
+        df = ChartTable.query_as_data_frame(
+            ChartType.BTC_JPY_ONE_MINUTE, ChartTable.period_from.between(since, until), num_of_segments=num_of_segments,
+            limit=page_size,
+        )
+        pandas.testing.assert_frame_equal(df, charts.loc[since:until, ['Open', 'High', 'Low', 'Close', 'Volume']])
+
+    def test_columns(self, charts: pandas.DataFrame) -> None:
+        df = ChartTable.query_as_data_frame(
+            ChartType.BTC_JPY_ONE_MINUTE, ChartTable.period_from <= T0 + timedelta(minutes=10),
+            columns=('Close', 'BuyVolume'),
+        )
+        pandas.testing.assert_frame_equal(df, charts.iloc[:11][['Close', 'BuyVolume']])
+
+    def test_empty(self, charts: pandas.DataFrame) -> None:
+        df = ChartTable.query_as_data_frame(ChartType.ETH_JPY_ONE_MINUTE)
+        assert df.empty and list(df.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    def test_only_between_is_split(self, charts: pandas.DataFrame) -> None:
+        with pytest.raises(ValueError):
+            ChartTable.query_as_data_frame(
+                ChartType.BTC_JPY_ONE_MINUTE, ChartTable.period_from <= T0, num_of_segments=2,
+            )
@@ -0,0 +1,65 @@
+from typing import List
+
+import threading
+import time
+
+import pytest
+
+from libraries.exchanges.bitflyer.ratelimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    def test_burst_then_rate(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(2.0, 3, clock=clock, sleep=clock.sleep)
+
+        assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+        assert bucket.acquire() == pytest.approx(0.5)
+        assert bucket.acquire() == pytest.approx(0.5)
+        assert clock.now == pytest.approx(1.0)
+
+    def test_refills_up_to_capacity(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(1.0, 2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        clock.now += 100
+        assert bucket.tokens == 2
+
+    def test_try_acquire_does_not_wait(self) -> None:
+        clock = FakeClock()
+        bucket = TokenBucket(2.0, 1, clock=clock, sleep=clock.sleep)
+
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(0.5)
+        assert clock.sleeps == []
+        clock.now += 0.5
+        assert bucket.try_acquire() == 0
+
+    @pytest.mark.parametrize(('rate', 'capacity'), ((0, 1), (1, 0.5)))
+    def test_invalid(self, rate: float, capacity: float) -> None:
+        with pytest.raises(ValueError):
+            TokenBucket(rate, capacity)
+
+    def test_shared_by_threads(self) -> None:
+        bucket = TokenBucket(200.0, 5)
+        started = time.monotonic()
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 20 tokens taken, 5 of them at once, the other 15 at 200 per second
+        assert time.monotonic() - started >= 15 / 200 * 0.95
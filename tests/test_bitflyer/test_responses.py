@@ -1,10 +1,13 @@
-from typing import Any
+from typing import Any, Dict
 
+import copy
+import json
+import pickle
 import pytest
 
-from datetime import datetime
+from datetime import datetime, timezone
 
-from libraries.exchanges.bitflyer import Ticker, ProductCode, State
+from libraries.exchanges.bitflyer import Ticker, Execution, ProductCode, State, Side
 
 
 class TestTicker:
@@ -52,3 +55,63 @@ class TestTicker:
     ))
     def test_is_float(self, name: str) -> None:
         assert Ticker.__dataclass_fields__[name].type is float  # noqa
+
+
+@pytest.fixture
+def data() -> Dict[str, Any]:
+    return {
+        'product_code': 'BTC_JPY', 'state': 'RUNNING', 'timestamp': '2021-11-08T12:34:56.1234567Z', 'tick_id': 1,
+        'best_bid': 7000000.0, 'best_ask': 7000100.0, 'best_bid_size': 0.1, 'best_ask_size': 0.2,
+        'total_bid_depth': 1000.0, 'total_ask_depth': 1100.0, 'market_bid_size': 0.0, 'market_ask_size': 0.0,
+        'ltp': 7000050.0, 'volume': 12345.6, 'volume_by_product': 2345.6,
+    }
+
+
+class TestFromDict:
+    @pytest.mark.parametrize(('timestamp', 'expected'), (
+            ('2021-11-08T12:34:56.1234567Z', datetime(2021, 11, 8, 12, 34, 56, 123456, timezone.utc)),
+            ('2021-11-08T12:34:56.123456Z', datetime(2021, 11, 8, 12, 34, 56, 123456, timezone.utc)),
+            ('2021-11-08T12:34:56.12Z', datetime(2021, 11, 8, 12, 34, 56, 120000, timezone.utc)),
+            ('2021-11-08T12:34:56.1234567', datetime(2021, 11, 8, 12, 34, 56, 123456, timezone.utc)),
+            ('2021-11-08T12:34:56Z', datetime(2021, 11, 8, 12, 34, 56, tzinfo=timezone.utc)),
+    ))
+    def test_timestamp(self, data: Dict[str, Any], timestamp: str, expected: datetime) -> None:
+        assert Ticker.from_dict({**data, 'timestamp': timestamp}).timestamp == expected
+
+    @pytest.mark.parametrize(('state', 'expected'), (
+            ('RUNNING', State.RUNNING),
+            ('CIRCUIT BREAK', State.CIRCUIT_BREAK),
+            ('AWAITING SQ', State.AWAITING_SQ),
+    ))
+    def test_state(self, data: Dict[str, Any], state: str, expected: State) -> None:
+        assert Ticker.from_dict({**data, 'state': state}).state is expected
+
+    def test_fields(self, data: Dict[str, Any]) -> None:
+        ticker = Ticker.from_dict(data)
+        assert ticker.product_code is ProductCode.BTC_JPY
+        for name in Ticker.__dataclass_fields__:  # noqa
+            if name not in ('product_code', 'state', 'timestamp'):
+                assert getattr(ticker, name) == data[name]
+
+    def test_from_bytes(self, data: Dict[str, Any]) -> None:
+        assert Ticker.from_bytes(json.dumps(data).encode()) == Ticker.from_dict(data)
+
+    def test_slotted(self, data: Dict[str, Any]) -> None:
+        ticker = Ticker.from_dict(data)
+        assert not hasattr(ticker, '__dict__')
+        assert pickle.loads(pickle.dumps(ticker)) == ticker
+        assert copy.copy(ticker) == ticker
+
+
+class TestExecution:
+    @pytest.mark.parametrize(('side', 'expected'), (('BUY', Side.BUY), ('SELL', Side.SELL), ('', None)))
+    def test_from_list(self, side: str, expected: Side) -> None:
+        executions = Execution.from_list([{
+            'id': 39361, 'side': side, 'price': 35100, 'size': 0.01, 'exec_date': '2015-07-07T10:44:33.547Z',
+            'buy_child_order_acceptance_id': 'JRF20150707-014356-184990',
+            'sell_child_order_acceptance_id': 'JRF20150707-104433-186048',
+        }])
+        assert executions == [Execution(
+            39361, expected, 35100, 0.01, datetime(2015, 7, 7, 10, 44, 33, 547000, timezone.utc),
+            'JRF20150707-014356-184990', 'JRF20150707-104433-186048',
+        )]
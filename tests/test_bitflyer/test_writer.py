@@ -0,0 +1,147 @@
+from typing import List, Optional
+
+import threading
+import time
+from datetime import datetime, timezone
+from queue import Full
+
+import pytest
+
+from libraries.exchanges.bitflyer.writer import BufferedWriter, FlushPolicy
+
+
+class FakeModel:
+    batches: List[List[int]] = []
+    gate = threading.Event()
+    # Number of the next batches to fail
+    failures = 0
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.written_at: Optional[datetime] = None
+
+    class _Batch:
+        def __init__(self) -> None:
+            self.items: List[int] = []
+
+        def __enter__(self) -> 'FakeModel._Batch':
+            return self
+
+        def __exit__(self, *_) -> None:
+            FakeModel.gate.wait()
+            if FakeModel.failures:
+                FakeModel.failures -= 1
+                raise RuntimeError('throttled')
+            FakeModel.batches.append(self.items)
+
+        def save(self, item: 'FakeModel') -> None:
+            self.items.append(item.n)
+
+    @classmethod
+    def batch_write(cls) -> '_Batch':
+        return cls._Batch()
+
+
+@pytest.fixture(autouse=True)
+def reset() -> None:
+    FakeModel.batches = []
+    FakeModel.gate.set()
+    FakeModel.failures = 0
+
+
+class TestBufferedWriter:
+    def test_flush_by_size(self) -> None:
+        with BufferedWriter(FakeModel, FlushPolicy(max_items=3, max_age=60)) as writer:  # noqa
+            for n in range(7):
+                writer.put(FakeModel(n))
+            time.sleep(0.1)
+            assert FakeModel.batches == [[0, 1, 2], [3, 4, 5]]
+
+        assert FakeModel.batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    def test_flush_by_age(self) -> None:
+        with BufferedWriter(FakeModel, FlushPolicy(max_items=100, max_age=0.05)) as writer:  # noqa
+            writer.put(FakeModel(1))
+            writer.put(FakeModel(2))
+            time.sleep(0.2)
+            assert FakeModel.batches == [[1, 2]]
+
+    def test_flush_on_close_without_start(self) -> None:
+        writer = BufferedWriter(FakeModel, FlushPolicy(max_items=2))  # noqa
+        for n in range(3):
+            writer.put(FakeModel(n))
+        writer.close()
+
+        assert FakeModel.batches == [[0, 1], [2]]
+        with pytest.raises(RuntimeError):
+            writer.put(FakeModel(3))
+
+    def test_backpressure(self) -> None:
+        FakeModel.gate.clear()
+        writer = BufferedWriter(FakeModel, FlushPolicy(max_items=1, max_age=0, max_buffered=2))  # noqa
+        writer.start()
+
+        writer.put(FakeModel(0))
+        time.sleep(0.05)
+        writer.put(FakeModel(1))
+        writer.put(FakeModel(2))
+        with pytest.raises(Full):
+            writer.put(FakeModel(3), timeout=0.05)
+
+        FakeModel.gate.set()
+        writer.close()
+        assert FakeModel.batches == [[0], [1], [2]]
+
+    def test_written_until(self) -> None:
+        FakeModel.gate.clear()
+        started = datetime.now(timezone.utc)
+        writer = BufferedWriter(FakeModel, FlushPolicy(max_items=1, max_age=0, idle_interval=0.01), 'written_at')  # noqa
+        writer.start()
+        items = [FakeModel(0), FakeModel(1)]
+        for item in items:
+            writer.put(item)
+        time.sleep(0.05)
+
+        # The first item is being written, so it is not counted as written yet
+        assert items[0].written_at is not None and items[1].written_at is None
+        assert writer.written_until < items[0].written_at
+
+        FakeModel.gate.set()
+        time.sleep(0.05)
+        assert started <= items[0].written_at <= items[1].written_at < writer.written_until
+        writer.close()
+
+    def test_failed_batch_is_held(self) -> None:
+        FakeModel.failures = 1000
+        policy = FlushPolicy(max_items=1, max_age=0, idle_interval=0.01, max_retries=0)
+        writer = BufferedWriter(FakeModel, policy, 'written_at')  # noqa
+        writer.start()
+        item = FakeModel(0)
+        writer.put(item)
+        time.sleep(0.05)
+
+        # Held while it fails, without `written_until` passing it
+        assert FakeModel.batches == [] and writer.held == 1
+        assert writer.written_until < item.written_at
+
+        FakeModel.failures = 0
+        time.sleep(0.05)
+        assert FakeModel.batches == [[0]] and writer.held == 0
+        assert item.written_at < writer.written_until
+        writer.close()
+
+    def test_retries(self) -> None:
+        FakeModel.failures = 2
+        writer = BufferedWriter(FakeModel, FlushPolicy(max_items=1, max_retries=2, backoff=0))  # noqa
+        writer.put(FakeModel(0))
+        writer.close()
+
+        assert FakeModel.batches == [[0]]
+
+    def test_gives_up_on_close(self) -> None:
+        FakeModel.failures = 3
+        writer = BufferedWriter(FakeModel, FlushPolicy(max_items=1, max_retries=2, backoff=0))  # noqa
+        writer.put(FakeModel(0))
+        writer.close()
+
+        assert FakeModel.batches == [] and writer.held == 0
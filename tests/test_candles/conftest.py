@@ -0,0 +1,59 @@
+from typing import Callable, Iterator
+
+import os
+
+import pytest
+
+from libraries.exchanges.bitflyer import Execution, Ticker
+from libraries.exchanges.bitflyer.models import ChartTable
+
+
+@pytest.fixture
+def ticker() -> Callable[..., Ticker]:
+    def _ticker(timestamp: str, ltp: float, volume: float = 1.0, product_code: str = 'BTC_JPY') -> Ticker:
+        return Ticker.from_dict({
+            'product_code': product_code,
+            'state': 'RUNNING',
+            'timestamp': timestamp,
+            'tick_id': 1,
+            'best_bid': ltp,
+            'best_ask': ltp,
+            'best_bid_size': 0.0,
+            'best_ask_size': 0.0,
+            'total_bid_depth': 0.0,
+            'total_ask_depth': 0.0,
+            'market_bid_size': 0.0,
+            'market_ask_size': 0.0,
+            'ltp': ltp,
+            'volume': volume,
+            'volume_by_product': volume,
+        })
+
+    return _ticker
+
+
+@pytest.fixture
+def execution() -> Callable[..., Execution]:
+    def _execution(exec_date: str, price: float, size: float = 1.0, side: str = 'BUY', _id: int = 1) -> Execution:
+        return Execution.from_dict({
+            'id': _id,
+            'side': side,
+            'price': price,
+            'size': size,
+            'exec_date': exec_date,
+            'buy_child_order_acceptance_id': 'JRF20211108-000000-000001',
+            'sell_child_order_acceptance_id': 'JRF20211108-000000-000002',
+        })
+
+    return _execution
+
+
+@pytest.fixture
+def chart_table() -> Iterator[ChartTable.__class__]:
+    if not os.environ.get('DDB_HOST'):
+        pytest.skip('`DDB_HOST` pointing at a local DynamoDB is required')
+
+    if not ChartTable.exists():
+        ChartTable.create_table(wait=True)
+    yield ChartTable
+    ChartTable.delete_table()
@@ -0,0 +1,134 @@
+from typing import Callable
+
+from datetime import datetime, timezone
+
+import pytest
+from pynamodb.exceptions import PutError
+
+from libraries.candles import CandleAggregator, floor_period
+from libraries.exchanges.bitflyer import ProductCode, Candlestick, ChartType, Execution, Ticker
+from libraries.exchanges.bitflyer.models import ChartTable
+
+
+class TestFloorPeriod:
+    @pytest.mark.parametrize(('ts', 'candlestick', 'expected'), (
+            (datetime(2021, 11, 8, 1, 2, 3), Candlestick.ONE_MINUTE, datetime(2021, 11, 8, 1, 2)),
+            (datetime(2021, 11, 8, 1, 29, 59), Candlestick.FIFTEEN_MINUTES, datetime(2021, 11, 8, 1, 15)),
+            (datetime(2021, 11, 8, 15, 0, 0), Candlestick.EIGHT_HOURS, datetime(2021, 11, 8, 8)),
+            (datetime(2021, 11, 8, 23, 59, 59), Candlestick.ONE_DAY, datetime(2021, 11, 8)),
+            (datetime(2021, 11, 14, 23, 59, 59), Candlestick.ONE_WEEK, datetime(2021, 11, 8)),
+            (datetime(2021, 11, 15), Candlestick.ONE_WEEK, datetime(2021, 11, 15)),
+    ))
+    def test_floor_period(self, ts: datetime, candlestick: Candlestick, expected: datetime) -> None:
+        epoch = ts.replace(tzinfo=timezone.utc).timestamp()
+        assert floor_period(epoch, candlestick) == expected.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TestCandleAggregator:
+    def test_update(self, ticker: Callable[..., Ticker]) -> None:
+        aggregator = CandleAggregator(ProductCode.BTC_JPY)
+        aggregator.update(ticker('2021-11-08T01:02:03.1234567Z', 100.0))
+        aggregator.update(ticker('2021-11-08T01:02:30.0Z', 120.0))
+        aggregator.update(ticker('2021-11-08T01:02:40.0Z', 90.0))
+        aggregator.update(ticker('2021-11-08T01:02:10.0Z', 95.0, volume=2.0))
+
+        for candlestick in Candlestick:
+            candle = aggregator.candle(candlestick)
+            assert candle.chart_type is getattr(ChartType, f'BTC_JPY_{candlestick.name}')
+            assert (candle.open_value, candle.high_value, candle.low_value, candle.close_value) == (100, 120, 90, 90)
+            assert candle.volume == 5.0
+
+        assert len(aggregator.drain()) == len(Candlestick)
+        assert aggregator.drain() == []
+
+    def test_only_changed_candles_are_pending(self, ticker: Callable[..., Ticker]) -> None:
+        aggregator = CandleAggregator(ProductCode.BTC_JPY, (Candlestick.ONE_MINUTE, Candlestick.ONE_HOUR))
+        aggregator.update(ticker('2021-11-08T01:02:03.0Z', 100.0))
+        aggregator.drain()
+
+        aggregator.update(ticker('2021-11-08T01:03:00.0Z', 110.0))
+        aggregator.update(ticker('2021-11-08T01:04:00.0Z', 105.0))
+        pending = aggregator.drain()
+
+        assert [(c.chart_type, c.period_from.minute) for c in pending] == [
+            (ChartType.BTC_JPY_ONE_MINUTE, 3),
+            (ChartType.BTC_JPY_ONE_HOUR, 0),
+            (ChartType.BTC_JPY_ONE_MINUTE, 4),
+        ]
+        assert pending[1].close_value == 105.0
+
+    def test_ignores_other_products_and_stale_tickers(self, ticker: Callable[..., Ticker]) -> None:
+        aggregator = CandleAggregator(ProductCode.BTC_JPY, (Candlestick.ONE_MINUTE, ))
+        aggregator.update(ticker('2021-11-08T01:02:03.0Z', 100.0, product_code='FX_BTC_JPY'))
+        assert aggregator.candle(Candlestick.ONE_MINUTE) is None
+
+        aggregator.update(ticker('2021-11-08T01:02:03.0Z', 100.0))
+        aggregator.update(ticker('2021-11-08T01:01:59.0Z', 200.0))
+        assert aggregator.candle(Candlestick.ONE_MINUTE).high_value == 100.0
+
+    def test_failed_flush_keeps_candles_pending(
+            self, ticker: Callable[..., Ticker], chart_table: ChartTable.__class__, monkeypatch,
+    ) -> None:
+        class FailingBatch:
+            def __enter__(self) -> 'FailingBatch':
+                return self
+
+            def __exit__(self, *_) -> None:
+                raise PutError('unavailable')
+
+            def save(self, item: ChartTable) -> None:
+                pass
+
+        aggregator = CandleAggregator(ProductCode.BTC_JPY, (Candlestick.ONE_MINUTE, ))
+        aggregator.update(ticker('2021-11-08T01:02:03.0Z', 100.0))
+        aggregator.update(ticker('2021-11-08T01:03:00.0Z', 110.0))
+        with monkeypatch.context() as m:
+            m.setattr(ChartTable, 'batch_write', classmethod(lambda _: FailingBatch()))
+            with pytest.raises(PutError):
+                aggregator.flush()
+        assert chart_table.count(ChartType.BTC_JPY_ONE_MINUTE) == 0
+
+        # The candle of 01:02 is closed, so it is written by the next flush or never
+        aggregator.update(ticker('2021-11-08T01:03:30.0Z', 120.0))
+        assert aggregator.flush() == 2
+        assert [(c.period_from.minute, c.close_value) for c in chart_table.query(ChartType.BTC_JPY_ONE_MINUTE)] == [
+            (2, 100.0), (3, 120.0),
+        ]
+        assert aggregator.flush() == 0
+
+
+class TestExecutions:
+    def test_update_executions(self, execution: Callable[..., Execution]) -> None:
+        aggregator = CandleAggregator(ProductCode.BTC_JPY)
+        aggregator.update_executions([
+            execution('2021-11-08T01:02:03.1234567Z', 100.0, 0.5, 'BUY'),
+            execution('2021-11-08T01:02:30.0Z', 120.0, 0.25, 'SELL'),
+            execution('2021-11-08T01:02:10.0Z', 95.0, 1.0, ''),
+        ])
+        aggregator.update_executions([execution('2021-11-08T01:02:40.0Z', 90.0, 2.0, 'SELL')])
+
+        for candlestick in Candlestick:
+            candle = aggregator.candle(candlestick)
+            assert (candle.open_value, candle.high_value, candle.low_value, candle.close_value) == (100, 120, 90, 90)
+            assert (candle.volume, candle.buy_volume, candle.sell_volume) == (3.75, 0.5, 2.25)
+
+    def test_same_as_one_by_one(self, execution: Callable[..., Execution]) -> None:
+        executions = [
+            execution(
+                f'2021-11-08T01:{m:02d}:{s:02d}.0Z', 100.0 + (7 * i) % 13, 0.1 * (i % 5 + 1), ('BUY', 'SELL')[i % 2],
+            )
+            for i, (m, s) in enumerate((m, s) for m in range(58, 60) for s in range(0, 60, 7))
+        ] + [execution('2021-11-08T02:00:01.0Z', 50.0), execution('2021-11-08T01:59:59.0Z', 70.0)]
+
+        batched, one_by_one = CandleAggregator(ProductCode.BTC_JPY), CandleAggregator(ProductCode.BTC_JPY)
+        batched.update_executions(executions)
+        for e in executions:
+            one_by_one.update_executions([e])
+
+        for candlestick in Candlestick:
+            expected, actual = one_by_one.candle(candlestick), batched.candle(candlestick)
+            assert actual.period_from == expected.period_from
+            assert actual.close_value == expected.close_value == 50.0
+            assert (actual.volume, actual.buy_volume, actual.sell_volume) == pytest.approx(
+                (expected.volume, expected.buy_volume, expected.sell_volume)
+            )
@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+import numpy
+import pytest
+
+from libraries.candles import Sticks, rollup, rollup_all
+from libraries.candles.period import from_microseconds, to_microseconds
+from libraries.exchanges.bitflyer import Candlestick
+
+
+def _us(*args: int) -> int:
+    return to_microseconds(datetime(*args, tzinfo=timezone.utc))
+
+
+class TestRollup:
+    def test_rollup_all(self) -> None:
+        rng = numpy.random.default_rng(0)
+        ts = _us(2021, 11, 6) + rng.integers(0, 3 * 86400 * 1_000_000, 5000)
+        ltp = rng.integers(6_000_000, 7_000_000, 5000).astype(float)
+        volume = rng.uniform(0, 10, 5000)
+        ticks = Sticks.from_ticks(ts, ltp, volume)
+
+        for c, sticks in rollup_all(ticks).items():
+            duration = c.value * 1_000_000
+            periods = sticks.period if c is not Candlestick.ONE_WEEK else sticks.period + 3 * 86400 * 1_000_000
+
+            assert numpy.all(periods % duration == 0)
+            for i, p in enumerate(sticks.period.tolist()):
+                mask = (ticks.period >= p) & (ticks.period < p + duration)
+                assert sticks.high[i] == ticks.close[mask].max()
+                assert sticks.low[i] == ticks.close[mask].min()
+                assert sticks.open[i] == ticks.close[mask][0]
+                assert sticks.close[i] == ticks.close[mask][-1]
+                assert sticks.volume[i] == pytest.approx(ticks.volume[mask].sum())
+
+    def test_iso_week(self) -> None:
+        ticks = Sticks.from_ticks(
+            numpy.array([_us(2021, 11, 7, 23, 59), _us(2021, 11, 8), _us(2021, 11, 14, 23, 59)]),
+            numpy.array([1.0, 2.0, 3.0]),
+            numpy.array([1.0, 1.0, 1.0]),
+        )
+        stick_of = rollup(ticks, Candlestick.ONE_WEEK).to_dict()
+
+        assert list(stick_of.keys()) == [
+            datetime(2021, 11, 1, tzinfo=timezone.utc),
+            datetime(2021, 11, 8, tzinfo=timezone.utc),
+        ]
+        assert stick_of[datetime(2021, 11, 8, tzinfo=timezone.utc)]['open'] == 2.0
+        assert stick_of[datetime(2021, 11, 8, tzinfo=timezone.utc)]['close'] == 3.0
+
+    def test_duplicated_timestamp(self) -> None:
+        ts = _us(2021, 11, 8, 1, 2, 3)
+        ticks = Sticks.from_ticks(numpy.array([ts, ts]), numpy.array([1.0, 2.0]), numpy.array([1.0, 1.0]))
+
+        stick_of = rollup(ticks, Candlestick.ONE_MINUTE).to_dict()
+        assert stick_of == {
+            datetime(2021, 11, 8, 1, 2, tzinfo=timezone.utc): {
+                'high': 2.0, 'low': 2.0, 'open': 2.0, 'close': 2.0, 'volume': 1.0,
+                'open_ts': from_microseconds(ts), 'close_ts': from_microseconds(ts),
+            },
+        }
+
+    def test_empty(self) -> None:
+        ticks = Sticks.from_ticks(numpy.array([]), numpy.array([]), numpy.array([]))
+        assert rollup(ticks, Candlestick.ONE_MINUTE).to_dict() == {}
+
+    def test_trades(self) -> None:
+        ts = _us(2021, 11, 8, 1, 2, 3)
+        trades = Sticks.from_trades(
+            numpy.array([ts, ts, ts + 60_000_000]), numpy.array([1.0, 2.0, 3.0]), numpy.array([1.0, 2.0, 4.0]),
+            numpy.array([1.0, 0.0, 0.0]), numpy.array([0.0, 2.0, 0.0]),
+        )
+
+        stick_of = rollup_all(trades)[Candlestick.ONE_HOUR].to_dict()
+        assert stick_of == {
+            datetime(2021, 11, 8, 1, tzinfo=timezone.utc): {
+                'high': 3.0, 'low': 1.0, 'open': 1.0, 'close': 3.0, 'volume': 7.0, 'buy_volume': 1.0,
+                'sell_volume': 2.0, 'open_ts': from_microseconds(ts), 'close_ts': from_microseconds(ts + 60_000_000),
+            },
+        }
@@ -0,0 +1,8 @@
+import numpy
+import pytest
+
+
+@pytest.fixture
+def prices() -> numpy.ndarray:
+    rng = numpy.random.default_rng(0)
+    return 7_000_000 + numpy.cumsum(rng.normal(0, 2_000, 1000))
@@ -0,0 +1,122 @@
+from typing import Optional
+
+import numpy
+import pandas
+import pytest
+
+from libraries.exchanges.bitflyer import ProductCode, Candlestick
+from libraries.signals import IndicatorEngine, RSI, SimpleMovingAverage
+from libraries.signals.engine import RingBuffer, Highest, Lowest, StreamIndicator, StreamRSI, StreamSMA
+
+
+class TestRingBuffer:
+    def test_last(self) -> None:
+        buffer = RingBuffer(4)
+        for v in range(10):
+            buffer.append(v)
+            n = len(buffer)
+            assert buffer.last(n).tolist() == list(range(v + 1 - n, v + 1))
+            assert buffer[-1] == v
+
+        assert len(buffer) == 4
+        assert buffer.count == 10
+        with pytest.raises(IndexError):
+            buffer.last(5)
+        with pytest.raises(IndexError):
+            _ = buffer[-5]
+
+    def test_last_is_a_read_only_view(self) -> None:
+        buffer = RingBuffer(4)
+        for v in range(6):
+            buffer.append(v)
+
+        view = buffer.last(3)
+        assert not view.flags.owndata
+        with pytest.raises(ValueError):
+            view[0] = 0
+
+
+class TestIndicatorEngine:
+    def test_fan_out(self, prices: numpy.ndarray) -> None:
+        engine = IndicatorEngine(capacity=8)
+        p, c = ProductCode.BTC_JPY, Candlestick.ONE_MINUTE
+        for n in (5, 14, 21):
+            engine.register(p, c, f'sma{n}', StreamSMA(n))
+        engine.register(p, c, 'rsi14', StreamRSI(14))
+        engine.register(p, c, 'rsi7', StreamRSI(7, wilder=False))
+        engine.register(p, c, 'high20', Highest(20))
+        engine.register(p, c, 'low20', Lowest(20))
+
+        rounded = prices.round(-3)
+        results = pandas.DataFrame([engine.update(p, c, v) for v in rounded], dtype=float)
+
+        for n in (5, 14, 21):
+            numpy.testing.assert_allclose(results[f'sma{n}'], SimpleMovingAverage.batch(rounded, n), rtol=1e-12)
+        numpy.testing.assert_allclose(results['rsi14'], RSI.batch(rounded, 14), rtol=1e-12)
+        numpy.testing.assert_allclose(results['rsi7'], RSI.batch(rounded, 7, wilder=False), rtol=1e-12, atol=1e-9)
+        numpy.testing.assert_array_equal(results['high20'], pandas.Series(rounded).rolling(20).max())
+        numpy.testing.assert_array_equal(results['low20'], pandas.Series(rounded).rolling(20).min())
+
+        assert engine.values(p, c) == results.iloc[-1].to_dict()
+        assert engine.prices(p, c, 3).tolist() == rounded[-3:].tolist()
+
+    def test_streams_are_independent(self) -> None:
+        engine = IndicatorEngine()
+        engine.register(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, 'sma', StreamSMA(2))
+        engine.register(ProductCode.BTC_JPY, Candlestick.ONE_HOUR, 'sma', StreamSMA(2))
+
+        for v in (1.0, 2.0, 3.0):
+            engine.update(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, v)
+        engine.update(ProductCode.BTC_JPY, Candlestick.ONE_HOUR, 10.0)
+
+        assert engine.values(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE) == {'sma': 2.5}
+        assert engine.values(ProductCode.BTC_JPY, Candlestick.ONE_HOUR) == {'sma': None}
+
+    def test_register_after_feeding(self) -> None:
+        engine = IndicatorEngine()
+        engine.update(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, 1.0)
+        with pytest.raises(RuntimeError):
+            engine.register(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, 'sma', StreamSMA(2))
+
+    @pytest.mark.parametrize('wilder', (True, False))
+    def test_same_as_one_at_a_time(self, prices: numpy.ndarray, wilder: bool) -> None:
+        engine = IndicatorEngine(capacity=4)
+        p, c = ProductCode.BTC_JPY, Candlestick.ONE_MINUTE
+        engine.register(p, c, 'sma', StreamSMA(10))
+        engine.register(p, c, 'rsi', StreamRSI(10, wilder))
+        sma, rsi = SimpleMovingAverage(10), RSI(10, wilder)
+
+        for v in prices.round(-3):
+            values = engine.update(p, c, v)
+            assert values['sma'] == pytest.approx(sma.update(v), rel=1e-12)
+            assert values['rsi'] == pytest.approx(rsi.update(v), rel=1e-12, abs=1e-9)
+
+    def test_indicators_read_the_shared_buffer(self) -> None:
+        class Range(StreamIndicator):
+            @property
+            def window(self) -> int:
+                return 3
+
+            def update(self, prices: RingBuffer) -> Optional[float]:
+                if len(prices) >= 3:
+                    self.value = float(numpy.ptp(prices.last(3)))
+                return self.value
+
+        engine = IndicatorEngine(capacity=2)
+        for name, indicator in (('range', Range()), ('high', Highest(3))):
+            engine.register(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, name, indicator)
+        for v in (1.0, 4.0, 2.0, 3.0):
+            values = engine.update(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, v)
+
+        assert values == {'range': 2.0, 'high': 4.0}
+        # One buffer as long as the longest window any of them reads
+        assert engine.prices(ProductCode.BTC_JPY, Candlestick.ONE_MINUTE, 10).tolist() == [1.0, 4.0, 2.0, 3.0]
+
+    def test_indicators_must_implement_update(self) -> None:
+        class Incomplete(StreamIndicator):
+            @property
+            def window(self) -> int:
+                return 1
+
+        with pytest.raises(TypeError):
+            Incomplete()
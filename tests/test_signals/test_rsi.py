@@ -0,0 +1,39 @@
+import numpy
+import pytest
+import talib
+
+from libraries.signals import RSI
+
+
+class TestRSI:
+    @pytest.mark.parametrize('timeperiod', (2, 14, 21))
+    def test_batch(self, prices: numpy.ndarray, timeperiod: int) -> None:
+        expected = talib.RSI(prices, timeperiod=timeperiod)
+        numpy.testing.assert_allclose(RSI.batch(prices, timeperiod), expected, rtol=1e-12)
+
+    def test_batch_windowed(self, prices: numpy.ndarray) -> None:
+        rsi = RSI.batch(prices, 14, wilder=False)
+        for i in range(14, len(prices), 37):
+            assert rsi[i] == pytest.approx(talib.RSI(prices[i - 14:i + 1], timeperiod=14)[-1])
+
+    @pytest.mark.parametrize('wilder', (True, False))
+    def test_update(self, prices: numpy.ndarray, wilder: bool) -> None:
+        rsi = RSI(14, wilder=wilder)
+        values = [rsi.update(p) for p in prices]
+
+        assert values[:14] == [None] * 14
+        numpy.testing.assert_allclose(values[14:], RSI.batch(prices, 14, wilder=wilder)[14:], rtol=1e-12)
+
+    def test_peek(self, prices: numpy.ndarray) -> None:
+        rsi = RSI(14)
+        for p in prices[:13]:
+            rsi.update(p)
+        assert rsi.peek(prices[13]) is None
+
+        rsi.update(prices[13])
+        peeked = rsi.peek(prices[14])
+        assert rsi.value is None
+        assert rsi.update(prices[14]) == peeked
+
+    def test_flat(self) -> None:
+        assert RSI.batch(numpy.full(20, 100.0))[-1] == talib.RSI(numpy.full(20, 100.0))[-1] == 0.0
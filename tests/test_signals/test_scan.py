@@ -0,0 +1,34 @@
+from typing import Dict
+
+import numpy
+import pandas
+import pytest
+
+from libraries.signals.support_resistance import Fractal, KMeans, WindowShifting, scan_levels
+
+
+@pytest.fixture
+def frames() -> Dict[str, pandas.DataFrame]:
+    rng = numpy.random.default_rng(0)
+    frames = {}
+    for name, n in (('BTC_JPY_ONE_MINUTE', 800), ('ETH_JPY_ONE_MINUTE', 0), ('XRP_JPY_ONE_MINUTE', 300)):
+        close = (7_000_000 + numpy.cumsum(rng.normal(0, 3_000, n))).round()
+        frames[name] = pandas.DataFrame({
+            'Open': close, 'High': close + rng.integers(0, 3_000, n), 'Low': close - rng.integers(0, 3_000, n),
+            'Close': close, 'Volume': 1.0,
+        }, index=pandas.date_range('2021-11-08', periods=n, freq='min', tz='UTC', name='Date'))
+    return frames
+
+
+class TestScanLevels:
+    @pytest.mark.parametrize('max_workers', (1, 2))
+    def test_same_as_one_by_one(self, frames: Dict[str, pandas.DataFrame], max_workers: int) -> None:
+        detectors = [Fractal, WindowShifting, KMeans]
+        result = scan_levels(frames, detectors, max_workers)
+
+        assert list(result.index) == [(name, d.__name__) for name in frames for d in detectors]
+        for name, df in frames.items():
+            for detector in detectors:
+                sr = detector(df)
+                row = result.loc[(name, detector.__name__)]
+                assert (row['levels'], row['supports'], row['resistances']) == (sr.levels, sr.supports, sr.resistances)
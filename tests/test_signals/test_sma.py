@@ -0,0 +1,28 @@
+import numpy
+import pytest
+import talib
+
+from libraries.signals import SimpleMovingAverage
+
+
+class TestSimpleMovingAverage:
+    @pytest.mark.parametrize('timeperiod', (1, 5, 21))
+    def test_batch(self, prices: numpy.ndarray, timeperiod: int) -> None:
+        expected = talib.SMA(prices, timeperiod=timeperiod)
+        numpy.testing.assert_allclose(SimpleMovingAverage.batch(prices, timeperiod), expected, rtol=1e-12)
+
+    def test_update(self, prices: numpy.ndarray) -> None:
+        sma = SimpleMovingAverage(21)
+        values = [sma.update(p) for p in prices]
+
+        assert values[:20] == [None] * 20
+        numpy.testing.assert_allclose(values[20:], talib.SMA(prices, timeperiod=21)[20:], rtol=1e-12)
+
+    def test_peek(self, prices: numpy.ndarray) -> None:
+        sma = SimpleMovingAverage(5)
+        for p in prices[:4]:
+            sma.update(p)
+
+        peeked = sma.peek(prices[4])
+        assert sma.value is None
+        assert sma.update(prices[4]) == peeked
@@ -0,0 +1,192 @@
+from typing import List, Tuple
+
+import itertools
+import math
+
+import numpy
+import pandas
+import pytest
+
+from libraries.signals.support_resistance import Fractal, KMeans, SupportResistance, WindowShifting
+from libraries.signals.support_resistance.kmeans import optimal_kmeans_1d
+
+
+@pytest.fixture
+def df() -> pandas.DataFrame:
+    rng = numpy.random.default_rng(0)
+    close = (7_000_000 + numpy.cumsum(rng.normal(0, 3_000, 3000))).round()
+    index = pandas.date_range('2021-11-08', periods=len(close), freq='min', tz='UTC', name='Date')
+    return pandas.DataFrame({
+        'Open': close,
+        'High': close + rng.integers(0, 3_000, len(close)),
+        'Low': close - rng.integers(0, 3_000, len(close)),
+        'Close': close,
+        'Volume': 1.0,
+    }, index=index)
+
+
+def _fractal(df: pandas.DataFrame) -> Tuple[List[int], List[int], List[int]]:
+    # The row by row implementation `Fractal` replaced
+    high, low = df['High'].to_numpy(), df['Low'].to_numpy()
+    mean = numpy.mean(high - low)
+    levels, supports, resistances = [], [], []
+
+    for i in range(2, len(df) - 2):
+        level = None
+        if low[i] < low[i - 1] < low[i - 2] and low[i] < low[i + 1] < low[i + 2]:
+            level = int(low[i])
+            supports.append(level)
+        elif high[i] > high[i - 1] > high[i - 2] and high[i] > high[i + 1] > high[i + 2]:
+            level = int(high[i])
+            resistances.append(level)
+
+        if level is not None and numpy.sum([abs(level - x) < mean for x in levels]) == 0:
+            levels.append(level)
+
+    return levels, supports, resistances
+
+
+class TestFractal:
+    def test_same_as_row_by_row(self, df: pandas.DataFrame) -> None:
+        fractal = Fractal(df)
+        assert (fractal.levels, fractal.supports, fractal.resistances) == _fractal(df)
+        assert len(fractal.levels) > 1
+
+    @pytest.mark.parametrize('n', (0, 4, 5))
+    def test_short(self, df: pandas.DataFrame, n: int) -> None:
+        fractal = Fractal(df.iloc[:n])
+        assert (fractal.levels, fractal.supports, fractal.resistances) == _fractal(df.iloc[:n])
+
+
+def _window_shifting(df: pandas.DataFrame, k: int) -> Tuple[List[int], List[int], List[int]]:
+    # The element by element implementation `WindowShifting` replaced
+    mean = numpy.mean(df['High'] - df['Low'])
+    levels, supports, resistances = [], [], []
+
+    def window(nums: numpy.ndarray, max_or_min) -> List[int]:
+        n = len(nums)
+        if n * k == 0:
+            return []
+        left, right = [0] * n, [0] * n
+        left[0], right[n - 1] = nums[0], nums[n - 1]
+        for i in range(1, n):
+            j = n - i - 1
+            left[i] = nums[i] if i % k == 0 else max_or_min(left[i - 1], nums[i])
+            right[j] = nums[j] if (j + 1) % k == 0 else max_or_min(right[j + 1], nums[j])
+        return [int(max_or_min(left[i + k - 1], right[i])) for i in range(n - k + 1)]
+
+    def set_levels(nums: List[int], target: List[int]) -> None:
+        previous, counter = None, 0
+        for n in nums:
+            if n != previous:
+                previous, counter = n, 1
+                continue
+            counter += 1
+            if counter != math.ceil(k / 2):
+                continue
+            target.append(n)
+            if numpy.sum([abs(n - x) < mean for x in levels]) == 0:
+                levels.append(n)
+
+    set_levels(window(df['High'].to_numpy(), max), resistances)
+    set_levels(window(df['Low'].to_numpy(), min), supports)
+    return levels, supports, resistances
+
+
+class TestWindowShifting:
+    @pytest.mark.parametrize('window_size', (None, 1, 2, 3, 10, 64))
+    def test_same_as_element_by_element(self, df: pandas.DataFrame, window_size: int) -> None:
+        ws = WindowShifting(df, window_size=window_size)
+        k = window_size or math.ceil(len(df) / 7)
+        assert (ws.levels, ws.supports, ws.resistances) == _window_shifting(df, k)
+
+    def test_window_larger_than_frame(self, df: pandas.DataFrame) -> None:
+        ws = WindowShifting(df.iloc[:5], window_size=10)
+        assert (ws.levels, ws.supports, ws.resistances) == ([], [], [])
+
+
+def _brute_force_inertia(nums: numpy.ndarray, k: int) -> float:
+    values = numpy.sort(nums)
+    best = numpy.inf
+    for cuts in itertools.combinations(range(1, len(values)), k - 1):
+        groups = numpy.split(values, cuts)
+        best = min(best, sum(((g - g.mean()) ** 2).sum() for g in groups))
+    return best
+
+
+class TestKMeans:
+    @pytest.mark.parametrize('seed', range(5))
+    def test_inertia_is_optimal(self, seed: int) -> None:
+        nums = numpy.random.default_rng(seed).integers(0, 30, 12).astype(float)
+        _, inertias, _ = optimal_kmeans_1d(nums, 14)
+        assert len(inertias) == len(numpy.unique(nums))
+        for k, inertia in enumerate(inertias, start=1):
+            assert inertia == pytest.approx(_brute_force_inertia(nums, k), abs=1e-6)
+
+    def test_no_worse_than_lloyd(self, df: pandas.DataFrame) -> None:
+        from sklearn.cluster import KMeans as Lloyd
+
+        nums = df['High'].to_numpy()
+        _, inertias, _ = optimal_kmeans_1d(nums, 14)
+        for k, inertia in enumerate(inertias, start=1):
+            lloyd = Lloyd(n_clusters=k, n_init=10, random_state=0).fit(nums.reshape(-1, 1))
+            assert inertia <= lloyd.inertia_ * (1 + 1e-9)
+
+    def test_levels_are_cluster_bounds(self) -> None:
+        high = numpy.array([100, 101, 102, 200, 201, 202, 300, 301, 302] * 3, dtype=float)
+        df = pandas.DataFrame({'High': high, 'Low': high - 1})
+        km = KMeans(df)
+        assert km.resistances == [102, 202, 302]
+        assert km.supports == [99, 199, 299]
+        assert km.levels == km.resistances + km.supports
+
+    def test_deterministic(self, df: pandas.DataFrame) -> None:
+        assert KMeans(df).levels == KMeans(df).levels
+
+
+@pytest.fixture
+def steady_df(df: pandas.DataFrame) -> pandas.DataFrame:
+    # The same range for every candle, so that the mean range levels are told apart by does not change on `update`
+    return df.assign(High=df['Close'] + 1_500, Low=df['Close'] - 1_500)
+
+
+def _follow(detector: SupportResistance, df: pandas.DataFrame, n: int, chunk: int) -> None:
+    for i in range(n, len(df), chunk):
+        detector.update(df.iloc[i:i + chunk])
+
+
+class TestUpdate:
+    @pytest.mark.parametrize('n, chunk', ((0, 1), (3, 7), (1000, 1), (1000, 250)))
+    def test_fractal(self, steady_df: pandas.DataFrame, n: int, chunk: int) -> None:
+        fractal = Fractal(steady_df.iloc[:n])
+        _follow(fractal, steady_df, n, chunk)
+        expected = Fractal(steady_df)
+        assert (fractal.levels, fractal.supports, fractal.resistances) == \
+               (expected.levels, expected.supports, expected.resistances)
+
+    @pytest.mark.parametrize('n, chunk', ((10, 1), (1000, 3), (1000, 500)))
+    def test_window_shifting(self, steady_df: pandas.DataFrame, n: int, chunk: int) -> None:
+        ws = WindowShifting(steady_df.iloc[:n], window_size=64)
+        _follow(ws, steady_df, n, chunk)
+        expected = WindowShifting(steady_df, window_size=64)
+        assert (ws.supports, ws.resistances) == (expected.supports, expected.resistances)
+        assert set(ws.levels) <= set(ws.supports + ws.resistances)
+        assert all(b - a >= 3_000 for a, b in zip(sorted(ws.levels), sorted(ws.levels)[1:]))
+
+    def test_kmeans(self, df: pandas.DataFrame) -> None:
+        km = KMeans(df.iloc[:2000])
+        k = len(km.resistances)
+        _follow(km, df, 2000, 100)
+        assert len(km.resistances) == len(km.supports) == k
+        assert km.levels == km.resistances + km.supports
+        assert max(km.resistances) == df['High'].max()
+        assert min(km.supports) == df['Low'].min()
+
+    def test_ignores_seen_rows(self, df: pandas.DataFrame) -> None:
+        fractal = Fractal(df.iloc[:1000])
+        levels = list(fractal.levels)
+        fractal.update(df.iloc[500:1000])
+        assert fractal.levels == levels
+        assert fractal.df.index.equals(df.index[:1000])
+        fractal.update(df.iloc[900:1100])
+        assert fractal.df.index.equals(df.index[:1100])